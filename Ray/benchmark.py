@@ -0,0 +1,321 @@
+# coding: utf-8
+
+# Description: End-to-end harness throughput benchmark. Runs format -> init -> pytest -> baseline ->
+# mutation -> stats on `datasets/ULT_Lite.jsonl` with a canned set of generated tests (each task's
+# own `test_list` asserts, wrapped as model outputs) in a scratch directory, and writes per-stage
+# wall time and tasks/s, mutants/s and peak RSS as JSON. `--compare` prints the change against a
+# saved run, so the effect of a harness change on throughput can be read off directly.
+#
+#   python Ray/benchmark.py --output bench/before.json
+#   python Ray/benchmark.py --output bench/after.json --compare bench/before.json
+
+import os
+import ast
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import datetime
+import subprocess
+from contextlib import nullcontext
+from tqdm import tqdm
+
+RAY_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(RAY_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'src'))
+
+from main import code_import, fixed_sample_pool, cosmic_ray_init, pytest_run, pytest_run_single_pass, cosmic_ray_setup, mutation_run, mutation_statistic
+from mutation_stats import mutation_statistics, summarize_timeouts
+from zygote import zygote_service
+from prefork import preload_modules, run_forked
+import results_store
+from dataset_index import DatasetIndex
+
+BENCHMARK_NAME = 'ULT_Lite_bench'
+MODEL_NAME = 'canned'
+# mutation_run 固定读取 correct_tasks_tc_5, ULT_Lite 每个任务也正好有 5 条断言
+NUM_TEST_CASES = 5
+WORKDIR_MARKER = '.ult_benchmark'
+ANSWER_MARKER = '__BENCHMARK_ANSWERS__'
+STAGES = ['format', 'init', 'pytest', 'baseline', 'mutation', 'stats']
+
+def split_assertion(assertion):
+    """`(call, expected)` source of an `assert f(...) == expected` line, or None."""
+    try:
+        node = ast.parse(assertion).body[0]
+    except (SyntaxError, IndexError):
+        return None
+    if not isinstance(node, ast.Assert) or not isinstance(node.test, ast.Compare) or len(node.test.ops) != 1:
+        return None
+    if not isinstance(node.test.ops[0], ast.Eq) or not isinstance(node.test.left, ast.Call):
+        return None
+    return ast.unparse(node.test.left), ast.unparse(node.test.comparators[0])
+
+def _print_answers(code, calls):
+    namespace = dict()
+    exec(code_import + '\n' + code, namespace)
+    answers = []
+    for call in calls:
+        try:
+            answers.append(repr(eval(call, namespace)))
+        except Exception:
+            answers.append(None)
+    print(ANSWER_MARKER + json.dumps(answers))
+    return 0
+
+def ground_truth_answers(code, calls, timeout=10):
+    """`repr` of every call's result on the reference code, run in a forked child (None where it fails)."""
+    try:
+        result = run_forked(_print_answers, (code, calls), timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return [None] * len(calls)
+    lines = [line for line in result.stdout.splitlines() if line.startswith(ANSWER_MARKER)]
+    if result.returncode != 0 or not lines:
+        return [None] * len(calls)
+    return json.loads(lines[-1][len(ANSWER_MARKER):])
+
+def canned_test(func_name, assertion, answer):
+    """The generated test for one `test_list` assert, its expected value replaced by the reference answer if it is a literal."""
+    parts = split_assertion(assertion)
+    if parts is not None and answer is not None:
+        try:
+            ast.literal_eval(answer)
+            assertion = f'assert {parts[0]} == {answer}'
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            pass
+    return f"def test_{func_name}():\n    {assertion}"
+
+def canned_generations(dataset_path, num_samples):
+    """
+    ULT_Lite tasks with their `test_list` asserts as generated tests, in the layout `format.py` reads.
+    The listed expected values do not always hold for the reference code, so, like `format.py --gt`,
+    they are refilled from the reference code (locally instead of through the sandbox).
+    """
+    with DatasetIndex(dataset_path) as f:
+        dataset = f[:num_samples]
+    preload_modules()
+
+    generations = []
+    for item in tqdm(dataset, desc="[+] 🥫 Preparing canned tests"):
+        assertions = item['test_list'][:NUM_TEST_CASES]
+        parts = [split_assertion(assertion) for assertion in assertions]
+        calls = [part[0] for part in parts if part is not None]
+        answers = iter(ground_truth_answers(item['code'], calls) if calls else [])
+        generations.append({
+            'task_id': item['task_id'],
+            'func_name': item['func_name'],
+            'code': item['code'],
+            'prompt': item['prompt'],
+            'tests': [
+                canned_test(item['func_name'], assertion, next(answers) if part is not None else None)
+                for assertion, part in zip(assertions, parts)
+            ]
+        })
+    return generations
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of its largest (waited-for) child, in MB."""
+    # Linux 上 ru_maxrss 的单位是 KB
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def read_task_list(path):
+    with open(path, 'r') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def prepare_workdir(workdir):
+    """Create an empty scratch dir; an existing one is only wiped if a previous benchmark created it."""
+    if os.path.exists(workdir):
+        if not os.path.exists(os.path.join(workdir, WORKDIR_MARKER)):
+            raise FileExistsError(f'{workdir} exists and was not created by the benchmark')
+        shutil.rmtree(workdir)
+    os.makedirs(os.path.join(workdir, 'src', 'results'))
+    open(os.path.join(workdir, WORKDIR_MARKER), 'w').close()
+
+def run_benchmark(args):
+    from format import reformat_cov
+
+    stages = dict()
+    def timed(stage, tasks, func, *func_args, **func_kwargs):
+        print(f"[+] ⏱️ Stage {stage}: {tasks} tasks")
+        start_time = time.perf_counter()
+        result = func(*func_args, **func_kwargs)
+        seconds = time.perf_counter() - start_time
+        stages[stage] = {
+            'seconds': round(seconds, 3),
+            'tasks': tasks,
+            'tasks_per_second': round(tasks / seconds, 3) if seconds > 0 else None
+        }
+        return result
+
+    generations = canned_generations(args.dataset, args.num_samples)
+    raw_path = f'src/results/{MODEL_NAME}.jsonl'
+    format_path = f'src/results/{MODEL_NAME}_format.jsonl'
+    with open(raw_path, 'w') as f:
+        for entry in generations:
+            f.write(json.dumps(entry) + '\n')
+
+    timeout_config = {'mode': args.timeout_mode, 'timeout': args.timeout, 'multiplier': args.timeout_multiplier, 'floor': args.timeout_floor}
+    num_tasks = len(generations)
+    start_time = time.perf_counter()
+
+    with zygote_service() if args.zygote else nullcontext():
+        timed('format', num_tasks, reformat_cov, raw_path, format_path, args.gt)
+        timed('init', num_tasks, cosmic_ray_init, BENCHMARK_NAME, MODEL_NAME, format_path, num_test_cases=NUM_TEST_CASES,
+              timeout=args.timeout, num_samples=num_tasks, header_mode=args.header)
+        if args.single_pass:
+            timed('pytest', num_tasks, pytest_run_single_pass, BENCHMARK_NAME, MODEL_NAME, NUM_TEST_CASES, backend=args.pytest_backend)
+        else:
+            timed('pytest', num_tasks, pytest_run, BENCHMARK_NAME, MODEL_NAME, NUM_TEST_CASES, backend=args.pytest_backend)
+        passed_tasks = results_store.passed_tasks(BENCHMARK_NAME, MODEL_NAME, NUM_TEST_CASES)
+
+        # baseline 只在抽样池里通过了测试的任务上运行
+        baseline_tasks = set(fixed_sample_pool(BENCHMARK_NAME, MODEL_NAME, NUM_TEST_CASES, args.sample_rate)) & set(passed_tasks)
+        timed('baseline', len(baseline_tasks), cosmic_ray_setup, BENCHMARK_NAME, MODEL_NAME, num_test_cases=NUM_TEST_CASES,
+              sample_rate=args.sample_rate, engine=args.mutation_engine, timeout_config=timeout_config)
+        mutated_tasks = read_task_list(f'data/{BENCHMARK_NAME}/correct_tasks_tc_{NUM_TEST_CASES}_{MODEL_NAME}')
+        timed('mutation', len(mutated_tasks), mutation_run, BENCHMARK_NAME, MODEL_NAME, NUM_TEST_CASES, engine=args.mutation_engine,
+              coverage_guided=args.coverage_guided, timeout_mode=args.timeout_mode)
+        surviving_mutants_rate = timed('stats', len(mutated_tasks), mutation_statistic, BENCHMARK_NAME, MODEL_NAME, NUM_TEST_CASES,
+                                       baseline_test_cases=NUM_TEST_CASES)
+
+    total_seconds = time.perf_counter() - start_time
+    statistics = mutation_statistics(BENCHMARK_NAME, MODEL_NAME, NUM_TEST_CASES, mutated_tasks, leave=False)
+    mutants = sum(statistic['completed_jobs_number'] for statistic in statistics)
+    _, timeout_jobs, timeout_seconds = summarize_timeouts(statistics)
+    mutation_seconds = stages['mutation']['seconds']
+    stages['mutation'].update({
+        'mutants': mutants,
+        'mutants_per_second': round(mutants / mutation_seconds, 3) if mutation_seconds > 0 else None,
+        'timed_out_mutants': timeout_jobs,
+        'timeout_seconds': round(timeout_seconds, 1)
+    })
+
+    return {
+        'dataset': os.path.relpath(args.dataset, REPO_DIR),
+        'revision': git_revision(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'cpu_count': os.cpu_count(),
+        'config': {
+            'num_samples': num_tasks,
+            'num_test_cases': NUM_TEST_CASES,
+            'single_pass': args.single_pass,
+            'pytest_backend': args.pytest_backend,
+            'mutation_engine': args.mutation_engine,
+            'coverage_guided': args.coverage_guided,
+            'timeout': timeout_config,
+            'sample_rate': args.sample_rate,
+            'header': args.header,
+            'zygote': args.zygote,
+            'gt': args.gt
+        },
+        'stages': stages,
+        'total_seconds': round(total_seconds, 3),
+        'tasks_per_second': round(num_tasks / total_seconds, 3) if total_seconds > 0 else None,
+        'peak_rss_mb': peak_rss_mb(),
+        # 吞吐量的变化只有在结果不变时才可比
+        'results': {
+            'passed_tasks': len(passed_tasks),
+            'mutated_tasks': len(mutated_tasks),
+            'mutants': mutants,
+            'surviving_mutants_rate': round(surviving_mutants_rate, 4)
+        }
+    }
+
+def compare_runs(baseline, current):
+    """
+    Per-stage and overall changes of `current` against `baseline`, as `{metric: {baseline, current, improvement}}`.
+    `improvement` > 1 means better (faster, higher throughput or less memory).
+    """
+    def improvement(old, new, higher_is_better):
+        if not old or not new:
+            return None
+        return round(new / old if higher_is_better else old / new, 3)
+
+    comparison = dict()
+    metrics = [('total_seconds', ('total_seconds',), False), ('tasks_per_second', ('tasks_per_second',), True)]
+    for stage in STAGES:
+        metrics.append((f'{stage}.seconds', ('stages', stage, 'seconds'), False))
+    metrics.append(('mutation.mutants_per_second', ('stages', 'mutation', 'mutants_per_second'), True))
+    metrics.append(('peak_rss_mb.children', ('peak_rss_mb', 'children'), False))
+    metrics.append(('peak_rss_mb.self', ('peak_rss_mb', 'self'), False))
+
+    for name, path, higher_is_better in metrics:
+        old, new = baseline, current
+        for key in path:
+            old = old.get(key) if isinstance(old, dict) else None
+            new = new.get(key) if isinstance(new, dict) else None
+        comparison[name] = {'baseline': old, 'current': new, 'improvement': improvement(old, new, higher_is_better)}
+    return comparison
+
+def print_comparison(comparison, baseline, current):
+    print(f"[+] 📊 {baseline.get('revision')} ({baseline.get('date')}) -> {current.get('revision')} ({current.get('date')})")
+    for name, values in comparison.items():
+        ratio = f"{values['improvement']:.2f}x" if values['improvement'] is not None else '-'
+        print(f"    {name:<30} {str(values['baseline']):>12} -> {str(values['current']):>12}   {ratio}")
+    if baseline.get('results') != current.get('results'):
+        print(f"[-] ⚠️ Results differ: {baseline.get('results')} -> {current.get('results')}")
+    if baseline.get('config') != current.get('config'):
+        print(f"[-] ⚠️ Configs differ: {baseline.get('config')} -> {current.get('config')}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", type=str, default=os.path.join(REPO_DIR, 'datasets', 'ULT_Lite.jsonl'))
+    parser.add_argument("--num_samples", type=int, default=200)
+    parser.add_argument("--workdir", type=str, default=None, help='scratch directory for the run (default: a temporary directory, removed afterwards)')
+    parser.add_argument("--output", type=str, default=None, help='write the report JSON here (printed to stdout otherwise)')
+    parser.add_argument("--compare", type=str, default=None, help='a saved report to compare this run against')
+    parser.add_argument("--single_pass", action='store_true')
+    parser.add_argument("--pytest_backend", type=str, default='subprocess', choices=['subprocess', 'warm'])
+    parser.add_argument("--mutation_engine", type=str, default='cosmic-ray', choices=['cosmic-ray', 'fork'])
+    parser.add_argument("--coverage_guided", action='store_true')
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--timeout_mode", type=str, default='fixed', choices=['fixed', 'adaptive'])
+    parser.add_argument("--timeout_multiplier", type=float, default=10.0)
+    parser.add_argument("--timeout_floor", type=float, default=1.0)
+    parser.add_argument("--sample_rate", type=float, default=0.1)
+    parser.add_argument("--header", type=str, default='full', choices=['full', 'minimal'])
+    parser.add_argument("--zygote", action='store_true')
+    parser.add_argument("--gt", action='store_true', help='correct the canned tests against the ground truth in format (needs the sandbox)')
+    args = parser.parse_args()
+
+    args.dataset = os.path.abspath(args.dataset)
+    output_path = os.path.abspath(args.output) if args.output else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    temp_root = None if args.workdir else tempfile.mkdtemp(prefix='ult-bench-')
+    workdir = os.path.abspath(args.workdir) if args.workdir else os.path.join(temp_root, 'workdir')
+    prepare_workdir(workdir)
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        report = run_benchmark(args)
+    finally:
+        os.chdir(cwd)
+        if temp_root:
+            shutil.rmtree(temp_root, ignore_errors=True)
+
+    if output_path:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[+] 💾 Saved benchmark report: {output_path}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if compare_path:
+        with open(compare_path, 'r') as f:
+            baseline = json.load(f)
+        report_comparison = compare_runs(baseline, report)
+        print_comparison(report_comparison, baseline, report)
@@ -0,0 +1,332 @@
+# coding: utf-8
+
+# Description: Multi-machine execution backend for the scheduler (`--backend distributed`). The
+# pipeline process runs an HTTP coordinator; workers on any host lease jobs, receive the job's task
+# dirs, run the stage in their own scratch copy of `data/`, and send back the changed files and
+# results-store rows, which land in the usual `data/{benchmark}/...` layout. Leases expire without
+# heartbeats and lost jobs are re-queued. `--local_workers N` starts N workers on this host.
+#
+#   python Ray/distributed.py worker --coordinator http://<host>:8765 --workdir /scratch/ult
+
+import os
+import sys
+import json
+import time
+import uuid
+import base64
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+import traceback
+import subprocess
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import results_store
+
+# Functions of `main.py` that a worker may run
+JOB_FUNCTIONS = {'pytest_run_wrapper', 'pytest_single_pass_wrapper', 'cosmic_ray_setup_wrapper', 'mutation_run_wrapper'}
+
+def request(coordinator_url, route, payload, token=None, timeout=120):
+    data = json.dumps(payload).encode('utf-8')
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['X-Token'] = token
+    req = urllib.request.Request(coordinator_url.rstrip('/') + route, data=data, headers=headers)
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+def is_inside(path, roots):
+    """True if the relative `path` lies inside one of the relative dirs in `roots` (no `..` escapes)."""
+    path = os.path.normpath(path)
+    if os.path.isabs(path):
+        return False
+    return any(path.startswith(os.path.normpath(root) + os.sep) for root in roots)
+
+def pack_files(paths):
+    """`{relative path: base64 content}` of the files directly inside each task dir."""
+    files = dict()
+    for path in paths:
+        if not os.path.isdir(path):
+            continue
+        for name in os.listdir(path):
+            file_path = os.path.join(path, name)
+            if os.path.isfile(file_path) and not name.endswith('.tmp'):
+                with open(file_path, 'rb') as f:
+                    files[file_path] = base64.b64encode(f.read()).decode('ascii')
+    return files
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(base64.b64decode(content))
+    os.replace(temp_path, path)
+
+def digest(content):
+    return hashlib.sha256(content.encode('ascii')).hexdigest()
+
+class Coordinator:
+    """
+    Scheduler backend that hands jobs to HTTP workers. At most `max_workers` jobs are in flight;
+    a lease not renewed within `lease_seconds` is re-queued (up to `max_attempts` times).
+    """
+
+    def __init__(self, host='127.0.0.1', port=8765, max_workers=None, local_workers=0, lease_seconds=60, max_attempts=3, token=None):
+        self.host, self.port = host, port
+        self.local_workers = local_workers
+        self.max_workers = max_workers or local_workers or 16
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.token = token
+        self.lock = threading.Lock()
+        self.queue = deque()
+        self.entries = dict()
+        self.leases = dict()
+        self.shutting_down = False
+        self.server = None
+        self.worker_processes = []
+        self.worker_root = None
+
+    @property
+    def url(self):
+        host = '127.0.0.1' if self.host in ('', '0.0.0.0') else self.host
+        return f'http://{host}:{self.server.server_port}'
+
+    def __enter__(self):
+        coordinator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if coordinator.token and self.headers.get('X-Token') != coordinator.token:
+                    self.send_error(403)
+                    return
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                routes = {'/lease': coordinator.lease, '/heartbeat': coordinator.heartbeat, '/complete': coordinator.complete}
+                if self.path not in routes:
+                    self.send_error(404)
+                    return
+                body = json.dumps(routes[self.path](payload)).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self.requeue_expired, daemon=True).start()
+        print(f'[+] 🛰️ Coordinator listening on {self.url} (lease {self.lease_seconds}s, {self.max_workers} jobs in flight)')
+
+        if self.local_workers:
+            self.worker_root = tempfile.mkdtemp(prefix='ult-workers-')
+            for idx in range(self.local_workers):
+                cmd = [sys.executable, os.path.abspath(__file__), 'worker', '--coordinator', self.url,
+                       '--workdir', os.path.join(self.worker_root, f'worker_{idx}'), '--worker_id', f'local-{idx}']
+                if self.token:
+                    cmd += ['--token', self.token]
+                self.worker_processes.append(subprocess.Popen(cmd))
+            print(f'[+] 🚀 Started {self.local_workers} local workers')
+        return self
+
+    def __exit__(self, *exc_info):
+        # 正在轮询的 worker 收到 shutdown 后退出
+        with self.lock:
+            self.shutting_down = True
+        for process in self.worker_processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self.worker_root:
+            shutil.rmtree(self.worker_root, ignore_errors=True)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def submit_job(self, job):
+        if job['func'].__name__ not in JOB_FUNCTIONS:
+            raise ValueError(f"{job['func'].__name__} cannot run on a remote worker")
+        future = Future()
+        with self.lock:
+            self.entries[job['id']] = {'job': job, 'future': future, 'attempts': 0}
+            self.queue.append(job['id'])
+        return future
+
+    def lease(self, payload):
+        with self.lock:
+            if self.shutting_down:
+                return {'shutdown': True}
+            if not self.queue:
+                return {'job': None}
+            job_id = self.queue.popleft()
+            entry = self.entries[job_id]
+            lease_id = uuid.uuid4().hex
+            self.leases[lease_id] = {'job_id': job_id, 'worker_id': payload.get('worker_id'), 'deadline': time.monotonic() + self.lease_seconds}
+        job = entry['job']
+        return {'job': {
+            'lease_id': lease_id,
+            'job_id': job_id,
+            'function': job['func'].__name__,
+            'args': list(job['args']),
+            'paths': job['paths'],
+            'store_key': job['store_key'],
+            'files': pack_files(job['paths']),
+            'lease_seconds': self.lease_seconds
+        }}
+
+    def heartbeat(self, payload):
+        with self.lock:
+            lease = self.leases.get(payload.get('lease_id'))
+            if lease is None:
+                return {'ok': False}
+            lease['deadline'] = time.monotonic() + self.lease_seconds
+        return {'ok': True}
+
+    def complete(self, payload):
+        with self.lock:
+            lease = self.leases.pop(payload.get('lease_id'), None)
+        # 租约已过期并被重新排队: 丢弃这个迟到的结果
+        if lease is None:
+            return {'ok': False}
+        entry = self.entries.pop(lease['job_id'])
+        job, future = entry['job'], entry['future']
+
+        if payload.get('error'):
+            print(f"[-] Job {lease['job_id']} failed on {lease['worker_id']}:\n{payload['error']}")
+            future.set_exception(RuntimeError(f"remote job failed on {lease['worker_id']}"))
+            return {'ok': True}
+        try:
+            for path, content in payload.get('files', {}).items():
+                if is_inside(path, job['paths']):
+                    write_file(path, content)
+            for path in payload.get('deleted', []):
+                if is_inside(path, job['paths']) and os.path.exists(path):
+                    os.remove(path)
+            if job['store_key'] and payload.get('rows'):
+                # 只接受该 job 负责的 k 的结果行
+                k_values = set(job['store_key'][3])
+                results_store.insert_rows(job['store_key'][0], [row for row in payload['rows'] if row[2] in k_values])
+        except Exception as e:
+            future.set_exception(e)
+            return {'ok': True}
+        future.set_result((payload.get('result'), payload.get('seconds', 0.0)))
+        return {'ok': True}
+
+    def requeue_expired(self):
+        while True:
+            time.sleep(1)
+            failed = []
+            with self.lock:
+                now = time.monotonic()
+                for lease_id, lease in list(self.leases.items()):
+                    if lease['deadline'] > now:
+                        continue
+                    del self.leases[lease_id]
+                    entry = self.entries[lease['job_id']]
+                    entry['attempts'] += 1
+                    if entry['attempts'] >= self.max_attempts:
+                        failed.append(self.entries.pop(lease['job_id']))
+                    else:
+                        # 丢失的 job 优先重新分配
+                        self.queue.appendleft(lease['job_id'])
+                    print(f"[-] Lease of {lease['job_id']} on {lease['worker_id']} expired (attempt {entry['attempts']}/{self.max_attempts})")
+            for entry in failed:
+                entry['future'].set_exception(RuntimeError(f"{entry['job']['id']} lost {self.max_attempts} times"))
+
+def run_leased_job(pipeline, coordinator_url, job, token=None):
+    paths = job['paths']
+    for path in paths:
+        # 只允许写 data/ 下的任务目录
+        if not is_inside(path, ['data']):
+            raise ValueError(f'unsafe job path: {path}')
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+    if job['store_key']:
+        # workdir 会保留以前运行的结果行: 先删掉, 以免 job 没写出的行被当作新结果送回
+        results_store.delete_task_rows(*job['store_key'])
+    shipped = dict()
+    for path, content in job['files'].items():
+        if is_inside(path, paths):
+            write_file(path, content)
+            shipped[path] = digest(content)
+
+    stop = threading.Event()
+    def send_heartbeats():
+        while not stop.wait(job['lease_seconds'] / 3):
+            try:
+                request(coordinator_url, '/heartbeat', {'lease_id': job['lease_id']}, token)
+            except Exception:
+                pass
+    threading.Thread(target=send_heartbeats, daemon=True).start()
+
+    payload = {'lease_id': job['lease_id']}
+    try:
+        if job['function'] not in JOB_FUNCTIONS:
+            raise ValueError(f"unknown job function {job['function']}")
+        start_time = time.perf_counter()
+        payload['result'] = getattr(pipeline, job['function'])(*job['args'])
+        payload['seconds'] = time.perf_counter() - start_time
+    except Exception:
+        payload['error'] = traceback.format_exc()
+    finally:
+        stop.set()
+
+    if 'error' not in payload:
+        current = pack_files(paths)
+        payload['files'] = {path: content for path, content in current.items() if shipped.get(path) != digest(content)}
+        payload['deleted'] = [path for path in shipped if path not in current]
+        if job['store_key']:
+            payload['rows'] = results_store.task_rows(*job['store_key'])
+    request(coordinator_url, '/complete', payload, token)
+
+def run_worker(coordinator_url, workdir, worker_id=None, token=None, poll_seconds=1.0):
+    """Lease and run jobs until the coordinator shuts down. `workdir` holds this worker's copy of `data/`."""
+    import main as pipeline
+
+    worker_id = worker_id or f'{os.uname().nodename}-{os.getpid()}'
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    failures = 0
+    while True:
+        try:
+            response = request(coordinator_url, '/lease', {'worker_id': worker_id}, token)
+            failures = 0
+        except (urllib.error.URLError, ConnectionError) as e:
+            # 协调器不可达: 重试一段时间后退出
+            failures += 1
+            if failures > 30:
+                print(f'[-] Worker {worker_id}: coordinator unreachable ({e}), exiting')
+                return
+            time.sleep(poll_seconds)
+            continue
+
+        if response.get('shutdown'):
+            return
+        job = response.get('job')
+        if job is None:
+            time.sleep(poll_seconds)
+            continue
+        try:
+            run_leased_job(pipeline, coordinator_url, job, token)
+        except Exception as e:
+            # 结果没能送回: 租约过期后协调器会重新分配
+            print(f"[-] Worker {worker_id}: job {job['job_id']} could not be completed: {e}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('role', choices=['worker'])
+    parser.add_argument('--coordinator', type=str, required=True, help='coordinator URL, e.g. http://10.0.0.1:8765')
+    parser.add_argument('--workdir', type=str, default=os.path.join(tempfile.gettempdir(), 'ult-worker'))
+    parser.add_argument('--worker_id', type=str, default=None)
+    parser.add_argument('--token', type=str, default=os.environ.get('ULT_COORDINATOR_TOKEN'))
+    args = parser.parse_args()
+    run_worker(args.coordinator, os.path.abspath(args.workdir), worker_id=args.worker_id, token=args.token)
@@ -4,11 +4,9 @@
 # Date: 2025-07-26
 
 
-import re
 import os
 import json
-import subprocess
-from tqdm.contrib.concurrent import process_map
+from mutation_stats import mutation_statistics
 
 # Load dataset v6
 with open('data/testbench_generation/TestBench_datasetv6.jsonl', 'r') as f:
@@ -21,45 +19,6 @@ for item in data:
         leakage_free_tasks.append(f'task_{task_id}')
 print(f"[+] ✅ Leakage-free tasks: {len(leakage_free_tasks)}")
 
-def mutation_statistic_wrapper(benchmark_name, model_name, num_test_cases, task):
-    working_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task}'
-
-    statistic_info = {
-        "task": task,
-        "complete_rate": 0.0,
-        "surviving_mutants_rate": 0.0,
-        "total_jobs_number": 0,
-        "completed_jobs_number": 0,
-        "surviving_mutants_number": 0
-    }
-
-    try:
-        response = subprocess.run(['cr-report', f'cosmic-ray.sqlite', '--show-pending'], cwd=working_dir, check=True, capture_output=True, text=True)
-    except Exception as e:
-        print(f'[-] Error @ [{working_dir}]: {e}')
-        return statistic_info
-
-    total_jobs_match = re.search(r"total jobs:\s*(\d+)", response.stdout)
-    completed_jobs_match = re.search(r"complete:\s*(\d+)\s*\(", response.stdout)
-    surviving_mutants_match = re.search(r"surviving mutants:\s*(\d+)\s*\(", response.stdout)
-
-    if total_jobs_match:
-        total_jobs_number = int(total_jobs_match.group(1))
-        statistic_info["total_jobs_number"] = total_jobs_number
-
-    if completed_jobs_match:
-        completed_jobs_number = int(completed_jobs_match.group(1))
-        statistic_info["completed_jobs_number"] = completed_jobs_number
-        
-    if surviving_mutants_match:
-        surviving_mutants_number = int(surviving_mutants_match.group(1))
-        statistic_info["surviving_mutants_number"] = surviving_mutants_number
-    
-    statistic_info['complete_rate'] = statistic_info['completed_jobs_number'] / statistic_info["total_jobs_number"] if statistic_info["total_jobs_number"] > 0 else 0
-    statistic_info['surviving_mutants_rate'] = (statistic_info['surviving_mutants_number'] / statistic_info['completed_jobs_number']) if statistic_info['completed_jobs_number'] > 0 else 0
-
-    return statistic_info
-
 def mutation_statistic(benchmark_name, model_generation_file, num_test_cases, task_list):
     model_name = model_generation_file.split('/')[-1].split('.')[0]
     
@@ -75,7 +34,7 @@ def mutation_statistic(benchmark_name, model_generation_file, num_test_cases, ta
     
     surviving_mutants_rate = 0.0
 
-    statistics = process_map(mutation_statistic_wrapper, [benchmark_name]*len(correct_tasks), [model_name]*len(correct_tasks), [num_test_cases]*len(correct_tasks), correct_tasks, desc=f"[+] 🔄 Running mutation ({num_test_cases} test cases) statistics...", chunksize=1)
+    statistics = mutation_statistics(benchmark_name, model_name, num_test_cases, correct_tasks, desc=f"[+] 🔄 Running mutation ({num_test_cases} test cases) statistics...")
     for statistic in statistics:
         # print(f"[+] {statistic}")
         surviving_mutants_rate += statistic["surviving_mutants_rate"]
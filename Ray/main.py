@@ -5,17 +5,39 @@
 
 import re
 import os
+import sys
+import ast
 import json
 import string
 import random
 import shutil
 import tempfile
+import time
 import datetime
 import argparse
 import subprocess
 from tqdm import tqdm
+from contextlib import nullcontext
+from functools import partial
 from collections import defaultdict
+import xml.etree.ElementTree as ET
 from tqdm.contrib.concurrent import process_map
+from prefork import preload_modules, run_pytest_forked
+from mutation_engine import fork_baseline, fork_exec
+from mutation_coverage import mark_uncovered_mutants
+from mutant_catalogue import init_from_catalogue, catalogue_session_path
+from mutation_stats import mutation_statistics, read_mutation_counts, summarize_timeouts
+from mutation_timeouts import calibrate_timeout, read_timeout, write_timeout, write_config, clear_mutation_results, task_time_budget
+from pipeline_state import fingerprint, file_fingerprint, stage_done, stage_info, mark_stage, clear_stages
+from scheduler import JobStore, make_job, run_jobs, scheduler_path, cyclomatic_complexity
+from distributed import Coordinator
+from zygote import zygote_service, run as zygote_run
+from import_header import minimal_header, exclude_from_coverage
+from tracing import span, traced_stage, trace_task, traced_run, start_trace, finish_trace
+import results_store
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from dataset_index import DatasetIndex
 
 toml_template = """
 [cosmic-ray]
@@ -111,94 +133,166 @@ def parse_pytest_output(output: str) -> dict:
         "total_tests": total_tests,
     }
 
+def build_test_code(tests, header=code_import):
+    test_code = header + '\n\n' + 'from mod import *' + '\n\n'
+    for test in tests:
+        test_code += f'{test}\n\n'
+    # test_code += "\n\n" + "#" * 100 + "\n\n"
+    return test_code
+
+# 由输入文件派生的产物: 输入变化后必须重新生成
+DERIVED_FILES = ['cosmic-ray.sqlite', 'test_coverage.json']
+DOWNSTREAM_STAGES = ['pytest', 'pytest_single_pass', 'baseline', 'mutate', 'stats']
+
 # Initialization 
-def cosmic_ray_init(benchmark_name, model_name, model_generation_file, num_test_cases=5, timeout=1, num_samples=100):
-    if os.path.exists(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}'):
+def task_headers(header_mode, code, tests):
+    """
+    The import headers `(mod.py, test.py)` of a task: the whole `code_import` ('full') or only the imports used
+    ('minimal'). A minimal mod.py header depends on the task's code alone and is excluded from coverage.
+    """
+    if header_mode == 'minimal':
+        # mod.py 只由任务代码决定: 同一任务的 mod.py 对所有模型和 k 都相同 (变异体目录按其内容哈希共享),
+        # 头部导入行不计入覆盖率, 各模型的 LCov 分母一致; test.py 另用覆盖代码和测试的头部
+        mod_header = exclude_from_coverage(minimal_header(code_import, code))
+        return mod_header, minimal_header(code_import, code, *tests)
+    return code_import, code_import
+
+def read_task_header(task_dir):
+    """The header the task's test.py was built with (see `build_test_code`)."""
+    with open(f'{task_dir}/test.py', 'r') as f:
+        return f.read().split('\n\nfrom mod import *', 1)[0]
+
+@traced_stage
+def cosmic_ray_init(benchmark_name, model_name, model_generation_file, num_test_cases=5, timeout=1, num_samples=100, fresh=False, header_mode='full'):
+    model_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}'
+    if fresh and os.path.exists(model_dir):
         print(f"[+] 🧹 Cleaning up existing files in {model_name}...")
         try:
-            shutil.rmtree(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}')
+            shutil.rmtree(model_dir)
         except PermissionError:
-            print(f"[-] PermissionError: {f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}'}")
+            print(f"[-] PermissionError: {model_dir}")
         
-    print(f"[+] 📂 Creating new directory {model_name}...")
-    os.makedirs(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}')
-
-    with open(model_generation_file, 'r') as data_handler:
-        # For [json] file
-        # raw_data = json.loads(data_handler.read())[:num_samples]
+    os.makedirs(model_dir, exist_ok=True)
 
-        # For [jsonl] file
-        raw_data = [json.loads(line) for line in data_handler.readlines()[:num_samples]]
+    # [json] 与 [jsonl] 文件都可以, 只解析前 num_samples 条
+    with DatasetIndex(model_generation_file) as data_handler:
+        raw_data = data_handler[:num_samples]
     print(f"[+] ✅ Raw data: {len(raw_data)}")
 
+    # 只重写输入 (代码/测试) 发生变化的任务, 其余任务的 pytest、baseline、变异结果保留
+    materialized = 0
     for idx, instance in tqdm(enumerate(raw_data), desc="[+] 💾 Processing raw data"):
-        os.makedirs(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/task_{idx}')
-
-        # create 'mod.py'
-        with open(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/task_{idx}/mod.py', 'w') as f:
-            mod_code = ''
-            mod_code += code_import + '\n\n'
-            mod_code += instance['code'] + '\n\n'
-            mod_code = rename_test_functions(mod_code)
-            f.write(mod_code)
-
-        # create 'test.py'
-        with open(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/task_{idx}/test.py', 'w') as f:
-            test_code = code_import + '\n\n' + 'from mod import *' + '\n\n'
-            for test in instance['tests'][:num_test_cases]:
-                test_code += f'{test}\n\n'
-            # test_code += "\n\n" + "#" * 100 + "\n\n"
-            f.write(test_code)         
-
-        # create 'toml'
-        with open(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/task_{idx}/cosmic-ray.toml', 'w') as f:
-            f.write(toml_template.format(model_name=model_name, task_id=idx, timeout=timeout))
-
-def cosmic_ray_setup_wrapper(benchmark_name, model_name, task_id, num_test_cases=5):
+        task_dir = f'{model_dir}/task_{idx}'
+
+        # mod.py 的头部与模型和 k 无关: 单次运行的覆盖行号、变异体目录都依赖这一点
+        mod_header, test_header = task_headers(header_mode, instance['code'], instance['tests'][:num_test_cases])
+        mod_code = ''
+        mod_code += mod_header + '\n\n'
+        mod_code += instance['code'] + '\n\n'
+        mod_code = rename_test_functions(mod_code)
+
+        task_files = {
+            'mod.py': mod_code,
+            'test.py': build_test_code(instance['tests'][:num_test_cases], test_header),
+            # 单次运行模式需要按测试拆分前缀 test@1..test@k
+            'tests.json': json.dumps(instance['tests'][:num_test_cases]),
+        }
+        materialize_fingerprint = fingerprint(task_files)
+        if not stage_done(task_dir, 'materialize', materialize_fingerprint, outputs=task_files):
+            os.makedirs(task_dir, exist_ok=True)
+            for filename, content in task_files.items():
+                with open(f'{task_dir}/{filename}', 'w') as f:
+                    f.write(content)
+            for filename in DERIVED_FILES:
+                if os.path.exists(f'{task_dir}/{filename}'):
+                    os.remove(f'{task_dir}/{filename}')
+            clear_stages(task_dir, DOWNSTREAM_STAGES)
+            mark_stage(task_dir, 'materialize', materialize_fingerprint)
+            materialized += 1
+
+        # cosmic-ray.toml 不参与 materialize 指纹: 其中的超时由 setup 写入, 且已计入 mutate_fingerprint,
+        # 改 --timeout 只会让变异重跑, pytest / baseline 结果保留
+        write_config(task_dir, toml_template.format(model_name=model_name, task_id=idx, timeout=timeout))
+
+    # num_samples 变小或数据集变短时，删除多出来的旧任务
+    current_tasks = {f'task_{idx}' for idx in range(len(raw_data))}
+    stale_tasks = [t for t in os.listdir(model_dir) if t.startswith('task_') and t not in current_tasks]
+    for task in stale_tasks:
+        shutil.rmtree(f'{model_dir}/{task}', ignore_errors=True)
+
+    print(f"[+] 📂 {model_name}: {materialized} tasks written, {len(raw_data) - materialized} unchanged, {len(stale_tasks)} stale removed")
+
+def pytest_fingerprint(task_dir):
+    return file_fingerprint(task_dir, ['mod.py', 'test.py'])
+
+def pytest_single_pass_fingerprint(task_dir):
+    return file_fingerprint(task_dir, ['mod.py', 'test.py', 'tests.json'])
+
+def baseline_fingerprint(task_dir):
+    return file_fingerprint(task_dir, ['mod.py', 'test.py'])
+
+def mutate_fingerprint(task_dir):
+    return file_fingerprint(task_dir, ['mod.py', 'test.py', 'cosmic-ray.toml'])
+
+def cosmic_ray_setup_wrapper(benchmark_name, model_name, task_id, num_test_cases=5, engine='cosmic-ray', timeout_config=None):
+    """
+    Initialize the task's session and run the baseline. `timeout_config` is `{'mode', 'timeout', 'multiplier', 'floor'}`:
+    in 'adaptive' mode the per-mutant timeout becomes `multiplier` x the baseline time, clamped to [floor, timeout].
+    """
     working_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task_id}'
+    timeout_config = timeout_config or {'mode': 'fixed', 'timeout': 10}
+
+    # 代码和测试都没变: 直接复用上次的 baseline 结果 (重新 init 会清空已完成的变异结果)
+    task_fingerprint = baseline_fingerprint(working_dir)
+    if stage_done(working_dir, 'baseline', task_fingerprint, outputs=['cosmic-ray.sqlite']):
+        info = stage_info(working_dir, 'baseline')
+        set_task_timeout(working_dir, info['passed'], info.get('seconds'), timeout_config)
+        return info['passed']
+    clear_stages(working_dir, ['baseline', 'mutate', 'stats'])
+    # baseline 本身总是在上限时间内运行
+    write_timeout(working_dir, timeout_config['timeout'])
     
     # Initialize Cosmic-Ray Config
+    # 同一任务的 mod.py 对所有模型和 k 都相同: 变异体只枚举一次 (按 mod.py 内容哈希缓存)
     try:
-        subprocess.run(['cosmic-ray', 'init', 'cosmic-ray.toml', 'cosmic-ray.sqlite'], cwd=working_dir, check=True)
+        init_from_catalogue(benchmark_name, working_dir)
     except Exception as e:
         print(f'[-] Initialize Cosmic-Ray Error: {e}')
         return False
 
     # Run Cosmic-Ray Baseline
-    try:
-        subprocess.run(['cosmic-ray', 'baseline', 'cosmic-ray.toml'], cwd=working_dir, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=60*num_test_cases)
-        return True
-    except Exception as e:
-        return False
-
-def cosmic_ray_setup(benchmark_name, model_name, num_test_cases=5, sample_rate=0.1):
-    # 定义输出文件路径
-    correct_tasks_path = f'data/{benchmark_name}/correct_tasks_tc_{num_test_cases}_{model_name}'
-
-    # --- 1. 获取所有通过 Pytest 的任务 (候选者) ---
-    pytest_result_file = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{model_name}_{num_test_cases}.json'
-    passed_tasks_current_run = []
-    
-    # 尝试从 Pytest 结果中读取
-    if os.path.exists(pytest_result_file):
-        print(f"[+] 📖 Reading pytest results from {pytest_result_file}")
-        with open(pytest_result_file, 'r') as f:
-            pytest_data = json.load(f)
-        
-        for entry in pytest_data:
-            # 确保 entry 包含必要字段
-            try:
-                task_id = entry.get('task_id')
-                # 检查特定 k 下的通过情况
-                test_counts = entry['test_at_k'][f"test@{num_test_cases}"]['result'][0]['test_counts']
-                if test_counts['passed_tests'] == test_counts['total_tests'] and test_counts['total_tests'] > 0:
-                    passed_tasks_current_run.append(task_id)
-            except:
-                continue
+    # 计时包含进程启动: 与每个变异体的超时所覆盖的范围一致 (cosmic-ray 每个变异体都重新启动 pytest)
+    start_time = time.perf_counter()
+    if engine == 'fork':
+        with span('fork baseline', cat='subprocess') as info:
+            passed = fork_baseline(working_dir, timeout=60*num_test_cases)
+            info['exit'] = 'ok' if passed else 'error'
     else:
-        raise Exception(f"[-] ⚠️ Pytest results not found! Please check {pytest_result_file}.")
-
-    # --- 2. 获取或生成固定抽样名单 (白名单) ---
+        try:
+            traced_run('cosmic-ray baseline', subprocess.run, ['cosmic-ray', 'baseline', 'cosmic-ray.toml'], cwd=working_dir, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=60*num_test_cases)
+            passed = True
+        except Exception as e:
+            passed = False
+    baseline_seconds = round(time.perf_counter() - start_time, 3)
+
+    mark_stage(working_dir, 'baseline', task_fingerprint, passed=passed, seconds=baseline_seconds)
+    set_task_timeout(working_dir, passed, baseline_seconds, timeout_config)
+    return passed
+
+def target_timeout(baseline_seconds, timeout_config):
+    """The per-mutant timeout for a task: fixed, or calibrated from its baseline time."""
+    if timeout_config['mode'] == 'adaptive' and baseline_seconds is not None:
+        return calibrate_timeout(baseline_seconds, timeout_config['multiplier'], timeout_config['floor'], timeout_config['timeout'])
+    return timeout_config['timeout']
+
+def set_task_timeout(working_dir, passed, baseline_seconds, timeout_config):
+    """Write the task's per-mutant timeout into `cosmic-ray.toml`."""
+    if passed and write_timeout(working_dir, target_timeout(baseline_seconds, timeout_config)):
+        # 超时变了: 已有的变异结果是按旧超时得出的, 清空后由 mutate 全部重跑
+        clear_mutation_results(working_dir)
+        clear_stages(working_dir, ['mutate', 'stats'])
+
+def fixed_sample_pool(benchmark_name, model_name, num_test_cases, sample_rate=0.1):
     # 文件名跟 Model，num_test_cases 无关 -> 保证 k=5 和 k=1 使用同一个抽样池
     fixed_sample_file = f'data/{benchmark_name}/fixed_sample_{int(sample_rate*100)}pct.json'
     target_sample_pool = []
@@ -227,6 +321,22 @@ def cosmic_ray_setup(benchmark_name, model_name, num_test_cases=5, sample_rate=0
             json.dump(target_sample_pool, f)
         print(f"[+] 💾 Saved fixed sample pool ({len(target_sample_pool)} tasks)")
 
+    return target_sample_pool
+
+@traced_stage
+def cosmic_ray_setup(benchmark_name, model_name, num_test_cases=5, sample_rate=0.1, engine='cosmic-ray', timeout_config=None):
+    # 定义输出文件路径
+    correct_tasks_path = f'data/{benchmark_name}/correct_tasks_tc_{num_test_cases}_{model_name}'
+
+    # --- 1. 获取所有通过 Pytest 的任务 (候选者) ---
+    if not results_store.has_results(benchmark_name, model_name, num_test_cases):
+        raise Exception(f"[-] ⚠️ Pytest results not found! Please check {results_store.store_path(benchmark_name)}.")
+    print(f"[+] 📖 Reading pytest results from {results_store.store_path(benchmark_name)}")
+    passed_tasks_current_run = results_store.passed_tasks(benchmark_name, model_name, num_test_cases)
+
+    # --- 2. 获取或生成固定抽样名单 (白名单) ---
+    target_sample_pool = fixed_sample_pool(benchmark_name, model_name, num_test_cases, sample_rate)
+
     # --- 3. 计算交集：即将在本次运行 Setup 的任务 ---
     # 逻辑：必须在白名单里 AND 必须通过了当前的测试
     tasks_to_setup = list(set(target_sample_pool) & set(passed_tasks_current_run))
@@ -246,11 +356,13 @@ def cosmic_ray_setup(benchmark_name, model_name, num_test_cases=5, sample_rate=0
 
     # --- 4. 运行 Setup (只针对筛选后的任务) ---
     task_results = process_map(
-        cosmic_ray_setup_wrapper, 
+        trace_task('setup', cosmic_ray_setup_wrapper), 
         [benchmark_name]*len(tasks_to_setup), 
         [model_name]*len(tasks_to_setup), 
         tasks_to_setup, 
         [num_test_cases]*len(tasks_to_setup), 
+        [engine]*len(tasks_to_setup), 
+        [timeout_config]*len(tasks_to_setup), 
         desc="[+] 🔄 Initialize Cosmic-Ray Mutation", 
         chunksize=1
     )
@@ -267,24 +379,16 @@ def cosmic_ray_setup(benchmark_name, model_name, num_test_cases=5, sample_rate=0
     print(f'[+] ✅ Setup finished. Valid tasks ready for mutation: {correct_count}')
 
 def cosmic_ray_status(benchmark_name, model_name, task, num_test_cases):
+    cosmic_ray_path = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task}/cosmic-ray.sqlite'
     try:
-        cosmic_ray_path = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task}/cosmic-ray.sqlite'
-        response = subprocess.run(['cr-report', cosmic_ray_path, '--show-pending'], check=True, capture_output=True, text=True)
+        total_jobs_number, completed_jobs_number, _, _ = read_mutation_counts(cosmic_ray_path)
     except Exception as e:
         print(f'[-] Error @ [{cosmic_ray_path}]: {e}')
         return (False, 0, 0)
-    
-    total_jobs_match = re.search(r"total jobs:\s*(\d+)", response.stdout)
-    completed_jobs_match = re.search(r"complete:\s*(\d+)\s*\(", response.stdout)
-
-    if total_jobs_match and completed_jobs_match:
-        total_jobs_number = int(total_jobs_match.group(1))
-        completed_jobs_number = int(completed_jobs_match.group(1))
-        # print(f"[+] Task {task}: Total jobs: {total_jobs_number}, Completed jobs: {completed_jobs_number}")
-        if total_jobs_number == 0: return (True, 0, 0)
-        return (completed_jobs_number == total_jobs_number, total_jobs_number, completed_jobs_number)
-    else:
-        return (False, 0, 0)
+
+    # print(f"[+] Task {task}: Total jobs: {total_jobs_number}, Completed jobs: {completed_jobs_number}")
+    if total_jobs_number == 0: return (True, 0, 0)
+    return (completed_jobs_number == total_jobs_number, total_jobs_number, completed_jobs_number)
     
 def mutation_status(benchmark_name, model_name, num_test_cases):
     correct_tasks = list()
@@ -295,29 +399,61 @@ def mutation_status(benchmark_name, model_name, num_test_cases):
             correct_tasks.append(line.strip())
     print(f'[+] ✅ Correct Tasks: {len(correct_tasks)}')
     
-    for task in correct_tasks:
-        completed, total_jobs_number, completed_jobs_number = cosmic_ray_status(benchmark_name, model_name, task, num_test_cases)
-        if completed: 
+    statistics = mutation_statistics(benchmark_name, model_name, num_test_cases, correct_tasks, leave=False)
+    for statistic in statistics:
+        task, total_jobs_number, completed_jobs_number = statistic['task'], statistic['total_jobs_number'], statistic['completed_jobs_number']
+        if completed_jobs_number == total_jobs_number: 
             print(f'[+] Task {task}: Completed ({completed_jobs_number}/{total_jobs_number})')
         else: 
             print(f'[-] Task {task}: Incompleted ({completed_jobs_number}/{total_jobs_number})')
+    report_timeouts(statistics)
+
+def report_timeouts(statistics):
+    incomplete_tasks, timeout_jobs, timeout_seconds = summarize_timeouts(statistics)
+    print(f'[+] ⏳ Timed-out mutants: {timeout_jobs} ({timeout_seconds:.0f}s spent waiting on timeouts) | Incomplete tasks: {incomplete_tasks}/{len(statistics)}')
 
-def mutation_run_wrapper(benchmark_name, model_name, num_test_cases, task):
+def mutation_run_wrapper(benchmark_name, model_name, num_test_cases, task, engine='cosmic-ray', coverage_guided=False, timeout_mode='fixed'):
     # cosmic-ray exec tutorial.toml tutorial.sqlite
-    completed, _, _ = cosmic_ray_status(benchmark_name, model_name, task, num_test_cases)
-    if completed: return
+    working_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task}'
+    task_fingerprint = mutate_fingerprint(working_dir)
+    if stage_done(working_dir, 'mutate', task_fingerprint, outputs=['cosmic-ray.sqlite']): return True
+
+    completed, total_jobs_number, completed_jobs_number = cosmic_ray_status(benchmark_name, model_name, task, num_test_cases)
+    if completed:
+        mark_stage(working_dir, 'mutate', task_fingerprint)
+        return True
+
+    # 固定上限 360*k 秒; adaptive 模式按剩余变异体数和该任务的超时时间计算
+    time_budget = 360*num_test_cases
+    baseline_info = stage_info(working_dir, 'baseline') or {}
+    if timeout_mode == 'adaptive' and baseline_info.get('seconds') is not None and read_timeout(working_dir) is not None:
+        time_budget = task_time_budget(total_jobs_number - completed_jobs_number, read_timeout(working_dir), baseline_info['seconds'])
 
     # print(f"[+] Task {task}: Running mutations")
-    working_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task}'
     try:
-        subprocess.run(['cosmic-ray', 'exec', f'cosmic-ray.toml', f'cosmic-ray.sqlite'], cwd=working_dir, check=True, timeout=360*num_test_cases)
+        if coverage_guided:
+            # 没有任何测试执行到的变异体直接记为 survived，不再运行
+            mark_uncovered_mutants(working_dir)
+        if engine == 'fork':
+            # 进程内引擎: 每个变异体 fork 一次, 不再重新启动 pytest / 重新导入 numpy、pandas
+            with span('fork exec', cat='subprocess'):
+                fork_exec(working_dir, timeout=time_budget, coverage_guided=coverage_guided)
+        else:
+            traced_run('cosmic-ray exec', subprocess.run, ['cosmic-ray', 'exec', f'cosmic-ray.toml', f'cosmic-ray.sqlite'], cwd=working_dir, check=True, timeout=time_budget)
     except subprocess.TimeoutExpired as e:
         # print(f'[-] mutation_run_wrapper, Timeout: {e}')
         pass
     except Exception as e:
         print(f'[-] mutation_run_wrapper, Error: {e}')
 
-def mutation_run(benchmark_name, model_name, num_test_cases):
+    # 超时或中断的任务不记录, 下次运行只补跑剩余的变异体
+    completed, _, _ = cosmic_ray_status(benchmark_name, model_name, task, num_test_cases)
+    if completed:
+        mark_stage(working_dir, 'mutate', task_fingerprint)
+    return completed
+
+@traced_stage
+def mutation_run(benchmark_name, model_name, num_test_cases, engine='cosmic-ray', coverage_guided=False, timeout_mode='fixed'):
     correct_tasks = list()
     correct_tasks_path = f'data/{benchmark_name}/correct_tasks_tc_5_{model_name}'
     
@@ -328,47 +464,9 @@ def mutation_run(benchmark_name, model_name, num_test_cases):
 
     print("================================================")
     print(f'[+] ⏱️ Start time: {datetime.datetime.now()}')
-    process_map(mutation_run_wrapper, [benchmark_name]*len(correct_tasks), [model_name]*len(correct_tasks), [num_test_cases]*len(correct_tasks), correct_tasks, desc="[+] 🔮 Running mutations...")
+    process_map(trace_task('mutate', mutation_run_wrapper), [benchmark_name]*len(correct_tasks), [model_name]*len(correct_tasks), [num_test_cases]*len(correct_tasks), correct_tasks, [engine]*len(correct_tasks), [coverage_guided]*len(correct_tasks), [timeout_mode]*len(correct_tasks), desc="[+] 🔮 Running mutations...")
     print(f'[+] ⏱️ End time: {datetime.datetime.now()}')
-
-def mutation_statistic_wrapper(benchmark_name, model_name, num_test_cases, task):
-    working_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task}'
-
-    statistic_info = {
-        "task": task,
-        "complete_rate": 0.0,
-        "surviving_mutants_rate": 0.0,
-        "total_jobs_number": 0,
-        "completed_jobs_number": 0,
-        "surviving_mutants_number": 0
-    }
-
-    try:
-        response = subprocess.run(['cr-report', f'cosmic-ray.sqlite', '--show-pending'], cwd=working_dir, check=True, capture_output=True, text=True)
-    except Exception as e:
-        print(f'[-] Error @ [{working_dir}]: {e}')
-        return statistic_info
-
-    total_jobs_match = re.search(r"total jobs:\s*(\d+)", response.stdout)
-    completed_jobs_match = re.search(r"complete:\s*(\d+)\s*\(", response.stdout)
-    surviving_mutants_match = re.search(r"surviving mutants:\s*(\d+)\s*\(", response.stdout)
-
-    if total_jobs_match:
-        total_jobs_number = int(total_jobs_match.group(1))
-        statistic_info["total_jobs_number"] = total_jobs_number
-
-    if completed_jobs_match:
-        completed_jobs_number = int(completed_jobs_match.group(1))
-        statistic_info["completed_jobs_number"] = completed_jobs_number
-        
-    if surviving_mutants_match:
-        surviving_mutants_number = int(surviving_mutants_match.group(1))
-        statistic_info["surviving_mutants_number"] = surviving_mutants_number
-    
-    statistic_info['complete_rate'] = statistic_info['completed_jobs_number'] / statistic_info["total_jobs_number"] if statistic_info["total_jobs_number"] > 0 else 0
-    statistic_info['surviving_mutants_rate'] = (statistic_info['surviving_mutants_number'] / statistic_info['completed_jobs_number']) if statistic_info['completed_jobs_number'] > 0 else 0
-
-    return statistic_info
+    report_timeouts(mutation_statistics(benchmark_name, model_name, num_test_cases, correct_tasks, record=True, leave=False))
 
 def mutation_statistic(benchmark_name, model_name, num_test_cases, baseline_test_cases=5):
     correct_tasks = list()
@@ -381,108 +479,119 @@ def mutation_statistic(benchmark_name, model_name, num_test_cases, baseline_test
     
     surviving_mutants_rate = 0.0
 
-    statistics = process_map(mutation_statistic_wrapper, [benchmark_name]*len(correct_tasks), [model_name]*len(correct_tasks), [num_test_cases]*len(correct_tasks), correct_tasks, desc=f"[+] 🔄 Running mutation ({num_test_cases} test cases) statistics...", chunksize=1)
+    statistics = mutation_statistics(benchmark_name, model_name, num_test_cases, correct_tasks, desc=f"[+] 🔄 Running mutation ({num_test_cases} test cases) statistics...")
     for statistic in statistics:
         print(f"[+] {statistic}")
         surviving_mutants_rate += statistic["surviving_mutants_rate"]
+    report_timeouts(statistics)
     
     surviving_mutants_rate = (surviving_mutants_rate / len(correct_tasks)) if len(correct_tasks) > 0 else 0.0
     print(f'[+] ✅ Surviving Mutants Rate: {surviving_mutants_rate:.2%} \n')
 
     return surviving_mutants_rate
 
-def pytest_run_wrapper(benchmark_name, model_name, task_id, num_test_cases):
-    base_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task_id}'
-    test_file_path = f'{base_dir}/test.py'
-    source_code_path = base_dir
-    
+def pytest_cov_run(test_file_path, source_code_path, backend='subprocess'):
+    """Run `pytest --cov` on one test file and return the `test_at_k_data` pair (test counts, coverage)."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        abs_test_file_path = os.path.abspath(test_file_path)
+        abs_source_code_path = os.path.abspath(source_code_path)
+        json_report_path = os.path.join(temp_dir, "coverage.json")
+
+        coveragerc_path = os.path.join(temp_dir, ".coveragerc")
+        with open(coveragerc_path, "w") as f:
+            f.write("[run]\n")
+            f.write("omit = *test.py\n") # 忽略所有以 test.py 结尾的文件
+
+        # 1. 运行 Pytest 并生成 JSON 报告
+        cmd = [
+            'pytest', 
+            abs_test_file_path, 
+            f'--cov={abs_source_code_path}', 
+            '--cov-branch',
+            f'--cov-config={coveragerc_path}', # 指定配置文件
+            f'--cov-report=json:{json_report_path}'
+        ]
+        
+        if backend == 'warm':
+            result = traced_run('pytest --cov (warm)', run_pytest_forked, cmd[1:], cwd=temp_dir, timeout=30)
+        else:
+            result = traced_run('pytest --cov', zygote_run, cmd, cwd=temp_dir, capture_output=True, text=True, timeout=30)
+        
+        # 2. 获取通过用例数 (result[0])
+        # 依然使用 parse_pytest_output 解析 stdout 来获取 passed/failed 数量
+        # 因为 coverage.json 里通常不包含具体的测试通过数
+        stdout_metrics = parse_pytest_output(result.stdout)
+        passed_tests = stdout_metrics.get("passed_tests", 0)
+        total_tests_run = stdout_metrics.get("total_tests", 0)
+
+        # 3. 获取覆盖率详情 (result[1])
+        coverage_stats = {"stmts": 0, "miss_stmts": 0, "covered_branches": 0, "total_branches": 0}
+        if os.path.exists(json_report_path):
+            with open(json_report_path, 'r') as f:
+                cov_data = json.load(f)
+            coverage_stats = coverage_totals_to_stats(cov_data.get('totals', {}))
+
+        # 4. 构建符合统计脚本要求的格式
+        return [
+            {
+                "test_counts": {
+                    "passed_tests": passed_tests,
+                    "total_tests": total_tests_run
+                }
+            },
+            coverage_stats
+        ]
+
+def coverage_totals_to_stats(totals):
+    stmts = totals.get('num_statements', 0)
+    covered_lines = totals.get('covered_lines', 0)
+    return {
+        "stmts": stmts,
+        "miss_stmts": stmts - covered_lines, # 统计脚本需要 miss_stmts
+        "covered_branches": totals.get('covered_branches', 0),
+        "total_branches": totals.get('num_branches', 0)
+    }
+
+def empty_test_at_k_data(num_test_cases):
     # 默认空数据结构，防止报错
-    empty_stats = [
+    return [
         {"test_counts": {"passed_tests": 0, "total_tests": num_test_cases}},
         {"stmts": 0, "miss_stmts": 0, "covered_branches": 0, "total_branches": 0}
     ]
 
-    try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            abs_test_file_path = os.path.abspath(test_file_path)
-            abs_source_code_path = os.path.abspath(source_code_path)
-            json_report_path = os.path.join(temp_dir, "coverage.json")
+def pytest_run_wrapper(benchmark_name, model_name, task_id, num_test_cases, backend='subprocess'):
+    base_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task_id}'
 
-            coveragerc_path = os.path.join(temp_dir, ".coveragerc")
-            with open(coveragerc_path, "w") as f:
-                f.write("[run]\n")
-                f.write("omit = *test.py\n") # 忽略所有以 test.py 结尾的文件
+    # 'warm' 模式：当前 worker 只导入一次 pytest/coverage/numpy/pandas，每个任务在 fork 出的子进程中运行
+    if backend == 'warm':
+        preload_modules()
 
-            # 1. 运行 Pytest 并生成 JSON 报告
-            cmd = [
-                'pytest', 
-                abs_test_file_path, 
-                f'--cov={abs_source_code_path}', 
-                '--cov-branch',
-                f'--cov-config={coveragerc_path}', # 指定配置文件
-                f'--cov-report=json:{json_report_path}'
-            ]
-            
-            result = subprocess.run(cmd, cwd=temp_dir, capture_output=True, text=True, timeout=30)
-            
-            # 2. 获取通过用例数 (result[0])
-            # 依然使用 parse_pytest_output 解析 stdout 来获取 passed/failed 数量
-            # 因为 coverage.json 里通常不包含具体的测试通过数
-            stdout_metrics = parse_pytest_output(result.stdout)
-            passed_tests = stdout_metrics.get("passed_tests", 0)
-            total_tests_run = stdout_metrics.get("total_tests", 0)
-
-            # 3. 获取覆盖率详情 (result[1])
-            stmts = 0
-            miss_stmts = 0
-            covered_branches = 0
-            total_branches = 0
-
-            if os.path.exists(json_report_path):
-                with open(json_report_path, 'r') as f:
-                    cov_data = json.load(f)
-                totals = cov_data.get('totals', {})
-                
-                stmts = totals.get('num_statements', 0)
-                covered_lines = totals.get('covered_lines', 0)
-                miss_stmts = stmts - covered_lines # 统计脚本需要 miss_stmts
-                
-                covered_branches = totals.get('covered_branches', 0)
-                total_branches = totals.get('num_branches', 0)
-
-            # 4. 构建符合统计脚本要求的格式
-            formatted_result = [
-                {
-                    "test_counts": {
-                        "passed_tests": passed_tests,
-                        "total_tests": total_tests_run
-                    }
-                },
-                {
-                    "stmts": stmts,
-                    "miss_stmts": miss_stmts,
-                    "covered_branches": covered_branches,
-                    "total_branches": total_branches
-                }
-            ]
-
-            return {
-                'model_name': model_name, 
-                'task': task_id, 
-                'test_at_k_data': formatted_result, # 将格式化好的数据传出去
-                "status": "success"
-            }
+    try:
+        formatted_result = pytest_cov_run(f'{base_dir}/test.py', base_dir, backend=backend)
+        res = {
+            'model_name': model_name, 
+            'task': task_id, 
+            'test_at_k_data': formatted_result, # 将格式化好的数据传出去
+            "status": "success"
+        }
             
     except Exception as e:
         print(f"[-] Error in task {task_id}: {e}")
-        return {
+        res = {
             'model_name': model_name, 
             'task': task_id, 
-            'test_at_k_data': empty_stats, 
+            'test_at_k_data': empty_test_at_k_data(num_test_cases), 
             "status": "error"
         }
 
-def pytest_run(benchmark_name, model_name, num_test_cases):
+    # 任务结束即写入结果库 (data/{benchmark}/results.sqlite)
+    results_store.record_results(benchmark_name, model_name, task_id, {num_test_cases: res['test_at_k_data']}, res['status'])
+    if res['status'] == 'success':
+        mark_stage(base_dir, 'pytest', pytest_fingerprint(base_dir))
+    return res
+
+@traced_stage
+def pytest_run(benchmark_name, model_name, num_test_cases, backend='subprocess'):
     tasks = list()
     work_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}'
     
@@ -502,120 +611,543 @@ def pytest_run(benchmark_name, model_name, num_test_cases):
     except:
         task_files.sort()
 
-    tasks = task_files
+    # 只运行新增或输入发生变化的任务; 已删除任务的旧结果从结果库中移除
+    results_store.prune_tasks(benchmark_name, model_name, [num_test_cases], task_files)
+    recorded = results_store.recorded_tasks(benchmark_name, model_name, num_test_cases)
+    tasks = [
+        task for task in task_files
+        if task not in recorded or not stage_done(f'{work_dir}/{task}', 'pytest', pytest_fingerprint(f'{work_dir}/{task}'))
+    ]
+    print(f"[+] ⏭️ Skipping {len(task_files) - len(tasks)} unchanged tasks, running {len(tasks)}")
             
-    results = process_map(pytest_run_wrapper, 
+    results = process_map(trace_task('pytest', pytest_run_wrapper), 
                           [benchmark_name]*len(tasks), 
                           [model_name]*len(tasks), 
                           tasks, 
                           [num_test_cases]*len(tasks), 
+                          [backend]*len(tasks), 
                           desc="[+] 🔄 Running pytest", 
                           chunksize=1)
     
-    # --- 核心修改：构建最终的大列表 ---
-    final_output_list = []
-    
-    for res in results:
-        # 构建统计脚本 analyze_test_at_k_results 需要的 entry 结构
-        # 结构: entry["test_at_k"][f"test@{k}"]["result"]...
-        
-        # 这里的 key 是 "test@5" (如果 num_test_cases=5)
-        k_key = f"test@{num_test_cases}"
-        
-        entry = {
-            "task_id": res['task'], # 保留 task_id 方便调试
-            "test_at_k": {
-                k_key: {
-                    "result": res['test_at_k_data']
-                }
-            }
+    error_count = sum(1 for res in results if res['status'] == 'error')
+    print(f"[+] ✅ Pytest results for {len(results)} tasks ({error_count} errors) saved to {results_store.store_path(benchmark_name)}")
+
+def extract_test_names(test):
+    """Top-level test functions and classes defined by one generated test case."""
+    functions, classes = [], []
+    try:
+        tree = ast.parse(test)
+    except Exception:
+        return functions, classes
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.append(node.name)
+        elif isinstance(node, ast.ClassDef):
+            classes.append(node.name)
+    return functions, classes
+
+def parse_junit_outcomes(junit_path):
+    """Returns [(class_name, test_name, outcome)] for every test item in a pytest junit report."""
+    outcomes = []
+    for case in ET.parse(junit_path).getroot().iter('testcase'):
+        class_name = case.get('classname', '').split('.')[-1]
+        test_name = case.get('name', '').split('[')[0]
+        errors = case.findall('error')
+        if case.find('failure') is not None:
+            outcome = 'failed'
+        elif errors and not all(e.get('message', '').startswith('failed on teardown') for e in errors):
+            outcome = 'error'
+        elif case.find('skipped') is not None:
+            outcome = 'skipped'
+        else:
+            # teardown 报错不影响 pytest summary 中的 passed 计数
+            outcome = 'passed'
+        outcomes.append((class_name, test_name, outcome))
+    return outcomes
+
+def pytest_single_pass_wrapper(benchmark_name, model_name, task_id, max_num_test_cases, backend='subprocess'):
+    res = pytest_single_pass_task(benchmark_name, model_name, task_id, max_num_test_cases, backend)
+    # 任务结束即写入结果库 (data/{benchmark}/results.sqlite)
+    results_store.record_results(benchmark_name, model_name, task_id, res['test_at_k'], res['status'])
+    if res['status'] != 'error':
+        base_dir = f'data/{benchmark_name}/mutation_{max_num_test_cases}/{model_name}/{task_id}'
+        mark_stage(base_dir, 'pytest_single_pass', pytest_single_pass_fingerprint(base_dir), outputs=res.get('outputs', []))
+    return res
+
+def pytest_single_pass_task(benchmark_name, model_name, task_id, max_num_test_cases, backend='subprocess'):
+    """
+    Runs the k=max_num_test_cases suite once with per-test coverage contexts and derives test@1..test@K
+    from prefix unions. Falls back to one run per prefix when the suite cannot be run as a whole
+    (collection error, timeout), so that every k still matches a dedicated run.
+    """
+    import coverage
+
+    base_dir = f'data/{benchmark_name}/mutation_{max_num_test_cases}/{model_name}/{task_id}'
+    k_values = list(range(1, max_num_test_cases + 1))
+
+    if backend == 'warm':
+        preload_modules()
+
+    try:
+        with open(f'{base_dir}/tests.json', 'r') as f:
+            tests = json.load(f)
+
+        # 测试名 -> 第几个生成的测试
+        owner_functions, owner_classes = dict(), dict()
+        shadowed = False
+        for idx, test in enumerate(tests):
+            functions, classes = extract_test_names(test)
+            for name in functions:
+                shadowed = shadowed or name in owner_functions
+                owner_functions[name] = idx
+            for name in classes:
+                shadowed = shadowed or name in owner_classes
+                owner_classes[name] = idx
+
+        # 后面的测试覆盖了前面的同名测试时，前缀结果无法从整套运行中推出
+        if shadowed:
+            return pytest_prefix_fallback(model_name, task_id, base_dir, tests, k_values, backend)
+
+        def owner_of(class_name, test_name):
+            # None: 不属于任何生成的测试 (例如通过 `from mod import *` 收集到的函数)，对所有 k 都计入
+            if class_name in owner_classes:
+                return owner_classes[class_name]
+            return owner_functions.get(test_name)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            abs_test_file_path = os.path.abspath(f'{base_dir}/test.py')
+            abs_source_code_path = os.path.abspath(base_dir)
+            junit_path = os.path.join(temp_dir, "junit.xml")
+            data_file_path = os.path.join(temp_dir, ".coverage")
+
+            coveragerc_path = os.path.join(temp_dir, ".coveragerc")
+            with open(coveragerc_path, "w") as f:
+                f.write("[run]\n")
+                f.write("omit = *test.py\n")
+                f.write("branch = True\n")
+                f.write(f"data_file = {data_file_path}\n")
+
+            cmd = [
+                'pytest',
+                abs_test_file_path,
+                f'--cov={abs_source_code_path}',
+                '--cov-branch',
+                f'--cov-config={coveragerc_path}',
+                '--cov-context=test', # 每个测试单独记录覆盖 (coverage dynamic contexts)
+                '--cov-report=',
+                f'--junitxml={junit_path}'
+            ]
+
+            try:
+                if backend == 'warm':
+                    result = traced_run('pytest --cov (warm)', run_pytest_forked, cmd[1:], cwd=temp_dir, timeout=30)
+                else:
+                    result = traced_run('pytest --cov', zygote_run, cmd, cwd=temp_dir, capture_output=True, text=True, timeout=30)
+                single_pass_ok = result.returncode in (0, 1) and os.path.exists(junit_path) and os.path.exists(data_file_path)
+            except subprocess.TimeoutExpired:
+                single_pass_ok = False
+
+            if not single_pass_ok:
+                return pytest_prefix_fallback(model_name, task_id, base_dir, tests, k_values, backend)
+
+            # 1. 每个测试的通过情况
+            passed_by_test, failed_by_test = defaultdict(int), defaultdict(int)
+            for class_name, test_name, outcome in parse_junit_outcomes(junit_path):
+                idx = owner_of(class_name, test_name)
+                if outcome == 'passed':
+                    passed_by_test[idx] += 1
+                elif outcome == 'failed':
+                    failed_by_test[idx] += 1
+
+            # 2. 每个测试的覆盖 (context -> 测试编号)
+            cov = coverage.Coverage(data_file=data_file_path, config_file=coveragerc_path)
+            cov.load()
+            cov_data = cov.get_data()
+            context_owner = dict()
+            for context in cov_data.measured_contexts():
+                if context == '':
+                    context_owner[context] = None # import 阶段执行的代码
+                    continue
+                parts = context.split('|')[0].split('::')
+                if len(parts) > 2:
+                    context_owner[context] = owner_of(parts[1], parts[-1].split('[')[0])
+                else:
+                    context_owner[context] = owner_of(None, parts[-1].split('[')[0])
+
+            test_at_k = dict()
+            json_report_path = os.path.join(temp_dir, "coverage.json")
+            for k in k_values:
+                in_prefix = lambda idx: idx is None or idx < k
+                passed_tests = sum(n for idx, n in passed_by_test.items() if in_prefix(idx))
+                failed_tests = sum(n for idx, n in failed_by_test.items() if in_prefix(idx))
+
+                contexts = ['^' + re.escape(context) + '$' for context, idx in context_owner.items() if in_prefix(idx)]
+                cov.json_report(outfile=json_report_path, contexts=contexts)
+                with open(json_report_path, 'r') as f:
+                    totals = json.load(f).get('totals', {})
+
+                test_at_k[k] = [
+                    {"test_counts": {"passed_tests": passed_tests, "total_tests": passed_tests + failed_tests}},
+                    coverage_totals_to_stats(totals)
+                ]
+
+            # 3. 保存逐测试的行覆盖，供变异阶段使用 (每个 mutation_k 目录只保留前 k 个测试)
+            mod_path = os.path.join(abs_source_code_path, 'mod.py')
+            lines_by_test = defaultdict(set)
+            for lineno, line_contexts in cov_data.contexts_by_lineno(mod_path).items():
+                for context in line_contexts:
+                    lines_by_test[context_owner.get(context)].add(lineno)
+            outputs = []
+            for k in k_values:
+                k_dir = f'data/{benchmark_name}/mutation_{k}/{model_name}/{task_id}'
+                if not os.path.exists(k_dir):
+                    continue
+                write_test_coverage(k_dir, tests[:k], lines_by_test, passed_by_test, failed_by_test)
+                outputs.append(os.path.relpath(f'{k_dir}/test_coverage.json', base_dir))
+
+        return {
+            'model_name': model_name,
+            'task': task_id,
+            'test_at_k': test_at_k,
+            'outputs': outputs,
+            "status": "success"
         }
-        final_output_list.append(entry)
-    
-    # --- 写入文件 ---
-    # 注意：统计脚本用 json.load(f) 读取，所以这里必须 dump 整个列表，不能是 jsonl
-    output_file = f'{work_dir}/{model_name}_{num_test_cases}.json' 
-    # 我把后缀改成了 .json 以示区别，但你的统计脚本里可能是 .jsonl，请注意对应
-    
-    with open(output_file, 'w') as f:
-        json.dump(final_output_list, f, indent=2)
-        
-    print(f"[+] ✅ Pytest results saved to {output_file}")
 
-def merge_k_results(benchmark_name, model_name, k_values_list):
-    print(f"[+] 🔗 Merging results for {model_name} with k={k_values_list}...")
-    
-    # 使用字典按 task_id 聚合数据
-    # 结构: merged_data["task_0"]["test_at_k"]["test@5"] = ...
-    merged_data = defaultdict(lambda: {"task_id": "", "test_at_k": {}})
-    
-    files_found = 0
+    except Exception as e:
+        print(f"[-] Error in task {task_id}: {e}")
+        return {
+            'model_name': model_name,
+            'task': task_id,
+            'test_at_k': {k: empty_test_at_k_data(k) for k in k_values},
+            "status": "error"
+        }
 
-    for k in k_values_list:
-        # 对应 pytest_run 中生成的文件路径
-        part_file = f'data/{benchmark_name}/mutation_{k}/{model_name}/{model_name}_{k}.json'
-        
-        if os.path.exists(part_file):
-            files_found += 1
-            with open(part_file, 'r') as f:
-                data = json.load(f)
-                
-            for entry in data:
-                t_id = entry['task_id']
-                # 确保 task_id 字段存在
-                merged_data[t_id]['task_id'] = t_id
-                
-                # 将当前的 test@k 数据更新到大字典中
-                # entry['test_at_k'] 类似于 {"test@5": {...}}
-                merged_data[t_id]['test_at_k'].update(entry['test_at_k'])
-        else:
-            print(f"[-] ⚠️ Warning: Partial result file not found: {part_file}")
+def write_test_coverage(task_dir, tests, lines_by_test, passed_by_test, failed_by_test):
+    """Per-test line coverage of `mod.py`; `always_lines` are executed regardless of which tests run."""
+    lines = defaultdict(list)
+    for idx in range(len(tests)):
+        for lineno in lines_by_test.get(idx, ()):
+            lines[lineno].append(idx)
+    test_coverage = {
+        "tests": [
+            {
+                "index": idx,
+                "names": sum(extract_test_names(test), []),
+                "passed_tests": passed_by_test.get(idx, 0),
+                "failed_tests": failed_by_test.get(idx, 0)
+            }
+            for idx, test in enumerate(tests)
+        ],
+        "always_lines": sorted(lines_by_test.get(None, ())),
+        "lines": {str(lineno): sorted(idxs) for lineno, idxs in sorted(lines.items())}
+    }
+    with open(f'{task_dir}/test_coverage.json', 'w') as f:
+        json.dump(test_coverage, f)
+
+def pytest_prefix_fallback(model_name, task_id, base_dir, tests, k_values, backend='subprocess'):
+    test_at_k = dict()
+    header = read_task_header(base_dir)
+    for k in k_values:
+        # 文件名以 test.py 结尾 -> 被 .coveragerc 的 omit 排除
+        prefix_file_path = f'{base_dir}/prefix_{k}_test.py'
+        with open(prefix_file_path, 'w') as f:
+            f.write(build_test_code(tests[:k], header))
+        try:
+            test_at_k[k] = pytest_cov_run(prefix_file_path, base_dir, backend=backend)
+        except Exception as e:
+            print(f"[-] Error in task {task_id} (test@{k}): {e}")
+            test_at_k[k] = empty_test_at_k_data(k)
+        finally:
+            os.remove(prefix_file_path)
+    return {
+        'model_name': model_name,
+        'task': task_id,
+        'test_at_k': test_at_k,
+        "status": "fallback"
+    }
 
-    if files_found == 0:
-        print(f"[-] No files found to merge for {model_name}")
+@traced_stage
+def pytest_run_single_pass(benchmark_name, model_name, max_num_test_cases, backend='subprocess'):
+    """
+    One pytest run per task over the first `max_num_test_cases` tests; records test@1..test@K of every task
+    in the results store and exports the merged `pytest_results/{model}.json`.
+    """
+    work_dir = f'data/{benchmark_name}/mutation_{max_num_test_cases}/{model_name}'
+    
+    if not os.path.exists(work_dir):
+        print(f"[-] Directory not found: {work_dir}")
         return
 
-    # 转换为列表并排序
-    final_list = list(merged_data.values())
-    
-    # 按 task_id 数字排序 (task_0, task_1...)
+    tasks = [t for t in os.listdir(work_dir) if t.startswith('task_')]
     try:
-        final_list.sort(key=lambda x: int(x['task_id'].split('_')[1]))
+        tasks.sort(key=lambda x: int(x.split('_')[1]))
     except:
-        final_list.sort(key=lambda x: x['task_id'])
+        tasks.sort()
+    # 只运行新增或输入发生变化的任务 (需要 test@1..test@K 的结果都在库中)
+    k_values = range(1, max_num_test_cases + 1)
+    results_store.prune_tasks(benchmark_name, model_name, k_values, tasks)
+    recorded = set(tasks)
+    for k in k_values:
+        recorded &= results_store.recorded_tasks(benchmark_name, model_name, k)
+    all_tasks = tasks
+    tasks = [
+        task for task in all_tasks
+        if task not in recorded or not stage_done(f'{work_dir}/{task}', 'pytest_single_pass', pytest_single_pass_fingerprint(f'{work_dir}/{task}'))
+    ]
+    print(f"[+] ⏭️ Skipping {len(all_tasks) - len(tasks)} unchanged tasks, running {len(tasks)}")
 
-    # 保存最终合并文件
-    # 建议保存在 benchmark 根目录下，或者你指定的 results 目录
-    output_dir = f'data/{benchmark_name}/pytest_results'
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        
-    final_output_path = f'{output_dir}/{model_name}.json'
-    
-    with open(final_output_path, 'w') as f:
-        json.dump(final_list, f, indent=2)
-        
-    print(f"[+] 🎉 Successfully merged {files_found} files into: {final_output_path}")
+    results = process_map(trace_task('pytest_single_pass', pytest_single_pass_wrapper), 
+                          [benchmark_name]*len(tasks), 
+                          [model_name]*len(tasks), 
+                          tasks, 
+                          [max_num_test_cases]*len(tasks), 
+                          [backend]*len(tasks), 
+                          desc=f"[+] 🔄 Running pytest (single pass, test@1..{max_num_test_cases})", 
+                          chunksize=1)
+
+    fallback_count = sum(1 for res in results if res['status'] == 'fallback')
+    print(f"[+] ✅ Single pass finished ({fallback_count} tasks fell back to per-k runs)")
+
+    merge_k_results(benchmark_name, model_name, list(range(1, max_num_test_cases + 1)))
+
+@traced_stage
+def merge_k_results(benchmark_name, model_name, k_values_list):
+    """Export the store's test@k rows of one model to `pytest_results/{model}.json` (the old merged JSON layout)."""
+    print(f"[+] 🔗 Exporting results for {model_name} with k={k_values_list}...")
+
+    if not results_store.has_results(benchmark_name, model_name):
+        print(f"[-] No results found to export for {model_name}")
+        return
+
+    final_output_path = f'data/{benchmark_name}/pytest_results/{model_name}.json'
+    task_count = results_store.export_json(benchmark_name, model_name, k_values_list, final_output_path)
+    print(f"[+] 🎉 Successfully exported {task_count} tasks into: {final_output_path}")
+
+# Scheduled pipeline: 所有模型、k 和阶段作为一个 job DAG 运行 (见 scheduler.py)，阶段之间没有 process_map 屏障
+MUTANTS_PER_COMPLEXITY = 15
+
+def list_tasks(work_dir):
+    tasks = [t for t in os.listdir(work_dir) if t.startswith('task_')] if os.path.exists(work_dir) else []
+    return sorted(tasks, key=results_store.task_sort_key)
+
+def estimate_mutants(benchmark_name, task_dir, complexity):
+    """Pending mutants of the task's session; before setup, the catalogue's count or a complexity-based guess."""
+    for session_path in [f'{task_dir}/cosmic-ray.sqlite', catalogue_session_path(benchmark_name, task_dir)]:
+        if os.path.exists(session_path):
+            try:
+                total_jobs_number, completed_jobs_number, _, _ = read_mutation_counts(session_path)
+                return total_jobs_number - completed_jobs_number
+            except Exception:
+                pass
+    return MUTANTS_PER_COMPLEXITY * complexity
+
+def pytest_job_done(benchmark_name, model_name, task_id, num_test_cases):
+    task_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task_id}'
+    recorded = results_store.task_counts(benchmark_name, model_name, task_id, num_test_cases) is not None
+    return recorded and stage_done(task_dir, 'pytest', pytest_fingerprint(task_dir)), None
+
+def single_pass_job_done(benchmark_name, model_name, task_id, max_num_test_cases):
+    task_dir = f'data/{benchmark_name}/mutation_{max_num_test_cases}/{model_name}/{task_id}'
+    recorded = all(results_store.task_counts(benchmark_name, model_name, task_id, k) is not None for k in range(1, max_num_test_cases + 1))
+    return recorded and stage_done(task_dir, 'pytest_single_pass', pytest_single_pass_fingerprint(task_dir)), None
+
+def setup_job_ready(results, benchmark_name, model_name, task_id, num_test_cases, sample_pool):
+    # 与 cosmic_ray_setup 相同: 必须在抽样名单里 AND 前 k 个测试全部通过
+    if task_id not in sample_pool:
+        return False
+    counts = results_store.task_counts(benchmark_name, model_name, task_id, num_test_cases)
+    return counts is not None and counts[1] > 0 and counts[0] == counts[1]
+
+def setup_job_done(benchmark_name, model_name, task_id, num_test_cases, timeout_config):
+    task_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task_id}'
+    if not stage_done(task_dir, 'baseline', baseline_fingerprint(task_dir), outputs=['cosmic-ray.sqlite']):
+        return False, None
+    info = stage_info(task_dir, 'baseline')
+    # 超时配置变了也要重新运行 setup (只重写 toml, 不重跑 baseline)
+    if info['passed'] and read_timeout(task_dir) != target_timeout(info.get('seconds'), timeout_config):
+        return False, None
+    return True, info['passed']
+
+def mutate_job_ready(results, setup_job_id, reference_setup_job_id):
+    # 与 mutation_run 相同: 每个 k 都只变异 correct_tasks_tc_{max k} 中的任务 (该 k 的 setup 需已运行)
+    return results.get(reference_setup_job_id) is True and results.get(setup_job_id) is not None
+
+def mutate_job_done(benchmark_name, model_name, task_id, num_test_cases):
+    task_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task_id}'
+    return stage_done(task_dir, 'mutate', mutate_fingerprint(task_dir), outputs=['cosmic-ray.sqlite']), True
+
+@traced_stage
+def scheduled_pipeline(benchmark_name, models, k_values, num_samples, single_pass=False, backend='subprocess', engine='cosmic-ray',
+                       coverage_guided=False, timeout_config=None, sample_rate=0.1, fresh=False, max_workers=None, execution_backend=None, header_mode='full'):
+    """
+    Runs pytest -> setup -> mutate for every (model, k, task) as one job DAG, longest critical path first.
+    In single-pass mode one pytest job per task (on the largest k) feeds the setup of every k.
+    `execution_backend` defaults to a local process pool; see `distributed.Coordinator` for remote workers.
+    """
+    timeout_config = timeout_config or {'mode': 'fixed', 'timeout': 10}
+    max_num_test_cases = max(k_values)
+    pytest_k_values = list(range(1, max_num_test_cases + 1)) if single_pass else list(k_values)
+
+    for model_name in models:
+        for num_test_cases in k_values:
+            cosmic_ray_init(benchmark_name, model_name, f'src/results/{model_name}_format.jsonl', timeout=timeout_config['timeout'], num_samples=num_samples, num_test_cases=num_test_cases, fresh=fresh, header_mode=header_mode)
+
+    jobs, setup_jobs = [], defaultdict(list)
+    for model_name in models:
+        tasks = list_tasks(f'data/{benchmark_name}/mutation_{max_num_test_cases}/{model_name}')
+        results_store.prune_tasks(benchmark_name, model_name, pytest_k_values, tasks)
+        sample_pools = {k: set(fixed_sample_pool(benchmark_name, model_name, k, sample_rate)) for k in k_values}
+
+        for task_id in tasks:
+            with open(f'data/{benchmark_name}/mutation_{max_num_test_cases}/{model_name}/{task_id}/mod.py', 'r') as f:
+                complexity = cyclomatic_complexity(f.read())
+
+            if single_pass:
+                single_pass_job_id = f'{model_name}/{task_id}/pytest@1..{max_num_test_cases}'
+                jobs.append(make_job(
+                    single_pass_job_id, 'pytest_single_pass', pytest_single_pass_wrapper,
+                    (benchmark_name, model_name, task_id, max_num_test_cases, backend),
+                    units=partial(int, complexity),
+                    done=partial(single_pass_job_done, benchmark_name, model_name, task_id, max_num_test_cases),
+                    # 单次运行会写所有 k 目录下的 test_coverage.json
+                    paths=[f'data/{benchmark_name}/mutation_{k}/{model_name}/{task_id}' for k in k_values],
+                    store_key=(benchmark_name, model_name, task_id, pytest_k_values)
+                ))
+
+            for num_test_cases in k_values:
+                task_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task_id}'
+                pytest_job_id = single_pass_job_id if single_pass else f'{model_name}/{task_id}/pytest@{num_test_cases}'
+                if not single_pass:
+                    jobs.append(make_job(
+                        pytest_job_id, 'pytest', pytest_run_wrapper,
+                        (benchmark_name, model_name, task_id, num_test_cases, backend),
+                        units=partial(int, complexity),
+                        done=partial(pytest_job_done, benchmark_name, model_name, task_id, num_test_cases),
+                        paths=[task_dir],
+                        store_key=(benchmark_name, model_name, task_id, [num_test_cases])
+                    ))
+
+                setup_job_id = f'{model_name}/{task_id}/setup@{num_test_cases}'
+                setup_jobs[(model_name, num_test_cases)].append((task_id, setup_job_id))
+                jobs.append(make_job(
+                    setup_job_id, 'setup', cosmic_ray_setup_wrapper,
+                    (benchmark_name, model_name, task_id, num_test_cases, engine, timeout_config),
+                    deps=[pytest_job_id],
+                    units=partial(int, complexity),
+                    when=partial(setup_job_ready, benchmark_name=benchmark_name, model_name=model_name, task_id=task_id, num_test_cases=num_test_cases, sample_pool=sample_pools[num_test_cases]),
+                    done=partial(setup_job_done, benchmark_name, model_name, task_id, num_test_cases, timeout_config),
+                    paths=[task_dir]
+                ))
+
+                reference_setup_job_id = f'{model_name}/{task_id}/setup@{max_num_test_cases}'
+                jobs.append(make_job(
+                    f'{model_name}/{task_id}/mutate@{num_test_cases}', 'mutate', mutation_run_wrapper,
+                    (benchmark_name, model_name, num_test_cases, task_id, engine, coverage_guided, timeout_config['mode']),
+                    deps=sorted({setup_job_id, reference_setup_job_id}),
+                    units=partial(estimate_mutants, benchmark_name, task_dir, complexity),
+                    when=partial(mutate_job_ready, setup_job_id=setup_job_id, reference_setup_job_id=reference_setup_job_id),
+                    done=partial(mutate_job_done, benchmark_name, model_name, task_id, num_test_cases),
+                    complete=bool,
+                    paths=[task_dir]
+                ))
+
+    store = JobStore(scheduler_path(benchmark_name))
+    if fresh:
+        store.reset()
+    print(f"[+] 🗓️ Scheduling {len(jobs)} jobs for {len(models)} models, k={k_values}")
+    print(f'[+] ⏱️ Start time: {datetime.datetime.now()}')
+    results = run_jobs(jobs, store, max_workers=max_workers, backend=execution_backend)
+    print(f'[+] ⏱️ End time: {datetime.datetime.now()}')
+    store.close()
+
+    # correct_tasks 文件与 cosmic_ray_setup 的输出一致, mutation_statistic 等脚本照常读取
+    for (model_name, num_test_cases), task_jobs in setup_jobs.items():
+        correct_tasks = [task_id for task_id, setup_job_id in task_jobs if results.get(setup_job_id) is True]
+        with open(f'data/{benchmark_name}/correct_tasks_tc_{num_test_cases}_{model_name}', 'w') as f:
+            for task_id in correct_tasks:
+                f.write(f'{task_id}\n')
+    for model_name, num_test_cases in setup_jobs:
+        # 与 mutation_run 一样按最大 k 的任务集合统计
+        mutated_tasks = [task_id for task_id, setup_job_id in setup_jobs[(model_name, max_num_test_cases)] if results.get(setup_job_id) is True]
+        print(f'[+] ✅ {model_name} (k={num_test_cases}): {len(mutated_tasks)} tasks mutated')
+        report_timeouts(mutation_statistics(benchmark_name, model_name, num_test_cases, mutated_tasks, record=True, leave=False))
+
+    for model_name in models:
+        merge_k_results(benchmark_name, model_name, pytest_k_values)
 
 if __name__ == "__main__":    
     parser = argparse.ArgumentParser()
     parser.add_argument("--benchmark_name", type=str, default='ULT')
     parser.add_argument("--num_samples", type=int, default=10000)
     parser.add_argument("--mode", type=str, default='all')
+    parser.add_argument("--pytest_backend", type=str, default='subprocess', choices=['subprocess', 'warm'])
+    parser.add_argument("--single_pass", action='store_true', help='run pytest once on the largest k and derive every test@k from per-test coverage')
+    parser.add_argument("--coverage_guided", action='store_true', help="use the per-test coverage from --single_pass to skip uncovered mutants and, with the fork engine, run only the covering tests")
+    parser.add_argument("--mutation_engine", type=str, default='cosmic-ray', choices=['cosmic-ray', 'fork'], help="'fork' runs each mutant in a forked, pre-imported worker instead of `cosmic-ray exec`")
+    parser.add_argument("--fresh", action='store_true', help='delete existing task dirs and results and recompute everything instead of resuming')
+    parser.add_argument("--timeout", type=float, default=10, help='per-mutant timeout in seconds (fixed mode) or its ceiling (adaptive mode)')
+    parser.add_argument("--timeout_mode", type=str, default='fixed', choices=['fixed', 'adaptive'], help="'adaptive' sets each task's timeout to a multiple of its baseline time and sizes the task cap from its pending mutants")
+    parser.add_argument("--timeout_multiplier", type=float, default=10.0)
+    parser.add_argument("--timeout_floor", type=float, default=1.0)
+    parser.add_argument("--scheduler", action='store_true', help='run every model, k and stage as one cost-ordered job DAG instead of stage-by-stage loops')
+    parser.add_argument("--max_workers", type=int, default=None, help='scheduler worker processes (default: all cores); jobs in flight with --backend distributed')
+    parser.add_argument("--backend", type=str, default='local', choices=['local', 'distributed'], help="'distributed' serves scheduler jobs to HTTP workers (implies --scheduler)")
+    parser.add_argument("--coordinator_host", type=str, default='127.0.0.1', help="use 0.0.0.0 to accept workers from other hosts")
+    parser.add_argument("--coordinator_port", type=int, default=8765)
+    parser.add_argument("--local_workers", type=int, default=0, help='workers to start on this host with --backend distributed')
+    parser.add_argument("--lease_seconds", type=int, default=60)
+    parser.add_argument("--token", type=str, default=os.environ.get('ULT_COORDINATOR_TOKEN'), help='shared secret required from workers')
+    parser.add_argument("--header", type=str, default='full', choices=['full', 'minimal'], help="'minimal' prepends only the code_import lines a task's code (mod.py) or its code and tests (test.py) reference (the full header if they cannot be analysed); mod.py's header lines are excluded from coverage")
+    parser.add_argument("--trace", type=str, default=None, help='write a Chrome trace (stage, task and subprocess spans) to this path; also enabled by $ULT_TRACE_DIR')
+    parser.add_argument("--zygote", action='store_true', help='run every pytest process (pytest stage, cosmic-ray baseline and mutants) as a fork of one interpreter that has the code_import header preloaded')
     args = parser.parse_args()
     
     with open('models.txt', 'r', encoding='utf-8') as f:
         model_list = f.read().splitlines()
     models = [model.split('/')[-1] for model in model_list]
 
-    for num_test_cases in [5,2,1]:
+    k_values = [5,2,1]
+    timeout_config = {'mode': args.timeout_mode, 'timeout': args.timeout, 'multiplier': args.timeout_multiplier, 'floor': args.timeout_floor}
+
+    if args.fresh:
         for model_name in models:
-            cosmic_ray_init(args.benchmark_name, model_name, f'src/results/{model_name}_format.jsonl', timeout=10, num_samples=args.num_samples, num_test_cases=num_test_cases)
-            pytest_run(args.benchmark_name, model_name, num_test_cases)
-            cosmic_ray_setup(args.benchmark_name, model_name, num_test_cases=num_test_cases)
-            mutation_status(args.benchmark_name, model_name, num_test_cases=num_test_cases)
-            mutation_run(args.benchmark_name, model_name, num_test_cases)
-            # mutation_statistic(args.benchmark_name, model_generation_file_path, num_test_cases, baseline_test_cases=5)
+            results_store.clear_results(args.benchmark_name, model_name, range(1, max(k_values) + 1))
 
-    for model_name in models:
-        merge_k_results(args.benchmark_name, model_name, [5,2,1])
+    trace_path = start_trace(args.trace)
+    # zygote 通过 PATH 上的 pytest shim 生效, process_map worker 和 cosmic-ray 子进程都会继承
+    try:
+        with zygote_service() if args.zygote else nullcontext():
+            if args.scheduler or args.backend == 'distributed':
+                execution_backend = None
+                if args.backend == 'distributed':
+                    execution_backend = Coordinator(args.coordinator_host, args.coordinator_port, max_workers=args.max_workers, local_workers=args.local_workers,
+                                                    lease_seconds=args.lease_seconds, token=args.token)
+                scheduled_pipeline(args.benchmark_name, models, k_values, args.num_samples, single_pass=args.single_pass, backend=args.pytest_backend, engine=args.mutation_engine,
+                                   coverage_guided=args.coverage_guided, timeout_config=timeout_config, fresh=args.fresh, max_workers=args.max_workers, execution_backend=execution_backend,
+                                   header_mode=args.header)
+            elif args.single_pass:
+                # 只在 k=max(k_values) 的测试集上跑一次 pytest，test@1..test@K 由逐测试覆盖的前缀并集得到
+                max_num_test_cases = max(k_values)
+                for model_name in models:
+                    for num_test_cases in k_values:
+                        cosmic_ray_init(args.benchmark_name, model_name, f'src/results/{model_name}_format.jsonl', timeout=args.timeout, num_samples=args.num_samples, num_test_cases=num_test_cases, fresh=args.fresh, header_mode=args.header)
+                    pytest_run_single_pass(args.benchmark_name, model_name, max_num_test_cases, backend=args.pytest_backend)
+                    for num_test_cases in k_values:
+                        cosmic_ray_setup(args.benchmark_name, model_name, num_test_cases=num_test_cases, engine=args.mutation_engine, timeout_config=timeout_config)
+                        mutation_status(args.benchmark_name, model_name, num_test_cases=num_test_cases)
+                        mutation_run(args.benchmark_name, model_name, num_test_cases, engine=args.mutation_engine, coverage_guided=args.coverage_guided, timeout_mode=args.timeout_mode)
+            else:
+                for num_test_cases in k_values:
+                    for model_name in models:
+                        cosmic_ray_init(args.benchmark_name, model_name, f'src/results/{model_name}_format.jsonl', timeout=args.timeout, num_samples=args.num_samples, num_test_cases=num_test_cases, fresh=args.fresh, header_mode=args.header)
+                        pytest_run(args.benchmark_name, model_name, num_test_cases, backend=args.pytest_backend)
+                        cosmic_ray_setup(args.benchmark_name, model_name, num_test_cases=num_test_cases, engine=args.mutation_engine, timeout_config=timeout_config)
+                        mutation_status(args.benchmark_name, model_name, num_test_cases=num_test_cases)
+                        mutation_run(args.benchmark_name, model_name, num_test_cases, engine=args.mutation_engine, coverage_guided=args.coverage_guided, timeout_mode=args.timeout_mode)
+                        # mutation_statistic(args.benchmark_name, model_generation_file_path, num_test_cases, baseline_test_cases=5)
+
+                for model_name in models:
+                    merge_k_results(args.benchmark_name, model_name, k_values)
+    finally:
+        if trace_path:
+            finish_trace(trace_path)
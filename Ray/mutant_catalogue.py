@@ -0,0 +1,64 @@
+# coding: utf-8
+
+# Description: Per-benchmark mutant catalogue. `cosmic-ray init` depends only on `mod.py`
+# (and the cosmic-ray version), and `mod.py` is the same for every model and every k of a
+# task. The catalogue runs `cosmic-ray init` once per distinct `mod.py` and every model/k
+# run starts from a copy of that session database.
+
+import os
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from importlib import metadata
+from tracing import traced_run
+
+def cosmic_ray_version():
+    try:
+        return metadata.version('cosmic-ray')
+    except metadata.PackageNotFoundError:
+        return 'unknown'
+
+def catalogue_key(mod_source):
+    """Content hash of `mod.py` plus the cosmic-ray version that enumerates its mutants."""
+    digest = hashlib.sha256()
+    digest.update(mod_source.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(f'cosmic-ray {cosmic_ray_version()}'.encode('utf-8'))
+    return digest.hexdigest()
+
+def catalogue_dir(benchmark_name):
+    return f'data/{benchmark_name}/mutant_catalogue'
+
+def catalogue_session_path(benchmark_name, working_dir):
+    """Where the catalogue keeps (or will keep) the session for the `mod.py` in `working_dir`."""
+    with open(os.path.join(working_dir, 'mod.py'), 'r', encoding='utf-8') as f:
+        key = catalogue_key(f.read())
+    return os.path.join(catalogue_dir(benchmark_name), f'{key}.sqlite')
+
+def ensure_catalogue(benchmark_name, working_dir):
+    """
+    Path of the catalogue session for the `mod.py` in `working_dir`, running `cosmic-ray init`
+    on first use. Entries are written atomically, so concurrent tasks with the same `mod.py`
+    never see a half-written database.
+    """
+    catalogue_path = catalogue_session_path(benchmark_name, working_dir)
+    if os.path.exists(catalogue_path):
+        return catalogue_path
+
+    os.makedirs(catalogue_dir(benchmark_name), exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=catalogue_dir(benchmark_name)) as temp_dir:
+        shutil.copy(os.path.join(working_dir, 'mod.py'), temp_dir)
+        shutil.copy(os.path.join(working_dir, 'cosmic-ray.toml'), temp_dir)
+        traced_run('cosmic-ray init', subprocess.run, ['cosmic-ray', 'init', 'cosmic-ray.toml', 'cosmic-ray.sqlite'], cwd=temp_dir, check=True)
+        os.replace(os.path.join(temp_dir, 'cosmic-ray.sqlite'), catalogue_path)
+    return catalogue_path
+
+def init_from_catalogue(benchmark_name, working_dir):
+    """Equivalent of `cosmic-ray init cosmic-ray.toml cosmic-ray.sqlite` in `working_dir`, served from the catalogue."""
+    catalogue_path = ensure_catalogue(benchmark_name, working_dir)
+    session_path = os.path.join(working_dir, 'cosmic-ray.sqlite')
+    temp_path = f'{session_path}.tmp'
+    shutil.copyfile(catalogue_path, temp_path)
+    os.replace(temp_path, session_path)
+    return session_path
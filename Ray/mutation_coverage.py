@@ -0,0 +1,124 @@
+# coding: utf-8
+
+# Description: Coverage-guided mutation runs. Uses the per-test line coverage that the
+# single-pass pytest stage writes to `test_coverage.json` to skip mutants that no test
+# executes (recorded as survived without running) and to run only the tests that reach a
+# mutant's statement.
+
+import os
+import ast
+import json
+
+NOT_COVERED_OUTPUT = 'not covered by any test'
+
+def statement_spans(source):
+    """
+    `(first_row, last_row, header_rows)` for every statement and except clause in `source`.
+
+    `header_rows` are the rows that emit a line event whenever the mutable part of the node runs:
+    the whole statement for simple statements, and everything before the body (decorators,
+    signature, condition, iterable, ...) for compound ones.
+    """
+    spans = []
+    for node in ast.walk(ast.parse(source)):
+        if not isinstance(node, (ast.stmt, ast.excepthandler)):
+            continue
+        first_row = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])])
+        body = getattr(node, 'body', None)
+        if isinstance(body, list) and body and body[0].lineno > node.lineno:
+            header_rows = range(first_row, body[0].lineno)
+        elif isinstance(body, list) and body:
+            header_rows = range(first_row, node.lineno + 1)
+        else:
+            header_rows = range(first_row, node.end_lineno + 1)
+        spans.append((first_row, node.end_lineno, header_rows))
+    return spans
+
+class CoverageGuide:
+    """Maps a mutant to the generated tests that execute its statement."""
+
+    def __init__(self, source, test_coverage):
+        self.spans = statement_spans(source)
+        self.always_lines = set(test_coverage['always_lines'])
+        self.lines = {int(lineno): idxs for lineno, idxs in test_coverage['lines'].items()}
+        self.names = {test['index']: test['names'] for test in test_coverage['tests']}
+        # Names that belong to some generated test; anything else pytest collects always runs
+        self.generated_names = {name for names in self.names.values() for name in names}
+
+    def header_rows(self, mutation):
+        start_row, end_row = mutation.start_pos[0], mutation.end_pos[0]
+        innermost = None
+        for first_row, last_row, header_rows in self.spans:
+            if first_row <= start_row and end_row <= last_row:
+                if innermost is None or (first_row, -last_row) >= (innermost[0], -innermost[1]):
+                    innermost = (first_row, last_row, header_rows)
+        return innermost[2] if innermost else None
+
+    def covering_tests(self, mutation):
+        """
+        Indexes of the tests that execute the mutant's statement.
+
+        Returns None when every test has to run (import-time code, or no enclosing statement),
+        and an empty list when no test reaches the mutant.
+        """
+        rows = self.header_rows(mutation)
+        if rows is None or self.always_lines.intersection(rows):
+            return None
+        return sorted({idx for row in rows for idx in self.lines.get(row, ())})
+
+    def selected_names(self, mutation):
+        """Test names to run for a covered mutant, or None to run the whole suite."""
+        idxs = self.covering_tests(mutation)
+        if idxs is None:
+            return None
+        return {name for idx in idxs for name in self.names.get(idx, ())}
+
+def load_coverage_guide(working_dir):
+    """`CoverageGuide` for a task dir, or None if the pytest stage left no `test_coverage.json`."""
+    coverage_path = os.path.join(working_dir, 'test_coverage.json')
+    if not os.path.exists(coverage_path):
+        return None
+    try:
+        with open(coverage_path, 'r') as f:
+            test_coverage = json.load(f)
+        with open(os.path.join(working_dir, 'mod.py'), 'r', encoding='utf-8') as f:
+            source = f.read()
+        return CoverageGuide(source, test_coverage)
+    except (SyntaxError, ValueError, KeyError) as e:
+        print(f'[-] Ignoring test coverage @ [{working_dir}]: {e}')
+        return None
+
+def mark_uncovered_mutants(working_dir):
+    """
+    Record every pending mutant that no test executes as survived, without running it.
+
+    Returns the number of mutants marked. Works for both mutation engines, since
+    `cosmic-ray exec` and the fork engine only pick up jobs without a result.
+    """
+    guide = load_coverage_guide(working_dir)
+    if guide is None:
+        return 0
+
+    from cosmic_ray.mutating import _make_diff, mutate_code
+    from cosmic_ray.plugins import get_operator
+    from cosmic_ray.work_db import WorkDB, use_db
+    from cosmic_ray.work_item import TestOutcome, WorkerOutcome, WorkResult
+
+    with open(os.path.join(working_dir, 'mod.py'), 'r', encoding='utf-8') as f:
+        source = f.read()
+
+    marked = 0
+    with use_db(os.path.join(working_dir, 'cosmic-ray.sqlite'), WorkDB.Mode.open) as db:
+        for item in db.pending_work_items:
+            mutation = item.mutations[0]
+            if guide.covering_tests(mutation) != []:
+                continue
+            operator = get_operator(mutation.operator_name)(**(mutation.operator_args or {}))
+            mutated_source = mutate_code(source, operator, mutation.occurrence)
+            if mutated_source is None:
+                db.set_result(item.job_id, WorkResult(worker_outcome=WorkerOutcome.NO_TEST))
+            else:
+                diff = '\n'.join(_make_diff(source, mutated_source, mutation.module_path))
+                db.set_result(item.job_id, WorkResult(output=NOT_COVERED_OUTPUT, diff=diff, test_outcome=TestOutcome.SURVIVED, worker_outcome=WorkerOutcome.NORMAL))
+            marked += 1
+    return marked
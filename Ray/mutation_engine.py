@@ -0,0 +1,446 @@
+# coding: utf-8
+
+# Description: In-process fork-per-mutant engine, an alternative to `cosmic-ray exec`.
+# A task process imports `mod.py` and `test.py` once and parses `mod.py` once. Every mutant
+# then runs in a forked copy of that process: the mutation is applied to the parsed tree in
+# memory, the mutated function's code object is swapped into the live module (or, if code run at
+# import time uses that function, `mod.py` and `test.py` are executed again), and the tests
+# are called directly. Results are written to `cosmic-ray.sqlite` with the same statuses as
+# `cosmic-ray exec`, so `cr-report`, `mutation_statistic` and `generate_mutation_details.py`
+# read them unchanged.
+
+import os
+import sys
+import ast
+import time
+import types
+import inspect
+import tempfile
+import traceback
+import subprocess
+
+from prefork import WARM_MODULES, preload_modules, run_forked
+from mutation_coverage import load_coverage_guide
+from tracing import span
+
+ENGINE_MODULES = WARM_MODULES + ['cosmic_ray.plugins', 'cosmic_ray.mutating', 'cosmic_ray.work_db', 'cosmic_ray.config']
+
+TEST_MODULE_NAME = '_mutation_engine_test'
+
+# Exit codes of a mutant child that are not test outcomes (pytest only uses 0-5)
+EXIT_NO_MUTATION = 124
+EXIT_ENGINE_ERROR = 125
+
+# Module-level hooks that pytest calls around tests; their presence sends a task down the pytest path
+PYTEST_HOOKS = {'setup_module', 'teardown_module', 'setup_function', 'teardown_function', 'setup', 'teardown', 'pytest_generate_tests'}
+PYTEST_CLASS_HOOKS = {'setup_class', 'teardown_class', 'setup_method', 'teardown_method', 'setup', 'teardown', '__init__'}
+
+def preload_engine():
+    """Import the test dependencies and cosmic-ray's operator plugins into the current worker."""
+    preload_modules(ENGINE_MODULES)
+
+class TaskState:
+    """Everything a task process keeps live across its mutants."""
+
+    def __init__(self, working_dir, coverage_guided=False):
+        from cosmic_ray.ast import get_ast
+
+        self.working_dir = os.path.abspath(working_dir)
+        self.mod_path = os.path.join(self.working_dir, 'mod.py')
+        self.test_path = os.path.join(self.working_dir, 'test.py')
+
+        with open(self.mod_path, 'r', encoding='utf-8') as f:
+            self.mod_source = f.read()
+        with open(self.test_path, 'r', encoding='utf-8') as f:
+            self.test_source = f.read()
+
+        # Parsed once; every mutant child walks its own copy-on-write copy of this tree
+        self.tree = get_ast(self.mod_source)
+        self.mod_code = compile(self.mod_source, self.mod_path, 'exec')
+        self.test_code = compile(self.test_source, self.test_path, 'exec')
+        # A function that module-level code of mod.py / test.py already called at import keeps its old results
+        # after a `__code__` swap (`TABLE = [f(i) ...]`, `expected = f(2)`): mutants in it re-execute both modules
+        import_time = import_time_names([self.mod_source, self.test_source])
+        self.functions = [function for function in find_swappable_functions(self.mod_source, self.mod_code)
+                          if import_time is not None and not set(function[0].split('.')) & import_time]
+        self.plain_tests = is_plain_test_module(self.test_source)
+        self.guide = load_coverage_guide(self.working_dir) if coverage_guided else None
+
+        if self.working_dir not in sys.path:
+            sys.path.insert(0, self.working_dir)
+        self.mod = load_module('mod', self.mod_code, self.mod_path)
+        self.test_module = load_module(TEST_MODULE_NAME, self.test_code, self.test_path)
+
+def load_module(name, code, path):
+    module = types.ModuleType(name)
+    module.__file__ = path
+    sys.modules[name] = module
+    exec(code, module.__dict__)
+    return module
+
+def find_code(code, qualname):
+    """All code objects named `qualname` nested in `code`."""
+    found = []
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            if const.co_qualname == qualname:
+                found.append(const)
+            found.extend(find_code(const, qualname))
+    return found
+
+def find_swappable_functions(source, module_code):
+    """
+    Top-level functions and methods whose body can be replaced by swapping `__code__`.
+
+    Returns a list of `(qualname, first_body_row, last_row)`. A mutant whose rows fall inside
+    `[first_body_row, last_row]` only changes that function's code object.
+    """
+    functions = []
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return functions
+
+    def header_end(node):
+        rows = [node.lineno]
+        for child in ast.walk(node.args):
+            if hasattr(child, 'end_lineno'):
+                rows.append(child.end_lineno)
+        if node.returns is not None:
+            rows.append(node.returns.end_lineno)
+        return max(rows)
+
+    candidates = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            candidates.append((node.name, node))
+        elif isinstance(node, ast.ClassDef):
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    candidates.append((f'{node.name}.{item.name}', item))
+
+    for qualname, node in candidates:
+        # Redefined names cannot be matched to a single code object
+        if len(find_code(module_code, qualname)) != 1:
+            continue
+        functions.append((qualname, header_end(node) + 1, node.end_lineno))
+    return functions
+
+def referenced_names(nodes):
+    names = set()
+    for node in nodes:
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name):
+                names.add(child.id)
+            elif isinstance(child, ast.Attribute):
+                names.add(child.attr)
+    return names
+
+def import_time_names(sources):
+    """
+    Names that code run at import time can reach: module-level statements (class bodies, decorators and default
+    values included) and, transitively, the functions and methods they reference. Names are matched across all
+    `sources`, so this over-approximates. None if a source does not parse.
+    """
+    executed, deferred = set(), dict()
+
+    def define(node, keys):
+        # 函数体在调用时才执行; 装饰器和默认值在定义时执行
+        executed.update(referenced_names(node.decorator_list + node.args.defaults + [d for d in node.args.kw_defaults if d is not None]))
+        for key in keys:
+            deferred.setdefault(key, set()).update(referenced_names(node.body))
+
+    for source in sources:
+        try:
+            tree = ast.parse(source)
+        except SyntaxError:
+            return None
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                define(node, [node.name])
+            elif isinstance(node, ast.ClassDef):
+                executed.update(referenced_names(node.decorator_list + node.bases + node.keywords))
+                for item in node.body:
+                    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                        # 使用类 (实例化) 或方法名 (obj.method()) 都可能调用到方法体
+                        define(item, [node.name, item.name])
+                    else:
+                        executed.update(referenced_names([item]))
+            else:
+                executed.update(referenced_names([node]))
+
+    reached, pending = set(), list(executed)
+    while pending:
+        name = pending.pop()
+        if name not in reached:
+            reached.add(name)
+            pending.extend(deferred.get(name, ()))
+    return reached
+
+def resolve_function(module, qualname):
+    obj = module
+    for part in qualname.split('.'):
+        obj = vars(obj).get(part) if isinstance(obj, (types.ModuleType, type)) else None
+        if obj is None:
+            return None
+    if isinstance(obj, (staticmethod, classmethod)):
+        obj = obj.__func__
+    return obj if isinstance(obj, types.FunctionType) else None
+
+def is_plain_test_module(test_source):
+    """True if every test can be called directly, i.e. pytest would add nothing but the call."""
+    try:
+        tree = ast.parse(test_source)
+    except SyntaxError:
+        return False
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and node.decorator_list:
+            return False
+        if isinstance(node, (ast.Yield, ast.YieldFrom)):
+            return False
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name in PYTEST_HOOKS:
+            return False
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == 'pytestmark' for t in node.targets):
+            return False
+    return True
+
+def collect_tests(module):
+    """
+    Collect tests from a module namespace in definition order, the way pytest does.
+
+    Returns a list of `(name, callable)`, or None if some test needs pytest (fixtures, async, ...).
+    """
+    tests = []
+    for name, obj in list(vars(module).items()):
+        if name.startswith('test') and inspect.isfunction(obj):
+            if inspect.signature(obj).parameters or inspect.iscoroutinefunction(obj) or hasattr(obj, 'pytestmark'):
+                return None
+            tests.append((name, obj))
+        elif name.startswith('Test') and inspect.isclass(obj):
+            if PYTEST_CLASS_HOOKS & set(vars(obj)) or hasattr(obj, 'pytestmark'):
+                return None
+            for attr, method in list(vars(obj).items()):
+                if not (attr.startswith('test') and inspect.isfunction(method)):
+                    continue
+                if len(inspect.signature(method).parameters) != 1 or inspect.iscoroutinefunction(method):
+                    return None
+                tests.append((f'{name}::{attr}', (obj, attr)))
+    return tests
+
+def call_tests(tests):
+    """Run collected tests, stopping at the first failure. Returns the exit status."""
+    # pytest exits with 5 when nothing is collected, which cosmic-ray counts as killed
+    if not tests:
+        print('no tests ran')
+        return 5
+    # pytest.skip() / importorskip() / xfail() raise these (BaseException subclasses); pytest does not count them as failures
+    from _pytest.outcomes import Skipped, XFailed
+    skipped = 0
+    for name, test in tests:
+        try:
+            if isinstance(test, tuple):
+                cls, attr = test
+                getattr(cls(), attr)()
+            else:
+                test()
+        except (Skipped, XFailed):
+            skipped += 1
+        except BaseException:
+            print(f'FAILED test.py::{name}')
+            traceback.print_exc(file=sys.stdout)
+            return 1
+    print(f'{len(tests) - skipped} passed, {skipped} skipped')
+    return 0
+
+def is_selected(name, selected, generated_names):
+    # Tests that no generated test owns (e.g. collected through `from mod import *`) always run
+    return selected is None or name in selected or name not in generated_names
+
+class SelectTests:
+    """pytest plugin that keeps only the selected tests (matched by function or class name)."""
+
+    def __init__(self, selected, generated_names):
+        self.selected = selected
+        self.generated_names = generated_names
+
+    def pytest_collection_modifyitems(self, config, items):
+        kept = []
+        for item in items:
+            cls = getattr(item, 'cls', None)
+            name = cls.__name__ if cls is not None else getattr(item, 'originalname', item.name)
+            if is_selected(name, self.selected, self.generated_names):
+                kept.append(item)
+            else:
+                config.hook.pytest_deselected(items=[item])
+        items[:] = kept
+
+def run_pytest(test_path, plugins=()):
+    import pytest
+    sys.dont_write_bytecode = True
+    return int(pytest.main([test_path, '-x', '-q', '-p', 'no:cacheprovider'], plugins=list(plugins)))
+
+def run_tests(state, module_reloaded, selected=None):
+    """Run the task's tests; `selected` restricts them to the named generated tests."""
+    generated_names = state.guide.generated_names if state.guide else set()
+    # test.py pulls names in via `from mod import *`; after a full re-exec of `mod` it must be re-imported
+    if state.plain_tests:
+        test_module = state.test_module
+        if module_reloaded:
+            test_module = load_module(TEST_MODULE_NAME, state.test_code, state.test_path)
+        tests = collect_tests(test_module)
+        if tests is not None:
+            chosen = [(name, test) for name, test in tests if is_selected(name.split('::')[0], selected, generated_names)]
+            if tests and not chosen:
+                print('no test reaches the mutant')
+                return 0
+            return call_tests(chosen)
+    if selected is None:
+        return run_pytest(state.test_path)
+    exit_code = run_pytest(state.test_path, plugins=[SelectTests(selected, generated_names)])
+    # 5: everything was deselected; the baseline already showed that the suite is not empty
+    return 0 if exit_code == 5 else exit_code
+
+def mutated_function(state, mutation):
+    start_row, end_row = mutation.start_pos[0], mutation.end_pos[0]
+    for qualname, first_row, last_row in state.functions:
+        if first_row <= start_row and end_row <= last_row:
+            return qualname
+    return None
+
+def apply_mutant(state, mutation, mutated_source):
+    """Install `mutated_source` into the live `mod` module. Returns True if `mod` was re-executed."""
+    mutated_code = compile(mutated_source, state.mod_path, 'exec')
+
+    qualname = mutated_function(state, mutation)
+    if qualname is not None:
+        func = resolve_function(state.mod, qualname)
+        new_code = find_code(mutated_code, qualname)
+        if func is not None and len(new_code) == 1 and func.__code__ in find_code(state.mod_code, qualname) and func.__code__.co_freevars == new_code[0].co_freevars:
+            func.__code__ = new_code[0]
+            return False
+
+    # Module-level, class-level, decorator or default-argument mutation: run the mutated module fresh
+    state.mod = load_module('mod', mutated_code, state.mod_path)
+    return True
+
+def _mutant_main(state, mutation, mutant_path, selected=None):
+    from cosmic_ray.mutating import MutationVisitor
+    from cosmic_ray.plugins import get_operator
+
+    try:
+        operator = get_operator(mutation.operator_name)(**(mutation.operator_args or {}))
+        visitor = MutationVisitor(mutation.occurrence, operator)
+        mutated_tree = visitor.walk(state.tree)
+        if not visitor.mutation_applied:
+            return EXIT_NO_MUTATION
+        mutated_source = mutated_tree.get_code()
+        with open(mutant_path, 'w', encoding='utf-8') as f:
+            f.write(mutated_source)
+    except Exception:
+        traceback.print_exc(file=sys.stdout)
+        return EXIT_ENGINE_ERROR
+
+    # Same as `pytest test.py` failing to import a broken mutant: the mutant is killed
+    try:
+        module_reloaded = apply_mutant(state, mutation, mutated_source)
+    except BaseException:
+        traceback.print_exc(file=sys.stdout)
+        return 1
+    return run_tests(state, module_reloaded, selected)
+
+def _baseline_main(state):
+    return run_tests(state, module_reloaded=False)
+
+def run_mutant(state, item, timeout, scratch_dir):
+    """Run one work item in a forked child and return its `WorkResult`."""
+    from cosmic_ray.mutating import _make_diff
+    from cosmic_ray.work_item import TestOutcome, WorkerOutcome, WorkResult
+
+    mutation = item.mutations[0]
+    mutant_path = os.path.join(scratch_dir, 'mutant.py')
+    if os.path.exists(mutant_path):
+        os.remove(mutant_path)
+
+    # 覆盖引导: 只运行执行到变异语句的测试
+    selected = state.guide.selected_names(mutation) if state.guide else None
+
+    with span('mutant', cat='subprocess', job_id=item.job_id) as info:
+        try:
+            response = run_forked(_mutant_main, (state, mutation, mutant_path, selected), cwd=state.working_dir, timeout=timeout, cmd=['mutant', item.job_id])
+            test_outcome = TestOutcome.SURVIVED if response.returncode == 0 else TestOutcome.KILLED
+            output = response.stdout + response.stderr
+            info['returncode'] = response.returncode
+            if response.returncode == EXIT_ENGINE_ERROR:
+                info['exit'] = 'error'
+        except subprocess.TimeoutExpired:
+            response = None
+            test_outcome, output = TestOutcome.KILLED, 'timeout'
+            info['exit'] = 'timeout'
+        info['outcome'] = test_outcome.value
+
+    if response is not None and response.returncode == EXIT_NO_MUTATION:
+        return WorkResult(worker_outcome=WorkerOutcome.NO_TEST)
+    if response is not None and response.returncode == EXIT_ENGINE_ERROR:
+        return WorkResult(output=output, test_outcome=TestOutcome.INCOMPETENT, worker_outcome=WorkerOutcome.EXCEPTION)
+
+    diff = None
+    if os.path.exists(mutant_path):
+        with open(mutant_path, 'r', encoding='utf-8') as f:
+            diff = '\n'.join(_make_diff(state.mod_source, f.read(), mutation.module_path))
+    return WorkResult(output=output, diff=diff, test_outcome=test_outcome, worker_outcome=WorkerOutcome.NORMAL)
+
+def _exec_task_main(working_dir, deadline, coverage_guided=False):
+    from cosmic_ray.config import load_config
+    from cosmic_ray.work_db import WorkDB, use_db
+
+    config = load_config(os.path.join(working_dir, 'cosmic-ray.toml'))
+    state = TaskState(working_dir, coverage_guided=coverage_guided)
+
+    with use_db(os.path.join(working_dir, 'cosmic-ray.sqlite'), WorkDB.Mode.open) as db, tempfile.TemporaryDirectory() as scratch_dir:
+        for item in db.pending_work_items:
+            # Same as the `cosmic-ray exec` wall-clock limit: whatever is left stays pending
+            if deadline and time.monotonic() > deadline:
+                return 1
+            db.set_result(item.job_id, run_mutant(state, item, config.timeout, scratch_dir))
+    return 0
+
+def _baseline_task_main(working_dir):
+    from cosmic_ray.config import load_config
+
+    config = load_config(os.path.join(working_dir, 'cosmic-ray.toml'))
+    state = TaskState(working_dir)
+    try:
+        response = run_forked(_baseline_main, (state,), cwd=state.working_dir, timeout=config.timeout, cmd=['baseline'])
+    except subprocess.TimeoutExpired:
+        return 1
+    return 0 if response.returncode == 0 else 1
+
+def fork_exec(working_dir, timeout=None, coverage_guided=False):
+    """
+    Fork-engine equivalent of `cosmic-ray exec cosmic-ray.toml cosmic-ray.sqlite` in `working_dir`.
+
+    The task runs in its own forked child so that `mod`/`test` never leak into the calling worker.
+    Raises `subprocess.TimeoutExpired` if the task is still running after `timeout` seconds.
+    With `coverage_guided`, each mutant only runs the tests that execute its statement.
+    """
+    preload_engine()
+    deadline = time.monotonic() + timeout if timeout else None
+    # The child stops picking up new mutants at the deadline; the outer timeout catches a stuck one
+    outer_timeout = timeout + 60 if timeout else None
+    response = run_forked(_exec_task_main, (os.path.abspath(working_dir), deadline, coverage_guided), cwd=working_dir, timeout=outer_timeout, cmd=['fork-exec', working_dir])
+    if response.returncode == 1 and deadline and time.monotonic() > deadline:
+        raise subprocess.TimeoutExpired(['fork-exec', working_dir], timeout)
+    if response.returncode != 0:
+        raise subprocess.CalledProcessError(response.returncode, ['fork-exec', working_dir], response.stdout, response.stderr)
+    return response
+
+def fork_baseline(working_dir, timeout=None):
+    """Fork-engine equivalent of `cosmic-ray baseline cosmic-ray.toml`: True if the unmutated tests pass."""
+    preload_engine()
+    try:
+        response = run_forked(_baseline_task_main, (os.path.abspath(working_dir),), cwd=working_dir, timeout=timeout, cmd=['fork-baseline', working_dir])
+    except subprocess.TimeoutExpired:
+        return False
+    return response.returncode == 0
@@ -0,0 +1,100 @@
+# coding: utf-8
+
+# Description: Mutation statistics read straight from the `cosmic-ray.sqlite` sessions with
+# SQL aggregates, instead of spawning `cr-report --show-pending` per task and parsing its text.
+# Counts follow `cr-report`: total = work items, complete = results, surviving = results whose
+# test outcome is SURVIVED. The pipeline (`record=True`) caches the counts in the task's `.pipeline.json`
+# until the session changes; reporting scripts only reuse that cache and never write task dirs.
+
+import os
+import sqlite3
+from contextlib import closing
+from tqdm.contrib.concurrent import thread_map
+from pipeline_state import fingerprint, stage_info, mark_stage
+from mutation_timeouts import read_timeout
+
+COUNTS_QUERY = """
+SELECT
+    (SELECT COUNT(*) FROM work_items),
+    (SELECT COUNT(*) FROM work_results),
+    (SELECT COUNT(*) FROM work_results WHERE test_outcome = 'SURVIVED'),
+    (SELECT COUNT(*) FROM work_results WHERE output = 'timeout')
+"""
+
+def read_mutation_counts(session_path):
+    """`(total_jobs, completed_jobs, surviving_mutants, timed_out_jobs)` of one cosmic-ray session."""
+    if not os.path.exists(session_path):
+        raise FileNotFoundError(session_path)
+    # Read-only: never create an empty session for a task that was not set up
+    with closing(sqlite3.connect(f'file:{os.path.abspath(session_path)}?mode=ro', uri=True)) as conn:
+        return conn.execute(COUNTS_QUERY).fetchone()
+
+def cached_mutation_counts(working_dir, record=False):
+    """
+    `read_mutation_counts`, reused from the task's `stats` stage while the session file is unchanged.
+    Fresh counts are saved to that stage only with `record=True`.
+    """
+    session_path = f'{working_dir}/cosmic-ray.sqlite'
+    session_stat = os.stat(session_path)
+    session_fingerprint = fingerprint(COUNTS_QUERY, session_stat.st_size, session_stat.st_mtime_ns)
+    info = stage_info(working_dir, 'stats')
+    if info is not None and info.get('fingerprint') == session_fingerprint:
+        return tuple(info['counts'])
+    counts = read_mutation_counts(session_path)
+    if record:
+        mark_stage(working_dir, 'stats', session_fingerprint, counts=list(counts))
+    return counts
+
+def task_statistic(benchmark_name, model_name, num_test_cases, task, record=False):
+    working_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task}'
+
+    statistic_info = {
+        "task": task,
+        "complete_rate": 0.0,
+        "surviving_mutants_rate": 0.0,
+        "total_jobs_number": 0,
+        "completed_jobs_number": 0,
+        "surviving_mutants_number": 0,
+        "timeout_jobs_number": 0,
+        "timeout_seconds": 0.0
+    }
+
+    try:
+        total_jobs_number, completed_jobs_number, surviving_mutants_number, timeout_jobs_number = cached_mutation_counts(working_dir, record)
+    except Exception as e:
+        print(f'[-] Error @ [{working_dir}]: {e}')
+        return statistic_info
+
+    statistic_info["total_jobs_number"] = total_jobs_number
+    statistic_info["completed_jobs_number"] = completed_jobs_number
+    statistic_info["surviving_mutants_number"] = surviving_mutants_number
+    statistic_info["timeout_jobs_number"] = timeout_jobs_number
+    # 每个超时的变异体都等满了该任务的超时时间
+    statistic_info["timeout_seconds"] = timeout_jobs_number * (read_timeout(working_dir) or 0.0)
+    statistic_info['complete_rate'] = completed_jobs_number / total_jobs_number if total_jobs_number > 0 else 0
+    statistic_info['surviving_mutants_rate'] = (surviving_mutants_number / completed_jobs_number) if completed_jobs_number > 0 else 0
+
+    return statistic_info
+
+def mutation_statistics(benchmark_name, model_name, num_test_cases, tasks, max_workers=16, record=False, **tqdm_kwargs):
+    """Per-task `statistic_info` for every task of one benchmark/model/k, read in parallel (`record`: see `cached_mutation_counts`)."""
+    tasks = list(tasks)
+    tqdm_kwargs.setdefault('desc', f"[+] 🔄 Reading mutation ({num_test_cases} test cases) statistics...")
+    return thread_map(
+        task_statistic,
+        [benchmark_name]*len(tasks),
+        [model_name]*len(tasks),
+        [num_test_cases]*len(tasks),
+        tasks,
+        [record]*len(tasks),
+        max_workers=max_workers,
+        chunksize=1,
+        **tqdm_kwargs
+    )
+
+def summarize_timeouts(statistics):
+    """`(incomplete_tasks, timed_out_jobs, timeout_seconds)` over a list of per-task `statistic_info`."""
+    incomplete_tasks = sum(1 for statistic in statistics if statistic["completed_jobs_number"] < statistic["total_jobs_number"])
+    timeout_jobs = sum(statistic["timeout_jobs_number"] for statistic in statistics)
+    timeout_seconds = sum(statistic["timeout_seconds"] for statistic in statistics)
+    return incomplete_tasks, timeout_jobs, timeout_seconds
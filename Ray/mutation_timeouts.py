@@ -0,0 +1,63 @@
+# coding: utf-8
+
+# Description: Baseline-calibrated per-mutant timeouts. The baseline step times the unmutated
+# suite; with `--timeout_mode adaptive` each task's `cosmic-ray.toml` timeout becomes a multiple
+# of that time, clamped to [floor, ceiling], and the task's wall-clock budget is derived from the
+# number of pending mutants instead of the fixed `360*num_test_cases` cap.
+
+import os
+import re
+import sqlite3
+from contextlib import closing
+
+TIMEOUT_PATTERN = re.compile(r'^timeout\s*=\s*([0-9.]+)\s*$', re.MULTILINE)
+
+def write_config(working_dir, config):
+    """
+    Write `config` as the task's `cosmic-ray.toml` unless the existing file differs from it only in the
+    `timeout` line (that one is set by the setup step); returns True if the file was written.
+    """
+    toml_path = os.path.join(working_dir, 'cosmic-ray.toml')
+    if os.path.exists(toml_path):
+        with open(toml_path, 'r') as f:
+            if TIMEOUT_PATTERN.sub('', f.read()) == TIMEOUT_PATTERN.sub('', config):
+                return False
+    with open(toml_path, 'w') as f:
+        f.write(config)
+    return True
+
+def clear_mutation_results(working_dir):
+    """Drop the recorded mutant outcomes of a task's session, so the next `exec` reruns every mutant."""
+    with closing(sqlite3.connect(os.path.join(working_dir, 'cosmic-ray.sqlite'))) as conn, conn:
+        conn.execute('DELETE FROM work_results')
+
+def calibrate_timeout(baseline_seconds, multiplier=10.0, floor=1.0, ceiling=10.0):
+    """Per-mutant timeout: `multiplier` x the baseline run, clamped to [floor, ceiling] seconds."""
+    return round(min(max(multiplier * baseline_seconds, floor), ceiling), 2)
+
+def read_timeout(working_dir):
+    """The per-mutant timeout of a task's `cosmic-ray.toml` (None if it cannot be read)."""
+    try:
+        with open(os.path.join(working_dir, 'cosmic-ray.toml'), 'r') as f:
+            match = TIMEOUT_PATTERN.search(f.read())
+    except FileNotFoundError:
+        return None
+    return float(match.group(1)) if match else None
+
+def write_timeout(working_dir, timeout):
+    """Rewrite the `timeout` line of a task's `cosmic-ray.toml`; returns False if it was already set."""
+    toml_path = os.path.join(working_dir, 'cosmic-ray.toml')
+    with open(toml_path, 'r') as f:
+        config = f.read()
+    if read_timeout(working_dir) == timeout:
+        return False
+    with open(toml_path, 'w') as f:
+        f.write(TIMEOUT_PATTERN.sub(f'timeout = {timeout}', config, count=1))
+    return True
+
+def task_time_budget(pending_jobs, timeout, baseline_seconds):
+    """
+    Worst-case wall time for the pending mutants: every one of them times out, plus one baseline-sized
+    run of per-mutant overhead (process startup, collection) and a minute of slack for the task itself.
+    """
+    return pending_jobs * (timeout + baseline_seconds) + 60
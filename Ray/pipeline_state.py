@@ -0,0 +1,73 @@
+# coding: utf-8
+
+# Description: Per-task stage fingerprints for resumable pipeline runs. Every task dir keeps a
+# `.pipeline.json` that maps a stage name to the fingerprint of the inputs it last ran on (plus
+# a few stage results). A rerun skips a stage whose fingerprint is unchanged and whose outputs
+# still exist, and redoes only missing or invalidated work.
+
+import os
+import json
+import hashlib
+
+STATE_FILE = '.pipeline.json'
+
+def fingerprint(*parts):
+    """sha256 over JSON-serialisable parts (file contents, config values, upstream fingerprints)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def file_fingerprint(task_dir, filenames, *extra):
+    """Fingerprint of the contents of `filenames` in `task_dir` (a missing file hashes as None)."""
+    contents = []
+    for filename in filenames:
+        path = os.path.join(task_dir, filename)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                contents.append(f.read())
+        else:
+            contents.append(None)
+    return fingerprint(list(filenames), contents, *extra)
+
+def load_state(task_dir):
+    try:
+        with open(os.path.join(task_dir, STATE_FILE), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_state(task_dir, state):
+    # 原子写入: 并发或中途崩溃时不会留下半个 .pipeline.json
+    path = os.path.join(task_dir, STATE_FILE)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(temp_path, path)
+
+def stage_info(task_dir, stage):
+    return load_state(task_dir).get(stage)
+
+def stage_done(task_dir, stage, stage_fingerprint, outputs=()):
+    """
+    True if `stage` last ran on `stage_fingerprint` and its outputs still exist: the files given here
+    plus those recorded by `mark_stage` (paths relative to `task_dir`).
+    """
+    info = stage_info(task_dir, stage)
+    if info is None or info.get('fingerprint') != stage_fingerprint:
+        return False
+    outputs = list(outputs) + info.get('outputs', [])
+    return all(os.path.exists(os.path.join(task_dir, output)) for output in outputs)
+
+def mark_stage(task_dir, stage, stage_fingerprint, outputs=(), **info):
+    state = load_state(task_dir)
+    state[stage] = dict(info, fingerprint=stage_fingerprint, outputs=list(outputs))
+    save_state(task_dir, state)
+
+def clear_stages(task_dir, stages):
+    state = load_state(task_dir)
+    if any(stage in state for stage in stages):
+        for stage in stages:
+            state.pop(stage, None)
+        save_state(task_dir, state)
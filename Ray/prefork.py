@@ -0,0 +1,119 @@
+# coding: utf-8
+
+# Description: Warm worker helpers. A long-lived worker imports the heavy harness
+# dependencies once, then runs every task in a forked copy of itself so that each
+# task still starts from a clean process image.
+
+import os
+import sys
+import time
+import signal
+import tempfile
+import importlib
+import traceback
+import subprocess
+
+# Modules pulled in by every `pytest --cov` run and by the `code_import` header
+WARM_MODULES = ['pytest', 'pytest_cov.plugin', 'coverage', 'numpy', 'pandas']
+
+_preloaded_modules = set()
+
+def preload_modules(modules=WARM_MODULES):
+    """Import `modules` into the current worker (once per process)."""
+    for name in modules:
+        if name in _preloaded_modules:
+            continue
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"[-] Preload failed for {name}: {e}")
+        _preloaded_modules.add(name)
+
+def _child_main(target, args, cwd, stdout_path, stderr_path):
+    exit_code = 1
+    try:
+        # Own process group, so that a timeout also takes down anything the task spawned
+        os.setpgid(0, 0)
+        if cwd:
+            os.chdir(cwd)
+        if stdout_path:
+            fd = os.open(stdout_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            os.dup2(fd, 1)
+            os.close(fd)
+        if stderr_path:
+            fd = os.open(stderr_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            os.dup2(fd, 2)
+            os.close(fd)
+        exit_code = target(*args)
+    except SystemExit as e:
+        exit_code = e.code
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+        if exit_code is None:
+            exit_code = 0
+        elif not isinstance(exit_code, int):
+            exit_code = 1
+        os._exit(exit_code & 0xFF)
+
+def wait_forked(pid, timeout=None, cmd=None):
+    """Wait for a forked child, killing its process group once `timeout` seconds have passed."""
+    deadline = time.monotonic() + timeout if timeout else None
+    delay = 0.001
+    while True:
+        wpid, status = os.waitpid(pid, os.WNOHANG)
+        if wpid:
+            return os.waitstatus_to_exitcode(status)
+        if deadline and time.monotonic() > deadline:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except OSError:
+                os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+def run_forked(target, args=(), cwd=None, timeout=None, cmd=None):
+    """
+    Run `target(*args)` in a forked child of the current process and capture its output.
+
+    The return value of `target` (or its `SystemExit` code) becomes the exit status.
+    Mirrors `subprocess.run(..., capture_output=True, text=True, timeout=timeout)`:
+    returns a `subprocess.CompletedProcess` and raises `subprocess.TimeoutExpired`.
+    """
+    with tempfile.TemporaryDirectory() as capture_dir:
+        stdout_path = os.path.join(capture_dir, 'stdout')
+        stderr_path = os.path.join(capture_dir, 'stderr')
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        pid = os.fork()
+        if pid == 0:
+            _child_main(target, args, cwd, stdout_path, stderr_path)
+
+        returncode = wait_forked(pid, timeout=timeout, cmd=cmd)
+
+        outputs = []
+        for path in (stdout_path, stderr_path):
+            try:
+                with open(path, 'r', errors='replace') as f:
+                    outputs.append(f.read())
+            except FileNotFoundError:
+                outputs.append('')
+        return subprocess.CompletedProcess(cmd, returncode, outputs[0], outputs[1])
+
+def _pytest_main(pytest_args):
+    import pytest
+    sys.argv = ['pytest'] + list(pytest_args)
+    return int(pytest.main(list(pytest_args)))
+
+def run_pytest_forked(pytest_args, cwd=None, timeout=None):
+    """Forked, in-process equivalent of `subprocess.run(['pytest', *pytest_args], ...)`."""
+    return run_forked(_pytest_main, (pytest_args,), cwd=cwd, timeout=timeout, cmd=['pytest'] + list(pytest_args))
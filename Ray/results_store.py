@@ -0,0 +1,209 @@
+# coding: utf-8
+
+# Description: One SQLite results store per benchmark (`data/{benchmark}/results.sqlite`) with one
+# row per (model, task, k) holding the pytest counts and coverage numbers. pytest workers append
+# rows as tasks finish; readers select only the columns they need. The nested `test_at_k` JSON
+# layout is still available through `load_entries` / `export_json`.
+
+import os
+import json
+import sqlite3
+from contextlib import closing
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pytest_results (
+    model TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    k INTEGER NOT NULL,
+    passed_tests INTEGER NOT NULL,
+    total_tests INTEGER NOT NULL,
+    stmts INTEGER NOT NULL,
+    miss_stmts INTEGER NOT NULL,
+    covered_branches INTEGER NOT NULL,
+    total_branches INTEGER NOT NULL,
+    coverage_error TEXT,
+    status TEXT,
+    PRIMARY KEY (model, task_id, k)
+) WITHOUT ROWID
+"""
+
+COVERAGE_COLUMNS = ['stmts', 'miss_stmts', 'covered_branches', 'total_branches']
+
+# 每个 k 都有结果且没有 coverage_error 的任务: 这些任务的 Test@k 指标可以直接求和
+REGULAR_TASKS = """
+SELECT task_id FROM pytest_results WHERE model = ? AND k IN ({placeholders})
+GROUP BY task_id HAVING COUNT(*) = ? AND COUNT(coverage_error) = 0
+"""
+
+def store_path(benchmark_name):
+    return f'data/{benchmark_name}/results.sqlite'
+
+def connect(benchmark_name, create=True):
+    """Open the benchmark's store. WAL lets one writer per task run alongside any number of readers."""
+    path = store_path(benchmark_name)
+    if create:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    elif not os.path.exists(path):
+        raise FileNotFoundError(path)
+    conn = sqlite3.connect(path, timeout=60)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    if create:
+        conn.execute(SCHEMA)
+    return conn
+
+def task_sort_key(task_id):
+    try:
+        return (0, int(task_id.split('_')[1]), task_id)
+    except (IndexError, ValueError):
+        return (1, 0, task_id)
+
+def record_results(benchmark_name, model_name, task_id, test_at_k, status='success'):
+    """Upsert one task's `{k: test_at_k_data}` (the `[test_counts, coverage]` pairs) in a single transaction."""
+    rows = []
+    for k, (counts, coverage) in test_at_k.items():
+        rows.append((
+            model_name, task_id, int(k),
+            counts['test_counts']['passed_tests'], counts['test_counts']['total_tests'],
+            *[coverage.get(column, 0) for column in COVERAGE_COLUMNS],
+            coverage.get('coverage_error'), status
+        ))
+    with closing(connect(benchmark_name)) as conn, conn:
+        conn.executemany('INSERT OR REPLACE INTO pytest_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+def clear_results(benchmark_name, model_name, k_values):
+    """Drop all of a model's rows for `k_values` (`--fresh` reruns recompute every task)."""
+    k_values = list(k_values)
+    placeholders = ', '.join('?' * len(k_values))
+    with closing(connect(benchmark_name)) as conn, conn:
+        conn.execute(f'DELETE FROM pytest_results WHERE model = ? AND k IN ({placeholders})', [model_name] + k_values)
+
+def prune_tasks(benchmark_name, model_name, k_values, task_ids):
+    """Drop a model's rows for `k_values` whose task is no longer in `task_ids`; rows of the kept tasks stay."""
+    k_values, task_ids = list(k_values), set(task_ids)
+    placeholders = ', '.join('?' * len(k_values))
+    with closing(connect(benchmark_name)) as conn, conn:
+        rows = conn.execute(
+            f'SELECT task_id, k FROM pytest_results WHERE model = ? AND k IN ({placeholders})',
+            [model_name] + k_values
+        ).fetchall()
+        stale = [(model_name, task_id, k) for task_id, k in rows if task_id not in task_ids]
+        conn.executemany('DELETE FROM pytest_results WHERE model = ? AND task_id = ? AND k = ?', stale)
+    return len(stale)
+
+def recorded_tasks(benchmark_name, model_name, k):
+    """Tasks that already have a row for (model, k)."""
+    if not os.path.exists(store_path(benchmark_name)):
+        return set()
+    with closing(connect(benchmark_name, create=False)) as conn:
+        rows = conn.execute('SELECT task_id FROM pytest_results WHERE model = ? AND k = ?', (model_name, k)).fetchall()
+    return {task_id for (task_id,) in rows}
+
+def has_results(benchmark_name, model_name, k=None):
+    if not os.path.exists(store_path(benchmark_name)):
+        return False
+    query, params = 'SELECT 1 FROM pytest_results WHERE model = ?', [model_name]
+    if k is not None:
+        query, params = query + ' AND k = ?', params + [k]
+    with closing(connect(benchmark_name, create=False)) as conn:
+        return conn.execute(query + ' LIMIT 1', params).fetchone() is not None
+
+def task_counts(benchmark_name, model_name, task_id, k):
+    """`(passed_tests, total_tests)` of one task at k, or None if it has no row yet."""
+    if not os.path.exists(store_path(benchmark_name)):
+        return None
+    with closing(connect(benchmark_name, create=False)) as conn:
+        return conn.execute(
+            'SELECT passed_tests, total_tests FROM pytest_results WHERE model = ? AND task_id = ? AND k = ?',
+            (model_name, task_id, k)
+        ).fetchone()
+
+def task_rows(benchmark_name, model_name, task_id, k_values):
+    """Raw rows of one task for `k_values`, for shipping results between hosts."""
+    if not os.path.exists(store_path(benchmark_name)):
+        return []
+    k_values = list(k_values)
+    placeholders = ', '.join('?' * len(k_values))
+    with closing(connect(benchmark_name, create=False)) as conn:
+        return [list(row) for row in conn.execute(
+            f'SELECT * FROM pytest_results WHERE model = ? AND task_id = ? AND k IN ({placeholders})',
+            [model_name, task_id] + k_values
+        )]
+
+def delete_task_rows(benchmark_name, model_name, task_id, k_values):
+    """Drop one task's rows for `k_values` (a worker's leftovers from earlier runs, before it reruns the task)."""
+    if not os.path.exists(store_path(benchmark_name)):
+        return
+    k_values = list(k_values)
+    placeholders = ', '.join('?' * len(k_values))
+    with closing(connect(benchmark_name)) as conn, conn:
+        conn.execute(f'DELETE FROM pytest_results WHERE model = ? AND task_id = ? AND k IN ({placeholders})', [model_name, task_id] + k_values)
+
+def insert_rows(benchmark_name, rows):
+    """Upsert rows returned by `task_rows`."""
+    with closing(connect(benchmark_name)) as conn, conn:
+        conn.executemany('INSERT OR REPLACE INTO pytest_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', [tuple(row) for row in rows])
+
+def passed_tasks(benchmark_name, model_name, k):
+    """Tasks whose first k tests all passed."""
+    with closing(connect(benchmark_name, create=False)) as conn:
+        rows = conn.execute(
+            'SELECT task_id FROM pytest_results WHERE model = ? AND k = ? AND total_tests > 0 AND passed_tests = total_tests',
+            (model_name, k)
+        ).fetchall()
+    return sorted((task_id for (task_id,) in rows), key=task_sort_key)
+
+def regular_totals(benchmark_name, model_name, k_values):
+    """
+    Per-k sums of the pass / coverage columns over the tasks with a row for every k and no coverage error:
+    `{k: {'passed_tests', 'covered_stmts', 'stmts', 'covered_branches', 'total_branches'}}`.
+    The other tasks are returned by `load_entries(..., irregular_only=True)`.
+    """
+    k_values = sorted(set(k_values))
+    placeholders = ', '.join('?' * len(k_values))
+    with closing(connect(benchmark_name, create=False)) as conn:
+        rows = conn.execute(
+            'SELECT k, SUM(passed_tests), SUM(stmts - miss_stmts), SUM(stmts), SUM(covered_branches), SUM(total_branches) '
+            f'FROM pytest_results WHERE model = ? AND k IN ({placeholders}) '
+            f'AND task_id IN ({REGULAR_TASKS.format(placeholders=placeholders)}) GROUP BY k',
+            [model_name] + k_values + [model_name] + k_values + [len(k_values)]
+        ).fetchall()
+    totals = {k: dict.fromkeys(['passed_tests', 'covered_stmts', 'stmts', 'covered_branches', 'total_branches'], 0) for k in k_values}
+    for k, *sums in rows:
+        totals[k] = dict(zip(totals[k], sums))
+    return totals
+
+def load_entries(benchmark_name, model_name, k_values, irregular_only=False):
+    """
+    The `[{"task_id", "test_at_k": {"test@k": {"result": [...]}}}]` layout of `pytest_results/{model}.json`.
+    `irregular_only` keeps just the tasks that `regular_totals` leaves out.
+    """
+    k_values = list(k_values)
+    placeholders = ', '.join('?' * len(k_values))
+    query = (f'SELECT task_id, k, passed_tests, total_tests, {", ".join(COVERAGE_COLUMNS)}, coverage_error '
+             f'FROM pytest_results WHERE model = ? AND k IN ({placeholders})')
+    params = [model_name] + k_values
+    if irregular_only:
+        query += f' AND task_id NOT IN ({REGULAR_TASKS.format(placeholders=placeholders)})'
+        params += [model_name] + k_values + [len(set(k_values))]
+    with closing(connect(benchmark_name, create=False)) as conn:
+        rows = conn.execute(query, params).fetchall()
+
+    entries = dict()
+    for task_id, k, passed_tests, total_tests, *coverage_values, coverage_error in rows:
+        coverage = dict(zip(COVERAGE_COLUMNS, coverage_values))
+        if coverage_error is not None:
+            coverage['coverage_error'] = coverage_error
+        entry = entries.setdefault(task_id, {"task_id": task_id, "test_at_k": {}})
+        entry["test_at_k"][f"test@{k}"] = {
+            "result": [{"test_counts": {"passed_tests": passed_tests, "total_tests": total_tests}}, coverage]
+        }
+    return [entries[task_id] for task_id in sorted(entries, key=task_sort_key)]
+
+def export_json(benchmark_name, model_name, k_values, output_path):
+    """Write the store's rows for one model as the legacy merged JSON file."""
+    entries = load_entries(benchmark_name, model_name, k_values)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(entries, f)
+    return len(entries)
@@ -0,0 +1,244 @@
+# coding: utf-8
+
+# Description: Global cost-aware job scheduler. Every (model, k, task, stage) unit is one job with
+# dependencies; ready jobs are dispatched longest-critical-path first to a single process pool, so
+# there is no barrier between stages, models or k values. Costs come from past runtimes, mutant
+# counts and cyclomatic complexity; job states and runtimes are kept in `data/{benchmark}/scheduler.sqlite`.
+
+import os
+import ast
+import json
+import time
+import heapq
+import sqlite3
+import traceback
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from tqdm import tqdm
+from tracing import trace_task
+
+try:
+    from radon.visitors import ComplexityVisitor
+except ImportError:
+    ComplexityVisitor = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    stage TEXT NOT NULL,
+    state TEXT NOT NULL,
+    result TEXT,
+    units REAL,
+    seconds REAL,
+    updated_at REAL
+) WITHOUT ROWID
+"""
+
+# 每个阶段单位成本的初始估计 (秒): mutate 按变异体数计, 其他阶段按圈复杂度计
+DEFAULT_RATES = {'pytest': 0.3, 'pytest_single_pass': 0.5, 'setup': 0.3, 'mutate': 0.5}
+BRANCH_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try, ast.ExceptHandler, ast.With, ast.AsyncWith,
+                ast.BoolOp, ast.IfExp, ast.comprehension, ast.Assert)
+
+def cyclomatic_complexity(source):
+    """Total cyclomatic complexity of a module (radon if installed, otherwise a branch-node count)."""
+    if ComplexityVisitor is not None:
+        try:
+            return max(ComplexityVisitor.from_code(source).total_complexity, 1)
+        except Exception:
+            pass
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return 1
+    return 1 + sum(isinstance(node, BRANCH_NODES) for node in ast.walk(tree))
+
+def scheduler_path(benchmark_name):
+    return f'data/{benchmark_name}/scheduler.sqlite'
+
+class JobStore:
+    """Job states (pending / running / done / failed / skipped / incomplete) and runtimes of past runs."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def runtimes(self):
+        """`{job_id: (units, seconds)}` of every job that ran to completion at least once."""
+        rows = self.conn.execute('SELECT job_id, units, seconds FROM jobs WHERE seconds IS NOT NULL').fetchall()
+        return {job_id: (units, seconds) for job_id, units, seconds in rows}
+
+    def stage_rates(self):
+        """Measured seconds per unit of each stage; stages without history use `DEFAULT_RATES`."""
+        rates = dict(DEFAULT_RATES)
+        rows = self.conn.execute(
+            'SELECT stage, SUM(seconds), SUM(units) FROM jobs WHERE seconds IS NOT NULL AND units > 0 GROUP BY stage'
+        ).fetchall()
+        for stage, seconds, units in rows:
+            if units:
+                rates[stage] = seconds / units
+        return rates
+
+    def reset(self):
+        """Forget states but keep runtimes (used by `--fresh`)."""
+        with self.conn:
+            self.conn.execute("UPDATE jobs SET state = 'pending', result = NULL")
+
+    def update(self, job_id, stage, state, result=None, units=None, seconds=None):
+        # 只有真正运行过的 job 才覆盖历史运行时间
+        with self.conn:
+            self.conn.execute(
+                'INSERT INTO jobs (job_id, stage, state, result, units, seconds, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(job_id) DO UPDATE SET state = excluded.state, result = excluded.result, '
+                'units = COALESCE(excluded.units, units), seconds = COALESCE(excluded.seconds, seconds), updated_at = excluded.updated_at',
+                (job_id, stage, state, json.dumps(result, default=str), units, seconds, time.time())
+            )
+
+def make_job(job_id, stage, func, args, deps=(), units=None, when=None, done=None, complete=None, paths=(), store_key=None):
+    """
+    One schedulable unit.
+
+    `units` (callable) sizes the job for the cost model (mutants for 'mutate', complexity otherwise) and is
+    re-evaluated when the job becomes ready. `when(results)` decides from the dependencies' results whether
+    the job runs at all; `done()` returns `(True, result)` if the work is already done (resume); `complete(result)`
+    tells a finished run from one that stopped early and must run again next time.
+
+    `paths` (task dirs the job reads and writes) and `store_key` (`(benchmark, model, task, k_values)` of the
+    results-store rows it writes) are only used by remote backends, which ship them to and from the worker.
+    """
+    return {
+        'id': job_id, 'stage': stage, 'func': func, 'args': tuple(args), 'deps': list(deps),
+        'units': units or (lambda: 1), 'when': when, 'done': done, 'complete': complete,
+        'paths': list(paths), 'store_key': store_key
+    }
+
+def _timed_call(func, args):
+    start_time = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start_time
+
+class ProcessBackend:
+    """Runs jobs in a local process pool. Backends return futures of `(result, seconds)` from `submit_job`."""
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = None
+
+    def __enter__(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.executor.shutdown()
+
+    def submit_job(self, job):
+        return self.executor.submit(_timed_call, trace_task(job['stage'], job['func']), job['args'])
+
+def run_jobs(jobs, store, max_workers=None, desc="[+] 🗓️ Running scheduled jobs", backend=None):
+    """
+    Run a job DAG to completion; returns `{job_id: result}` (None for skipped or failed jobs).
+    `backend` defaults to a local `ProcessBackend(max_workers)`; at most `backend.max_workers` jobs are in flight.
+    """
+    backend = backend or ProcessBackend(max_workers)
+    max_workers = backend.max_workers
+    jobs_by_id = {job['id']: job for job in jobs}
+    dependents = defaultdict(list)
+    for job in jobs:
+        for dep in job['deps']:
+            dependents[dep].append(job['id'])
+    waiting = {job['id']: len(job['deps']) for job in jobs}
+
+    runtimes = store.runtimes()
+    rates = store.stage_rates()
+
+    def estimate(job_id):
+        job = jobs_by_id[job_id]
+        units = job['units']()
+        # mutate 的剩余变异体数随进度变化, 按单位成本估计; 其他阶段优先使用上次的实际运行时间
+        if job['stage'] != 'mutate' and job_id in runtimes:
+            return runtimes[job_id][1], units
+        return rates.get(job['stage'], 1.0) * units, units
+
+    # 关键路径长度 = 自身成本 + 最长的下游链; 先调度关键路径最长的 job
+    rank_cache = dict()
+    def rank(job_id):
+        if job_id not in rank_cache:
+            downstream = max((rank(child) for child in dependents[job_id]), default=0.0)
+            rank_cache[job_id] = estimate(job_id)[0] + downstream
+        return rank_cache[job_id]
+
+    results, units_by_job = dict(), dict()
+    ready, order = [], 0
+    progress = tqdm(total=len(jobs), desc=desc)
+    counts = defaultdict(int)
+
+    def finish(job_id, state, result=None, seconds=None):
+        job = jobs_by_id[job_id]
+        results[job_id] = result
+        counts[state] += 1
+        store.update(job_id, job['stage'], state, result, units_by_job.get(job_id), seconds)
+        progress.update(1)
+        for child in dependents[job_id]:
+            waiting[child] -= 1
+            if waiting[child] == 0:
+                release(child)
+
+    def release(job_id):
+        nonlocal order
+        job = jobs_by_id[job_id]
+        if job['when'] is not None and not job['when'](results):
+            finish(job_id, 'skipped')
+            return
+        if job['done'] is not None:
+            already_done, result = job['done']()
+            if already_done:
+                finish(job_id, 'done', result)
+                return
+        # 依赖完成后重新估计 (例如 setup 之后才知道真实的变异体数)
+        rank_cache.pop(job_id, None)
+        cost, units_by_job[job_id] = estimate(job_id)
+        priority = cost + max((rank(child) for child in dependents[job_id]), default=0.0)
+        heapq.heappush(ready, (-priority, order, job_id))
+        order += 1
+
+    start_time = time.perf_counter()
+    busy_seconds = 0.0
+    running = dict()
+    with backend:
+        # 先取出根节点: release 可能同步完成 job 并释放其下游
+        for job_id in [job['id'] for job in jobs if waiting[job['id']] == 0]:
+            release(job_id)
+
+        while ready or running:
+            while ready and len(running) < max_workers:
+                _, _, job_id = heapq.heappop(ready)
+                job = jobs_by_id[job_id]
+                store.update(job_id, job['stage'], 'running')
+                running[backend.submit_job(job)] = job_id
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job_id = running.pop(future)
+                job = jobs_by_id[job_id]
+                try:
+                    result, seconds = future.result()
+                except Exception as e:
+                    print(f'[-] Job {job_id} failed: {e}')
+                    traceback.print_exc()
+                    finish(job_id, 'failed')
+                    continue
+                busy_seconds += seconds
+                state = 'done' if job['complete'] is None or job['complete'](result) else 'incomplete'
+                finish(job_id, state, result, seconds)
+
+    progress.close()
+    wall_seconds = time.perf_counter() - start_time
+    utilization = busy_seconds / (wall_seconds * max_workers) if wall_seconds > 0 else 0.0
+    summary = ', '.join(f'{count} {state}' for state, count in sorted(counts.items()))
+    print(f'[+] ✅ Scheduler finished {len(jobs)} jobs ({summary}) in {wall_seconds:.0f}s | worker utilization: {utilization:.0%} of {max_workers} workers')
+    return results
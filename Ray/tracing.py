@@ -0,0 +1,192 @@
+# coding: utf-8
+
+# Description: Optional stage/task/subprocess tracing in Chrome trace format. With `--trace trace.json`
+# (or `ULT_TRACE_DIR` set) every process appends finished spans to its own `spans.{pid}.jsonl`;
+# `finish_trace` merges them into one `trace.json` for chrome://tracing or Perfetto. Each worker
+# process is one row; task spans carry the queue wait and the worker's dispatch gap, and every span
+# has an exit reason (ok / timeout / error). The fork engine records one span per mutant; `cosmic-ray exec` runs its
+# per-mutant test commands itself, so there the whole exec call is a single span. With tracing off
+# the helpers are no-ops.
+
+import os
+import json
+import glob
+import time
+import shutil
+import functools
+import threading
+import subprocess
+from collections import defaultdict
+from contextlib import contextmanager
+
+TRACE_ENV = 'ULT_TRACE_DIR'
+TRACE_PID_ENV = 'ULT_TRACE_PID'
+
+# 当前 worker (进程池中的进程或线程) 上一个任务结束的时间, 用于 dispatch_gap
+_worker = threading.local()
+
+def enabled():
+    return bool(os.environ.get(TRACE_ENV))
+
+def now_us():
+    # 墙上时钟: 不同进程记录的 span 可以直接放在同一条时间轴上
+    return int(time.time() * 1e6)
+
+def record(name, cat, start_us, end_us, **args):
+    """Append one finished span of the current process."""
+    trace_dir = os.environ.get(TRACE_ENV)
+    if not trace_dir:
+        return
+    event = {
+        'name': name, 'cat': cat, 'ph': 'X', 'ts': start_us, 'dur': max(end_us - start_us, 0),
+        'pid': int(os.environ.get(TRACE_PID_ENV, os.getpid())), 'tid': os.getpid(), 'args': args
+    }
+    # 每个进程一个文件, 追加写入一行: 无需加锁
+    with open(os.path.join(trace_dir, f'spans.{os.getpid()}.jsonl'), 'a') as f:
+        f.write(json.dumps(event, default=str) + '\n')
+
+def exit_reason(error):
+    if error is None:
+        return 'ok'
+    if isinstance(error, subprocess.TimeoutExpired):
+        return 'timeout'
+    return 'error'
+
+@contextmanager
+def span(name, cat='task', **args):
+    """
+    Trace the enclosed block. The yielded dict becomes the span's args; set `exit` in it to override
+    the reason derived from how the block ended (e.g. a non-zero return code).
+    """
+    if not enabled():
+        yield dict()
+        return
+    info = dict(args)
+    start_us = now_us()
+    error = None
+    try:
+        yield info
+    except BaseException as e:
+        error = e
+        info.setdefault('error', repr(e)[:200])
+        raise
+    finally:
+        info.setdefault('exit', exit_reason(error))
+        record(name, cat, start_us, now_us(), **info)
+
+def traced_stage(func):
+    """Decorator: one 'stage' span per call of a pipeline stage in the driver process."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(func.__name__, cat='stage'):
+            return func(*args, **kwargs)
+    return wrapper
+
+def task_label(args):
+    """Short label for a task span from a worker's arguments (the `task_*` id if there is one)."""
+    for arg in args:
+        if isinstance(arg, str) and arg.startswith('task_'):
+            return arg
+    return None
+
+class TracedTask:
+    """
+    Picklable wrapper that records a 'task' span with the time the item waited in the pool's queue (from the
+    stage's submission to the task's start) and, after a worker's first task, the dispatch gap since the end of
+    the previous task on the same worker.
+    """
+
+    def __init__(self, stage, func, enqueued_us):
+        self.stage = stage
+        self.func = func
+        self.enqueued_us = enqueued_us
+
+    def __call__(self, *args):
+        start_us = now_us()
+        # queue_wait 随积压增长, 暴露超额订阅的阶段; dispatch_gap 是同一 worker 上两个任务之间的调度开销
+        timing = {'queue_wait_ms': round((start_us - self.enqueued_us) / 1000, 3)}
+        free_us = getattr(_worker, 'free_us', None)
+        if free_us is not None:
+            timing['dispatch_gap_ms'] = round((start_us - free_us) / 1000, 3)
+        try:
+            with span(self.stage, cat='task', task=task_label(args), **timing) as info:
+                result = self.func(*args)
+                # 标量结果 (例如 setup / mutate 返回的 True/False) 直接记录, 便于找出失败或未完成的任务
+                if isinstance(result, (bool, int, float, str)):
+                    info['result'] = result
+                return result
+        finally:
+            _worker.free_us = now_us()
+
+def trace_task(stage, func):
+    """`func` wrapped for `process_map` / executors when tracing is on, otherwise `func` itself."""
+    if not enabled():
+        return func
+    return TracedTask(stage, func, now_us())
+
+def traced_run(name, run, cmd, **kwargs):
+    """`run(cmd, **kwargs)` (subprocess.run or a drop-in) inside a 'subprocess' span; non-zero exits are 'error'."""
+    with span(name, cat='subprocess', cmd=' '.join(map(str, cmd))[:200]) as info:
+        result = run(cmd, **kwargs)
+        info['returncode'] = result.returncode
+        if result.returncode != 0:
+            info['exit'] = 'error'
+        return result
+
+def start_trace(output_path=None):
+    """
+    Turn tracing on for this process and every child it starts and return the `trace.json` path:
+    spans go to `{output_path}.spans/`, or, without `output_path`, to an existing `$ULT_TRACE_DIR`
+    (merged into `trace.json` there). Returns None if tracing stays off.
+    """
+    if output_path is None:
+        if not enabled():
+            return None
+        trace_dir = os.environ[TRACE_ENV]
+        os.makedirs(trace_dir, exist_ok=True)
+        output_path = os.path.join(trace_dir, 'trace.json')
+    else:
+        trace_dir = f'{os.path.abspath(output_path)}.spans'
+        shutil.rmtree(trace_dir, ignore_errors=True)
+        os.makedirs(trace_dir)
+        os.environ[TRACE_ENV] = trace_dir
+    os.environ[TRACE_PID_ENV] = str(os.getpid())
+    print(f"[+] 🧭 Tracing to {output_path}")
+    return output_path
+
+def finish_trace(output_path):
+    """Merge the spans of every process into `output_path` (Chrome trace JSON) and turn tracing off."""
+    trace_dir = os.environ.get(TRACE_ENV)
+    if not trace_dir:
+        return
+    span_paths = glob.glob(os.path.join(trace_dir, 'spans.*.jsonl'))
+    events = []
+    for path in span_paths:
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # 被杀死的进程可能留下半行
+                    continue
+    events.sort(key=lambda event: event['ts'])
+
+    driver_pid = int(os.environ.get(TRACE_PID_ENV, os.getpid()))
+    metadata = [{'name': 'process_name', 'ph': 'M', 'pid': driver_pid, 'tid': 0, 'args': {'name': 'UnLeakedTestBench pipeline'}}]
+    for tid in sorted({event['tid'] for event in events}):
+        label = 'driver' if tid == driver_pid else f'worker {tid}'
+        metadata.append({'name': 'thread_name', 'ph': 'M', 'pid': driver_pid, 'tid': tid, 'args': {'name': label}})
+
+    with open(output_path, 'w') as f:
+        json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, f)
+    for path in span_paths:
+        os.remove(path)
+    if trace_dir.endswith('.spans') and not os.listdir(trace_dir):
+        os.rmdir(trace_dir)
+    os.environ.pop(TRACE_ENV, None)
+    os.environ.pop(TRACE_PID_ENV, None)
+
+    counts = defaultdict(int)
+    for event in events:
+        counts[event['args'].get('exit', 'ok')] += 1
+    print(f"[+] 🧭 Trace saved: {output_path} ({len(events)} spans: {', '.join(f'{n} {reason}' for reason, n in sorted(counts.items()))})")
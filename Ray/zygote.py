@@ -0,0 +1,427 @@
+# coding: utf-8
+
+# Description: Preloaded zygote interpreter. A long-lived server imports the `code_import` header
+# (numpy, pandas, pytest, ...) once and forks a child for every `pytest ...` or `python ...` command
+# it is sent over a Unix socket; the caller's stdin/stdout/stderr fds are passed along with the
+# request, so output, exit status and timeouts behave as with `subprocess.run`. `zygote_service()`
+# also puts a `pytest` shim on PATH, which sends the pytest runs started by cosmic-ray (baseline and
+# every mutant) through the zygote without touching `cosmic-ray.toml`.
+#
+#   python Ray/zygote.py serve --socket /tmp/zygote.sock
+#   ULT_ZYGOTE_SOCKET=/tmp/zygote.sock python Ray/zygote.py exec -- pytest test.py
+
+import os
+import gc
+import sys
+import json
+import stat
+import runpy
+import shutil
+import signal
+import socket
+import argparse
+import tempfile
+import threading
+import warnings
+import selectors
+import traceback
+import subprocess
+from contextlib import ExitStack, contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from prefork import WARM_MODULES, preload_modules, _child_main, _pytest_main
+
+SOCKET_ENV = 'ULT_ZYGOTE_SOCKET'
+ZYGOTE_PATH = os.path.abspath(__file__)
+
+# Everything the `code_import` header imports, on top of pytest/coverage
+ZYGOTE_MODULES = WARM_MODULES + ['os', 're', 'math', 'random', 'string', 'warnings', 'datetime', 'traceback', 'typing']
+
+MAX_MESSAGE = 1 << 20
+
+SHIM_TEMPLATE = """#!/bin/sh
+exec "{python}" "{zygote}" exec -- pytest "$@"
+"""
+
+class ZygoteUnavailable(OSError):
+    """The zygote socket is not configured or nobody is listening on it."""
+
+def zygote_target(argv):
+    """`(target, args, sys_path0)` for a command the zygote can run in a forked child, else None."""
+    if not argv:
+        return None
+    program = os.path.basename(argv[0])
+    if program in ('pytest', 'py.test'):
+        return _pytest_main, (argv[1:],), os.path.dirname(sys.executable)
+    if not program.startswith('python') or len(argv) < 2:
+        return None
+    if argv[1] == '-m' and len(argv) > 2:
+        return _run_module, (argv[2], argv[3:]), None
+    if argv[1] == '-c' and len(argv) > 2:
+        return _run_code, (argv[2], argv[3:]), None
+    if argv[1].endswith('.py'):
+        return _run_script, (argv[1], argv[2:]), None
+    return None
+
+def _run_module(module_name, args):
+    sys.argv = [module_name] + list(args)
+    runpy.run_module(module_name, run_name='__main__', alter_sys=True)
+    return 0
+
+def _run_code(code, args):
+    sys.argv = ['-c'] + list(args)
+    exec(compile(code, '<string>', 'exec'), {'__name__': '__main__'})
+    return 0
+
+def _run_script(script, args):
+    sys.argv = [script] + list(args)
+    sys.path[0] = os.path.dirname(os.path.abspath(script))
+    runpy.run_path(script, run_name='__main__')
+    return 0
+
+def _start_child(request, fds):
+    """Runs in the forked child: adopt the caller's stdio, cwd and environment, then run the command."""
+    for signum in (signal.SIGCHLD, signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, signal.SIG_DFL)
+    signal.set_wakeup_fd(-1)
+    for target_fd, fd in enumerate(fds):
+        os.dup2(fd, target_fd)
+    # 其余继承来的 fd (监听 socket, 其他连接, 其他请求尚未转交的 stdio) 必须全部关闭,
+    # 否则这些客户端要等本子进程退出才收得到 EOF
+    os.closerange(3, os.sysconf('SC_OPEN_MAX'))
+
+    os.environ.clear()
+    os.environ.update(request['env'])
+    sys.dont_write_bytecode = bool(os.environ.get('PYTHONDONTWRITEBYTECODE'))
+    # 所有子进程共享 zygote 的随机状态; random 在 fork 时自动重新播种, numpy 需要手动
+    if 'numpy' in sys.modules:
+        sys.modules['numpy'].random.seed()
+
+    target, args, sys_path0 = zygote_target(request['argv'])
+    os.chdir(request['cwd'])
+    sys.path[0] = sys_path0 or os.getcwd()
+    _child_main(target, args, None, None, None)
+
+def serve(socket_path, modules=ZYGOTE_MODULES):
+    """Preload `modules`, then fork one child per request until SIGTERM."""
+    preload_modules(modules)
+    # 预加载的对象移出 GC 追踪: 子进程里的回收不会触碰 (并复制) 这些共享页
+    gc.freeze()
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    # 监听就绪后再改名, 客户端看到 socket 文件时一定可以连接
+    temp_path = f'{socket_path}.{os.getpid()}.tmp'
+    listener.bind(temp_path)
+    listener.listen(128)
+    os.replace(temp_path, socket_path)
+
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_r, False)
+    os.set_blocking(wakeup_w, False)
+    signal.set_wakeup_fd(wakeup_w)
+    signal.signal(signal.SIGCHLD, lambda *_: None)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    # 只有主线程 fork; 读取请求的线程不持有子进程会用到的锁 (Python 3.12+ 对此发出 DeprecationWarning)
+    warnings.filterwarnings('ignore', message='This process .* is multi-threaded', category=DeprecationWarning)
+
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    selector.register(wakeup_r, selectors.EVENT_READ)
+    children, pids = dict(), dict()  # pid -> conn (None once the client is gone), conn fd -> pid
+    ready = []  # (conn, request, fds) read by reader threads, forked by the main loop
+    print(f'[+] 🧬 Zygote serving on {socket_path} (pid {os.getpid()})', flush=True)
+
+    def read_request(conn):
+        """Reader thread: receive one request. A slow or silent client only holds up its own thread."""
+        try:
+            message, fds, _, _ = socket.recv_fds(conn, MAX_MESSAGE, 3)
+            request = json.loads(message)
+        except (OSError, ValueError):
+            conn.close()
+            return
+        if len(fds) != 3 or zygote_target(request.get('argv')) is None:
+            for fd in fds:
+                os.close(fd)
+            try:
+                conn.sendall(json.dumps({'error': 'unsupported request'}).encode())
+            except OSError:
+                pass
+            conn.close()
+            return
+        # list.append 是原子操作; 主循环被 wakeup 管道唤醒后负责 fork
+        ready.append((conn, request, fds))
+        try:
+            os.write(wakeup_w, b'\0')
+        except BlockingIOError:
+            pass
+
+    def start(conn, request, fds):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _start_child(request, fds)
+            finally:
+                # _child_main 总是自己退出; 走到这里说明进入命令之前就失败了
+                traceback.print_exc()
+                os._exit(1)
+        for fd in fds:
+            os.close(fd)
+        # 与子进程 setpgid 竞争: 父进程也设置一次, 保证 killpg 立即可用
+        try:
+            os.setpgid(pid, pid)
+        except OSError:
+            pass
+        children[pid] = conn
+        pids[conn.fileno()] = pid
+        conn.setblocking(True)
+        try:
+            conn.sendall(json.dumps({'pid': pid}).encode())
+        except OSError:
+            kill(pid)
+        selector.register(conn, selectors.EVENT_READ)
+
+    def drop(conn):
+        selector.unregister(conn)
+        pids.pop(conn.fileno(), None)
+        conn.close()
+
+    def kill(pid):
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    try:
+        while True:
+            for key, _ in selector.select():
+                if key.fileobj is listener:
+                    # 读取请求交给线程: 发送缓慢或不发送请求的客户端不会阻塞其他 pytest 的启动
+                    conn, _ = listener.accept()
+                    conn.settimeout(5)
+                    threading.Thread(target=read_request, args=(conn,), daemon=True).start()
+
+                elif key.fileobj == wakeup_r:
+                    try:
+                        while os.read(wakeup_r, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    while ready:
+                        start(*ready.pop(0))
+                    while True:
+                        try:
+                            pid, status = os.waitpid(-1, os.WNOHANG)
+                        except ChildProcessError:
+                            break
+                        if pid == 0:
+                            break
+                        conn = children.pop(pid, None)
+                        if conn is not None:
+                            try:
+                                conn.sendall(json.dumps({'returncode': os.waitstatus_to_exitcode(status)}).encode())
+                            except OSError:
+                                pass
+                            drop(conn)
+
+                else:
+                    # 客户端发来 kill (超时) 或断开连接 (例如被 cosmic-ray 超时杀死): 杀掉整个进程组
+                    conn = key.fileobj
+                    try:
+                        message = conn.recv(64)
+                    except OSError:
+                        message = b''
+                    pid = pids.get(conn.fileno())
+                    if pid is not None:
+                        kill(pid)
+                    if not message:
+                        if pid is not None:
+                            children[pid] = None
+                        drop(conn)
+    finally:
+        for pid in children:
+            kill(pid)
+        listener.close()
+        try:
+            os.unlink(socket_path)
+        except FileNotFoundError:
+            pass
+
+def _stream_fd(stack, spec, default_fd, capture_dir, name):
+    """The fd to hand to the child for one stdio stream and, when captured, the fd to read it back from."""
+    if spec == subprocess.PIPE:
+        fd = os.open(os.path.join(capture_dir, name), os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        stack.callback(os.close, fd)
+        return fd, fd
+    if spec == subprocess.DEVNULL:
+        fd = os.open(os.devnull, os.O_RDWR)
+        stack.callback(os.close, fd)
+        return fd, None
+    if spec is None:
+        return default_fd, None
+    if isinstance(spec, int):
+        return spec, None
+    return spec.fileno(), None
+
+def _read_capture(fd, text):
+    if fd is None:
+        return None
+    os.lseek(fd, 0, os.SEEK_SET)
+    chunks = []
+    while True:
+        chunk = os.read(fd, 1 << 16)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    data = b''.join(chunks)
+    return data.decode('utf-8', errors='replace') if text else data
+
+def _connect(socket_path, request, fds):
+    if not socket_path:
+        raise ZygoteUnavailable(f'{SOCKET_ENV} is not set')
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    try:
+        conn.connect(socket_path)
+        socket.send_fds(conn, [json.dumps(request).encode()], fds)
+        reply = json.loads(conn.recv(MAX_MESSAGE) or b'{}')
+    except (OSError, ValueError) as e:
+        conn.close()
+        raise ZygoteUnavailable(f'zygote at {socket_path} is unavailable: {e}') from e
+    if 'pid' not in reply:
+        conn.close()
+        raise ZygoteUnavailable(f'zygote at {socket_path} refused {request["argv"]}: {reply.get("error")}')
+    return conn, reply['pid']
+
+def run(cmd, cwd=None, env=None, timeout=None, input=None, stdin=None, stdout=None, stderr=None,
+        capture_output=False, text=False, check=False, socket_path=None):
+    """
+    `subprocess.run` for `pytest ...` and `python ...` commands, served by the zygote at `socket_path`
+    (default `$ULT_ZYGOTE_SOCKET`). Other commands, or an unreachable zygote, fall back to `subprocess.run`.
+    Returns a `subprocess.CompletedProcess`; raises `subprocess.TimeoutExpired` / `subprocess.CalledProcessError`.
+    """
+    argv = [os.fspath(arg) for arg in cmd]
+    socket_path = socket_path or os.environ.get(SOCKET_ENV)
+    if capture_output:
+        stdout = stderr = subprocess.PIPE
+    if socket_path and zygote_target(argv) is not None:
+        try:
+            return _run_in_zygote(argv, cwd, env, timeout, input, stdin, stdout, stderr, text, check, socket_path)
+        except ZygoteUnavailable as e:
+            print(f'[-] {e}; running {argv[0]} as a subprocess', file=sys.stderr)
+    if socket_path and os.path.basename(argv[0]) in ('pytest', 'py.test'):
+        # PATH 上的 pytest 可能就是 zygote 的 shim, 直接用解释器启动避免递归
+        argv = [sys.executable, '-m', 'pytest'] + argv[1:]
+    return subprocess.run(argv, cwd=cwd, env=env, timeout=timeout, input=input, stdin=stdin, stdout=stdout, stderr=stderr, text=text, check=check)
+
+def _run_in_zygote(argv, cwd, env, timeout, input, stdin, stdout, stderr, text, check, socket_path):
+    with ExitStack() as stack:
+        capture_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        if input is not None:
+            stdin_fd = os.open(os.path.join(capture_dir, 'stdin'), os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+            stack.callback(os.close, stdin_fd)
+            os.write(stdin_fd, input.encode('utf-8') if isinstance(input, str) else input)
+            os.lseek(stdin_fd, 0, os.SEEK_SET)
+        else:
+            stdin_fd, _ = _stream_fd(stack, stdin, 0, capture_dir, 'stdin')
+        stdout_fd, stdout_capture = _stream_fd(stack, stdout, 1, capture_dir, 'stdout')
+        if stderr == subprocess.STDOUT:
+            stderr_fd, stderr_capture = stdout_fd, None
+        else:
+            stderr_fd, stderr_capture = _stream_fd(stack, stderr, 2, capture_dir, 'stderr')
+
+        request = {
+            'argv': argv,
+            'cwd': os.path.abspath(cwd or os.getcwd()),
+            'env': dict(os.environ if env is None else env),
+        }
+        conn, pid = _connect(socket_path, request, [stdin_fd, stdout_fd, stderr_fd])
+        with conn:
+            conn.settimeout(timeout)
+            try:
+                reply = conn.recv(MAX_MESSAGE)
+            except socket.timeout:
+                conn.settimeout(None)
+                conn.sendall(b'kill')
+                conn.recv(MAX_MESSAGE)
+                raise subprocess.TimeoutExpired(argv, timeout, _read_capture(stdout_capture, text), _read_capture(stderr_capture, text))
+        if not reply:
+            raise RuntimeError(f'zygote at {socket_path} exited while running {argv} (pid {pid})')
+        returncode = json.loads(reply)['returncode']
+
+        completed = subprocess.CompletedProcess(argv, returncode, _read_capture(stdout_capture, text), _read_capture(stderr_capture, text))
+    if check:
+        completed.check_returncode()
+    return completed
+
+@contextmanager
+def zygote_service(modules=None):
+    """
+    Start a zygote server for the duration of the block. Sets `$ULT_ZYGOTE_SOCKET` for `run` and puts a
+    `pytest` shim first on PATH, so child processes (process_map workers, cosmic-ray) use it as well.
+    """
+    runtime_dir = tempfile.mkdtemp(prefix='ult-zygote-')
+    socket_path = os.path.join(runtime_dir, 'zygote.sock')
+    cmd = [sys.executable, ZYGOTE_PATH, 'serve', '--socket', socket_path]
+    if modules:
+        cmd += ['--modules', ','.join(modules)]
+    server = subprocess.Popen(cmd)
+
+    saved_env = {name: os.environ.get(name) for name in (SOCKET_ENV, 'PATH')}
+    try:
+        while not os.path.exists(socket_path):
+            if server.poll() is not None:
+                raise RuntimeError(f'zygote exited during startup with status {server.returncode}')
+            try:
+                server.wait(timeout=0.05)
+            except subprocess.TimeoutExpired:
+                pass
+
+        shim_dir = os.path.join(runtime_dir, 'bin')
+        os.makedirs(shim_dir)
+        shim_path = os.path.join(shim_dir, 'pytest')
+        with open(shim_path, 'w') as f:
+            f.write(SHIM_TEMPLATE.format(python=sys.executable, zygote=ZYGOTE_PATH))
+        os.chmod(shim_path, os.stat(shim_path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+        os.environ[SOCKET_ENV] = socket_path
+        os.environ['PATH'] = shim_dir + os.pathsep + os.environ.get('PATH', '')
+        yield socket_path
+    finally:
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+        shutil.rmtree(runtime_dir, ignore_errors=True)
+
+def exec_main(argv):
+    """Run `argv` through the zygote with this process's stdio and exit with its status (the `pytest` shim)."""
+    try:
+        returncode = run(argv).returncode
+    except KeyboardInterrupt:
+        returncode = 130
+    # 与 shell 的约定一致: 被信号 N 杀死记为 128+N
+    sys.exit(returncode if returncode >= 0 else 128 - returncode)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve_parser = subparsers.add_parser('serve', help='preload the header modules and serve fork requests')
+    serve_parser.add_argument('--socket', type=str, required=True)
+    serve_parser.add_argument('--modules', type=str, default=None, help='comma-separated modules to preload (default: the code_import header)')
+    exec_parser = subparsers.add_parser('exec', help=f'run a command through the zygote at ${SOCKET_ENV}')
+    exec_parser.add_argument('argv', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.socket, args.modules.split(',') if args.modules else ZYGOTE_MODULES)
+    else:
+        argv = args.argv[1:] if args.argv[:1] == ['--'] else args.argv
+        exec_main(argv)
@@ -1,17 +1,19 @@
 import json
 import os
 import sys
-import re
 import argparse
-import subprocess
 import wandb
 from collections import defaultdict
-from tqdm.contrib.concurrent import process_map
 
-def analyze_test_at_k_results(input_file, model_name=None, k_values=None, global_results=None):
-    """分析Test@k结果，使用新的计算方式聚合各指标"""
-    with open(input_file, 'r') as f:
-        data = json.load(f)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Ray'))
+from mutation_stats import mutation_statistics
+import results_store
+
+def analyze_test_at_k_results(input_file, model_name=None, k_values=None, global_results=None, data=None, totals=None):
+    """分析Test@k结果，使用新的计算方式聚合各指标; `totals` 为结果库中已经在 SQL 里求和的任务 (regular_totals)"""
+    if data is None:
+        with open(input_file, 'r') as f:
+            data = json.load(f)
     
     # 动态创建聚合指标字典
     aggregated_metrics = {}
@@ -19,6 +21,10 @@ def analyze_test_at_k_results(input_file, model_name=None, k_values=None, global
         aggregated_metrics[f'pass@{k}'] = {'passed_tests': 0, 'total_tests': 0}
         aggregated_metrics[f'line_cov@{k}'] = {'covered_stmts': 0, 'stmts': 0}
         aggregated_metrics[f'branch_cov@{k}'] = {'covered_branches': 0, 'total_branches': 0}
+        if totals is not None:
+            aggregated_metrics[f'pass@{k}']['passed_tests'] = totals[k]['passed_tests']
+            aggregated_metrics[f'line_cov@{k}'].update(covered_stmts=totals[k]['covered_stmts'], stmts=totals[k]['stmts'])
+            aggregated_metrics[f'branch_cov@{k}'].update(covered_branches=totals[k]['covered_branches'], total_branches=totals[k]['total_branches'])
     
     task_num = 0
     for entry in data:
@@ -87,46 +93,6 @@ def analyze_test_at_k_results(input_file, model_name=None, k_values=None, global
         final_metrics[metrics_key] = (100 * covered / total if total > 0 else 0)
     return final_metrics
 
-def mutation_statistic_wrapper(benchmark_name, model_name, num_test_cases, task):
-    working_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task}'
-
-    statistic_info = {
-        "task": task,
-        "complete_rate": 0.0,
-        "surviving_mutants_rate": 0.0,
-        "total_jobs_number": 0,
-        "completed_jobs_number": 0,
-        "surviving_mutants_number": 0
-    }
-
-    try:
-        response = subprocess.run(['cr-report', f'cosmic-ray.sqlite', '--show-pending'], cwd=working_dir, check=True, capture_output=True, text=True)
-    except Exception as e:
-        print(f'[-] Error @ [{working_dir}]: {e}')
-        return statistic_info
-
-    total_jobs_match = re.search(r"total jobs:\s*(\d+)", response.stdout)
-    completed_jobs_match = re.search(r"complete:\s*(\d+)\s*\(", response.stdout)
-    surviving_mutants_match = re.search(r"surviving mutants:\s*(\d+)\s*\(", response.stdout)
-
-    if total_jobs_match:
-        total_jobs_number = int(total_jobs_match.group(1))
-        statistic_info["total_jobs_number"] = total_jobs_number
-
-    if completed_jobs_match:
-        completed_jobs_number = int(completed_jobs_match.group(1))
-        statistic_info["completed_jobs_number"] = completed_jobs_number
-        
-    if surviving_mutants_match:
-        surviving_mutants_number = int(surviving_mutants_match.group(1))
-        statistic_info["surviving_mutants_number"] = surviving_mutants_number
-    
-    statistic_info['complete_rate'] = statistic_info['completed_jobs_number'] / statistic_info["total_jobs_number"] if statistic_info["total_jobs_number"] > 0 else 0
-    statistic_info['surviving_mutants_rate'] = (statistic_info['surviving_mutants_number'] / statistic_info['completed_jobs_number']) if statistic_info['completed_jobs_number'] > 0 else 0
-
-    return statistic_info
-
-
 def mutation_statistic(benchmark_name, model_name, num_test_cases, baseline_test_cases=5):
     correct_tasks = list()
     correct_tasks_path = f'data/{benchmark_name}/correct_tasks_tc_{baseline_test_cases}_{model_name}'
@@ -140,7 +106,7 @@ def mutation_statistic(benchmark_name, model_name, num_test_cases, baseline_test
     
     surviving_mutants_rate = 0.0
 
-    statistics = process_map(mutation_statistic_wrapper, [benchmark_name]*len(final_tasks), [model_name]*len(final_tasks), [num_test_cases]*len(final_tasks), final_tasks, desc=f"[+] 🔄 Running mutation ({num_test_cases} test cases) statistics...", chunksize=1, leave=False)
+    statistics = mutation_statistics(benchmark_name, model_name, num_test_cases, final_tasks, desc=f"[+] 🔄 Running mutation ({num_test_cases} test cases) statistics...", leave=False)
     for statistic in statistics:
         # print(f"[+] {statistic}")
         surviving_mutants_rate += statistic["surviving_mutants_rate"]
@@ -177,13 +143,20 @@ def main():
         row_data_dict = {"Model": model_name}
 
         # --- Pass@k LCov@k BCov@k ---
+        # 优先读取结果库 (data/{benchmark}/results.sqlite)，旧的运行结果回退到 JSON 文件
         input_file = f'data/{args.benchmark_name}/pytest_results/{model_name}.json'
-        if not os.path.exists(input_file):
+        data, totals = None, None
+        if results_store.has_results(args.benchmark_name, model_name):
+            input_file = results_store.store_path(args.benchmark_name)
+            # 普通任务直接在 SQL 中求和, 只有缺少某个 k 或带 coverage_error 的任务按原规则逐条处理
+            totals = results_store.regular_totals(args.benchmark_name, model_name, k_values)
+            data = results_store.load_entries(args.benchmark_name, model_name, k_values, irregular_only=True)
+        elif not os.path.exists(input_file):
             print(f"{model_name} does not exists")
             continue
 
         try:
-            result = analyze_test_at_k_results(input_file, model_name, k_values, global_results=None)
+            result = analyze_test_at_k_results(input_file, model_name, k_values, global_results=None, data=data, totals=totals)
             row_data_dict.update(result)
         except Exception as e:
             print(f"Error processing {input_file}: {str(e)}")
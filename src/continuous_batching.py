@@ -0,0 +1,125 @@
+# coding: utf-8
+
+# Description: Generation backends for the continuous scheduling mode of `generate_cov_hf.py`
+# (`--schedule continuous`). Each task's conversation asks for its next test as soon as its previous
+# reply is done, through an async `generate(prompt, sampling_params) -> (text, num_tokens)` call, so
+# the engine's queue stays full instead of draining at the end of every round / batch.
+#
+#   VLLMAsyncBackend  vLLM's AsyncLLMEngine
+#   StubEngine        GPU-free stand-in: a step loop that decodes one whitespace token per running
+#                     sequence every `step_time` seconds, `max_num_seqs` sequences at a time
+#                     (peak throughput = max_num_seqs / step_time tokens/s). Replies depend only on
+#                     the prompt, so both scheduling modes produce the same tests.
+#   StubLLM           the blocking `LLM.generate` interface over a StubEngine, for `--schedule round`
+#
+#   python generate_cov_hf.py --backend stub --model stub --schedule continuous
+
+import uuid
+import random
+import asyncio
+import hashlib
+from collections import deque
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+@dataclass
+class StubSamplingParams:
+    """The `vllm.SamplingParams` fields the stub backends read, for environments without vLLM."""
+    temperature: float = 1.0
+    max_tokens: int = 16
+    top_p: float = 1.0
+
+class WhitespaceTokenizer:
+    """Tokenizer for the stub backends: one token per whitespace-separated word. No chat template, so `format_chat_template` falls back to plain text."""
+    model_max_length = 16384
+
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return ' '.join(tokens)
+
+class VLLMAsyncBackend:
+
+    def __init__(self, **engine_args):
+        from vllm import AsyncEngineArgs, AsyncLLMEngine
+        self.engine = AsyncLLMEngine.from_engine_args(AsyncEngineArgs(**engine_args))
+
+    async def generate(self, prompt, sampling_params):
+        final = None
+        async for output in self.engine.generate(prompt, sampling_params, request_id=uuid.uuid4().hex):
+            final = output
+        completion = final.outputs[0]
+        return completion.text, len(completion.token_ids)
+
+class StubEngine:
+
+    def __init__(self, max_num_seqs=256, step_time=0.005, mean_tokens=300, seed=0):
+        self.max_num_seqs = max_num_seqs
+        self.step_time = step_time
+        self.mean_tokens = mean_tokens
+        self.seed = seed
+        self.steps = 0
+        self.generated = 0
+        self._loop = None
+
+    @property
+    def peak_throughput(self):
+        return self.max_num_seqs / self.step_time
+
+    def reply(self, prompt, max_tokens):
+        """Deterministic reply to `prompt`: a long-tailed number of tokens, some reasoning and a `</think>` marker before the test."""
+        rng = random.Random(hashlib.sha256(f'{self.seed}\0{prompt}'.encode('utf-8')).digest())
+        length = max(8, min(max_tokens, int(rng.lognormvariate(0, 0.8) * self.mean_tokens / 1.38)))
+        words = [f'w{rng.randrange(10000)}' for _ in range(length)]
+        split = length // 2
+        return words[:split] + ['</think>', 'def', f'test_{rng.randrange(10 ** 6)}():', 'assert'] + words[split + 4:]
+
+    def _start(self):
+        # 每个事件循环 (asyncio.run) 各自启动一个调度循环
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self.waiting = deque()
+            self.running = []
+            self.wakeup = asyncio.Event()
+            self.stepper = loop.create_task(self._step_loop())
+
+    async def generate(self, prompt, sampling_params):
+        self._start()
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.append([self.reply(prompt, sampling_params.max_tokens), 0, future])
+        self.wakeup.set()
+        return await future
+
+    async def _step_loop(self):
+        while True:
+            while self.waiting and len(self.running) < self.max_num_seqs:
+                self.running.append(self.waiting.popleft())
+            if not self.running:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            await asyncio.sleep(self.step_time)
+            self.steps += 1
+            self.generated += len(self.running)
+            unfinished = []
+            for sequence in self.running:
+                sequence[1] += 1
+                tokens, done, future = sequence
+                if done < len(tokens):
+                    unfinished.append(sequence)
+                elif not future.done():
+                    future.set_result((' '.join(tokens), len(tokens)))
+            self.running = unfinished
+
+class StubLLM:
+    """`vllm.LLM`-shaped wrapper: `generate(prompts, sampling_params)` blocks until every prompt is done."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def generate(self, prompts, sampling_params):
+        async def run():
+            return await asyncio.gather(*(self.engine.generate(prompt, sampling_params) for prompt in prompts))
+        return [SimpleNamespace(outputs=[SimpleNamespace(text=text)]) for text, _ in asyncio.run(run())]
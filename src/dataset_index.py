@@ -0,0 +1,177 @@
+# coding: utf-8
+
+# Description: Indexed, memory-mapped access to dataset and generation files. Files named `.jsonl`
+# are either a single JSON array (`datasets/ULT.jsonl`) or real JSON lines (`results/*_format.jsonl`);
+# both are handled. The first open scans the file for the byte range of every record and saves it to
+# a sidecar `{path}.idx` (reused while the file's size and mtime are unchanged). Records are then
+# decoded on demand: `len`, one record, a slice, streaming iteration or a `task_id` lookup cost
+# O(1) / O(slice) instead of parsing the whole file in every stage.
+#
+#   dataset = DatasetIndex('../datasets/ULT.jsonl')
+#   dataset[0], dataset[:100], dataset.get(task_id), for record in dataset: ...
+
+import os
+import re
+import json
+import mmap
+
+INDEX_VERSION = 1
+
+WHITESPACE = re.compile(rb'[ \t\r\n,]*')
+STRUCTURE = re.compile(rb'[{}\[\]"]')
+STRING_END = re.compile(rb'(?:[^"\\]|\\.)*"', re.DOTALL)
+SCALAR = re.compile(rb'[^,\]\s]*')
+
+def index_path(path):
+    return f'{path}.idx'
+
+def _scan_json_lines(mm):
+    offsets = []
+    start = 0
+    size = len(mm)
+    while start < size:
+        end = mm.find(b'\n', start)
+        if end == -1:
+            end = size
+        if mm[start:end].strip():
+            offsets.append((start, end))
+        start = end + 1
+    return offsets
+
+def _value_end(mm, start):
+    """End offset of the JSON value starting at `start` (object, array, string or scalar) without decoding it."""
+    first = mm[start:start + 1]
+    if first == b'"':
+        return STRING_END.match(mm, start + 1).end()
+    if first not in (b'{', b'['):
+        return SCALAR.match(mm, start).end()
+    depth = 0
+    pos = start
+    while True:
+        match = STRUCTURE.search(mm, pos)
+        if match is None:
+            raise ValueError(f'unterminated JSON value at byte {start}')
+        char = match.group()
+        if char == b'"':
+            pos = STRING_END.match(mm, match.end()).end()
+            continue
+        pos = match.end()
+        depth += 1 if char in (b'{', b'[') else -1
+        if depth == 0:
+            return pos
+
+def _scan_json_array(mm, start):
+    offsets = []
+    pos = WHITESPACE.match(mm, start + 1).end()
+    while pos < len(mm) and mm[pos:pos + 1] != b']':
+        end = _value_end(mm, pos)
+        offsets.append((pos, end))
+        pos = WHITESPACE.match(mm, end).end()
+    return offsets
+
+def _positions(keys):
+    positions = {}
+    for i, key in enumerate(keys):
+        if key is not None:
+            positions.setdefault(key, i)
+    return positions
+
+class DatasetIndex:
+    """Random access to the records of a JSON-array or JSON-lines file through a memory map and an offset index."""
+
+    def __init__(self, path, key='task_id'):
+        self.path = os.fspath(path)
+        self.key = key
+        self._file = open(self.path, 'rb')
+        stat = os.fstat(self._file.fileno())
+        self._signature = [stat.st_size, stat.st_mtime_ns]
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b''
+        self._keys = None
+        if not self._load_index():
+            self._build_index()
+
+    def _load_index(self):
+        try:
+            with open(index_path(self.path), 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if index.get('version') != INDEX_VERSION or index.get('signature') != self._signature:
+            return False
+        self.layout = index['layout']
+        self.offsets = [tuple(offset) for offset in index['offsets']]
+        if index.get('key') == self.key and index.get('keys') is not None:
+            self._keys = _positions(index['keys'])
+        return True
+
+    def _build_index(self):
+        start = WHITESPACE.match(self._mm, 0).end() if len(self._mm) else 0
+        if self._mm[start:start + 1] == b'[':
+            self.layout = 'json'
+            self.offsets = _scan_json_array(self._mm, start)
+        else:
+            self.layout = 'jsonl'
+            self.offsets = _scan_json_lines(self._mm)
+        self._save_index()
+
+    def _save_index(self, keys=None):
+        index = {'version': INDEX_VERSION, 'signature': self._signature, 'layout': self.layout, 'offsets': self.offsets}
+        if keys is not None:
+            index.update(key=self.key, keys=keys)
+        temp_path = f'{index_path(self.path)}.{os.getpid()}.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(index, f)
+            os.replace(temp_path, index_path(self.path))
+        except OSError:
+            # 目录不可写时只在内存中使用索引
+            pass
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def raw(self, i):
+        start, end = self.offsets[i]
+        return self._mm[start:end]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [json.loads(self.raw(j)) for j in range(*i.indices(len(self)))]
+        return json.loads(self.raw(i))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def keys(self):
+        """Distinct `key` values in file order. The first call decodes every record once and saves the keys in the index."""
+        if self._keys is None:
+            keys = []
+            for record in self:
+                value = record.get(self.key) if isinstance(record, dict) else None
+                keys.append(value if isinstance(value, (str, int)) else None)
+            self._keys = _positions(keys)
+            self._save_index(keys)
+        return list(self._keys)
+
+    def position(self, key):
+        self.keys()
+        return self._keys[key]
+
+    def get(self, key, default=None):
+        """The first record whose `key` field equals `key` (generation files hold several records per task)."""
+        self.keys()
+        if key not in self._keys:
+            return default
+        return self[self._keys[key]]
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
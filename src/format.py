@@ -5,6 +5,11 @@ from pathlib import Path
 from argparse import ArgumentParser
 import json
 import re
+from itertools import islice
+from functools import partial
+from multiprocessing import Pool
+
+import normalize_cache
 
 def extract_and_wrap_test(code, func_name):
     """
@@ -13,6 +18,18 @@ def extract_and_wrap_test(code, func_name):
     - 如果在函数定义(FunctionDef)内找到：保留之前的上下文 + 函数内截取到的代码。
     - 最后统一包裹在 def test_{func_name} 中。
     """
+    tree = extract_and_wrap_test_tree(code, func_name)
+    if tree is not None:
+        try:
+            return ast.unparse(tree)
+        except Exception as e:
+            pass
+    # 如果遍历完都没找到，返回基础错误测试函数
+    return "def test_wrong():\n    assert 1 == 0"
+
+
+def extract_and_wrap_test_tree(code, func_name):
+    """`extract_and_wrap_test` as an `ast.Module`, without unparsing; None if no test was found."""
     try:
         code = textwrap.dedent(code)
         tree = ast.parse(code)
@@ -28,7 +45,7 @@ def extract_and_wrap_test(code, func_name):
                 decorator_list=[]
             )
             new_func = ast.fix_missing_locations(new_func)
-            return ast.unparse(new_func)
+            return ast.Module(body=[new_func], type_ignores=[])
 
         for node in tree.body:
             if isinstance(node, ast.FunctionDef):
@@ -41,7 +58,7 @@ def extract_and_wrap_test(code, func_name):
                 if assert_index != -1:
                     node.body = node.body[:assert_index+1]
                     final_body = context_nodes + [node]
-                    return ast.unparse(final_body)
+                    return ast.Module(body=final_body, type_ignores=[])
                         
             elif isinstance(node, ast.Assert):
                 context_nodes.append(node)
@@ -52,11 +69,15 @@ def extract_and_wrap_test(code, func_name):
     except Exception as e:
         pass
         # print(f"AST Error: {e}\n{code}")
-        
-    # 如果遍历完都没找到，返回基础错误测试函数
-    return "def test_wrong():\n    assert 1 == 0"
+    return None
 
 # from data_utils import read_jsonl, write_jsonl
+def iter_jsonl(path):
+    with open(path,'r') as f:
+        for line in f:
+            yield json.loads(line)
+
+
 def read_jsonl(path):
     data=[]
     with open(path,'r') as f:
@@ -92,9 +113,18 @@ def change_function_name(code, new_name):
 def reformat_case_byrules(testcase, func_name, lang='python', idx=0):
     if testcase.startswith(' '): #remove extra indents (encountered in codellama, mistral-7b starts with one space...)
         testcase=textwrap.dedent(testcase)
-    testcase=extract_and_wrap_test(testcase, func_name)
-    testcase=change_function_name(testcase, f'{func_name}_{idx}')
-    return testcase
+    # extract_and_wrap_test + change_function_name on one tree: a single parse / unparse per test
+    tree=extract_and_wrap_test_tree(testcase, func_name)
+    if tree is not None:
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef):
+                node.name = f'{func_name}_{idx}'
+                break
+        try:
+            return ast.unparse(tree)
+        except Exception as e: #cannot unparse
+            pass
+    return f"def {func_name}_{idx}():\n    assert 1 == 0"
 
 
 def remove_extra(testcase, func_name, lang='python'):
@@ -125,105 +155,156 @@ def remove_extra(testcase, func_name, lang='python'):
         return '\n'.join(matches)
 
 
-def reformat_line(datapath,newpath):
-    data=read_jsonl(datapath)
-    formatted_data=[]
-    for e in data:
-        code=e['code']
-        func_name=e['func_name']
-        test_funcname=f'test_{func_name}'
-        #print(code)
-        tests=e['tests']
-        #formated_tests=[]
-        for lineno in tests:
-            testcase=tests[lineno]
+# 规范化缓存: 每个进程用自己的连接只读查询, 新结果随记录一起返回, 由主进程按窗口写入
+_norm_cache={'conn': None, 'new': []}
+
+
+def open_norm_cache(cache_path):
+    _norm_cache['conn']=normalize_cache.connect(cache_path) if cache_path else None
+    _norm_cache['new']=[]
+
+
+def normalize_test(testcase, func_name, idx=0):
+    """remove_extra + reformat_case_byrules of one raw test, answered from the normalization cache when possible."""
+    conn=_norm_cache['conn']
+    if conn is None:
+        return reformat_case_byrules(remove_extra(testcase, func_name), f'test_{func_name}', 'python', idx)
+    key=normalize_cache.cache_key(testcase, func_name, idx)
+    normalized=normalize_cache.lookup(conn, key)
+    if normalized is None:
+        normalized=reformat_case_byrules(remove_extra(testcase, func_name), f'test_{func_name}', 'python', idx)
+        _norm_cache['new'].append((key, normalized))
+    return normalized
+
+
+def call_with_norm_cache(func, e):
+    _norm_cache['new']=[]
+    return func(e), _norm_cache['new']
+
+
+def map_records(func, records, workers=None, window=256, cache_path=None):
+    """
+    func over records in input order; with workers > 1 in a process pool, `window` records per worker at a time.
+    With `cache_path`, normalize_test calls in func go through the normalization cache.
+    """
+    records=iter(records)
+    workers=workers or os.cpu_count() or 1
+    func=partial(call_with_norm_cache, func)
+    writer=normalize_cache.connect(cache_path) if cache_path else None
+    if workers==1:
+        open_norm_cache(cache_path)
+        pool=None
+    else:
+        pool=Pool(workers, initializer=open_norm_cache, initargs=(cache_path,))
+    try:
+        # 分窗口提交: Pool.imap 会一次性读完输入迭代器, 分窗口才能让内存保持有界
+        while True:
+            batch=list(islice(records, workers*window))
+            if not batch:
+                break
+            new_entries=[]
+            results=pool.imap(func, batch, chunksize=max(1, len(batch)//(workers*4))) if pool else map(func, batch)
+            for e, new in results:
+                new_entries.extend(new)
+                yield e
+            if writer is not None:
+                normalize_cache.store(writer, new_entries)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if writer is not None:
+            writer.close()
+        if workers==1:
+            open_norm_cache(None)
+
+
+def reformat_line_record(e, quiet=False):
+    func_name=e['func_name']
+    tests=e['tests']
+    for lineno in tests:
+        testcase=tests[lineno]
+        if not quiet:
             print(testcase)
-            testcase=remove_extra(testcase, func_name)
-            reformatted_testcase=reformat_case_byrules(testcase, test_funcname, 'python')
-            #print('------')
+        reformatted_testcase=normalize_test(testcase, func_name)
+        if not quiet:
             print(reformatted_testcase)
             print('<---------------------->')
-            tests[lineno]=reformatted_testcase
-        e['tests']=tests
-
-        formatted_data.append(e)
-    write_jsonl(formatted_data, newpath)
-
-
-def reformat_branch(datapath,newpath):
-    data=read_jsonl(datapath)
-    formatted_data=[]
-    for e in data:
-        code=e['code']
-        func_name=e['func_name']
-        test_funcname=f'test_{func_name}'
-        #print(code)
-        tests=e['tests']
-        formated_tests=[]
-        for branch in tests:
-            testcase=branch['test']
+        tests[lineno]=reformatted_testcase
+    e['tests']=tests
+    return e
+
+
+def reformat_branch_record(e, quiet=False):
+    func_name=e['func_name']
+    tests=e['tests']
+    formated_tests=[]
+    for branch in tests:
+        testcase=branch['test']
+        if not quiet:
             print(testcase)
-            testcase=remove_extra(testcase, func_name)
-            reformatted_testcase=reformat_case_byrules(testcase, test_funcname, 'python')
-            #print('------')
+        reformatted_testcase=normalize_test(testcase, func_name)
+        if not quiet:
             print(reformatted_testcase)
             print('<---------------------->')
-            branch['test']=reformatted_testcase
-            formated_tests.append(branch)
-        e['tests']=formated_tests
-
-        formatted_data.append(e)
-    write_jsonl(formatted_data, newpath)
-
-
-def reformat_cov(datapath,newpath,gt):
-    data=read_jsonl(datapath)
-    formatted_data=[]
-    gt_data=[]
-    codes=[]
-    testcases_list=[]
-    for e in data:
-        #print(code)
-        func_name=e['func_name']
-        test_funcname=f'test_{func_name}'
-        formatted_test_cases=[]
-        testcases=e['tests']
-        codes.append(e['code'])
-        for idx, testcase in enumerate(testcases):
-            # print(testcase)
-            extracted_testcase=remove_extra(testcase, func_name)
-            #if extracted_testcase!=testcase:
-                #print(testcase)
-                #print('----')
-                #print(extracted_testcase)
-            reformatted_testcase=reformat_case_byrules(extracted_testcase, test_funcname, 'python', idx)
-            # print('------')
-            # print(reformatted_testcase)
-            # print('<---------------------->')
-            formatted_test_cases.append(reformatted_testcase)
-        testcases_list.append([testcase for testcase in formatted_test_cases if 'assert 1 == 0' not in testcase])
-        e['tests']=formatted_test_cases
-
-        formatted_data.append(e)
-    
-    if gt:
-        from tools import extract_all_test_cases, validate_and_fill_generated_testcases
-        assert_testcases=[]
-        for testcases in testcases_list:
-            assert_testcases.append(json.dumps({'assert_statements': extract_all_test_cases('\n'.join(testcases))}))
+        branch['test']=reformatted_testcase
+        formated_tests.append(branch)
+    e['tests']=formated_tests
+    return e
+
+
+def reformat_cov_record(e):
+    """(formatted record, its non-placeholder tests for --gt)"""
+    func_name=e['func_name']
+    formatted_test_cases=[]
+    for idx, testcase in enumerate(e['tests']):
+        reformatted_testcase=normalize_test(testcase, func_name, idx)
+        formatted_test_cases.append(reformatted_testcase)
+    e['tests']=formatted_test_cases
+    return e, [testcase for testcase in formatted_test_cases if 'assert 1 == 0' not in testcase]
+
+
+def reformat_line(datapath,newpath,workers=None,quiet=False,cache_path=None):
+    with open(newpath,'w') as f:
+        for e in map_records(partial(reformat_line_record, quiet=quiet), iter_jsonl(datapath), workers, cache_path=cache_path):
+            f.write(json.dumps(e)+'\n')
+
+
+def reformat_branch(datapath,newpath,workers=None,quiet=False,cache_path=None):
+    with open(newpath,'w') as f:
+        for e in map_records(partial(reformat_branch_record, quiet=quiet), iter_jsonl(datapath), workers, cache_path=cache_path):
+            f.write(json.dumps(e)+'\n')
+
+
+def reformat_cov(datapath,newpath,gt,sandbox='remote',batch_size=1,gt_cache_path=None,workers=None,cache_path=None):
+    formatted=map_records(reformat_cov_record, iter_jsonl(datapath), workers, cache_path=cache_path)
+    with open(newpath,'w') as f:
+        if not gt:
+            for e, _ in formatted:
+                f.write(json.dumps(e)+'\n')
+            return
+
+        from tools import extract_all_test_cases, validate_and_fill_generated_testcases, VALIDATION_CHUNK_SIZE
+        import gt_cache
+        cache = gt_cache.connect(gt_cache_path) if gt_cache_path else None
         print('correcting test cases by ground truth...')
-        gt_testcases_list,_,_=validate_and_fill_generated_testcases(assert_testcases, codes)
-        for e, gt_testcases in zip(data, gt_testcases_list):
-            tests=[]
-            for i in range(0, len(gt_testcases)):
-                tests.append(f"def test_{e['func_name']}_{i}():\n    {gt_testcases[i]}")
-            for i in range(len(gt_testcases), len(e['tests'])):
-                tests.append(f"def test_{e['func_name']}_{i}():\n    assert 1 == 0")
-            e['tests']=tests
-            gt_data.append(e)
-        write_jsonl(gt_data, newpath)
-    else:
-        write_jsonl(formatted_data, newpath)
+        # 逐块验证并写出, 不把整个文件读入内存
+        while True:
+            chunk=list(islice(formatted, VALIDATION_CHUNK_SIZE))
+            if not chunk:
+                break
+            assert_testcases=[]
+            for e, testcases in chunk:
+                assert_testcases.append(json.dumps({'assert_statements': extract_all_test_cases('\n'.join(testcases))}))
+            codes=[e['code'] for e, _ in chunk]
+            gt_testcases_list,_,_=validate_and_fill_generated_testcases(assert_testcases, codes, sandbox=sandbox, batch_size=batch_size, cache=cache)
+            for (e, _), gt_testcases in zip(chunk, gt_testcases_list):
+                tests=[]
+                for i in range(0, len(gt_testcases)):
+                    tests.append(f"def test_{e['func_name']}_{i}():\n    {gt_testcases[i]}")
+                for i in range(len(gt_testcases), len(e['tests'])):
+                    tests.append(f"def test_{e['func_name']}_{i}():\n    assert 1 == 0")
+                e['tests']=tests
+                f.write(json.dumps(e)+'\n')
 
 
 def parse_args():
@@ -231,6 +312,12 @@ def parse_args():
     parser.add_argument("--path", type=str, default='')
     parser.add_argument("--mode", type=str, default='overall', choices=['line', 'branch', 'overall'])
     parser.add_argument("--gt", type=bool, default=False)
+    parser.add_argument("--sandbox", type=str, default='remote', choices=['remote', 'local'], help='where --gt runs the ground-truth code: the sandbox_fusion service or local subprocesses on all cores')
+    parser.add_argument("--gt_cache", type=str, default='results/gt_cache.sqlite', help="--gt: on-disk cache of GT call results ('' to disable; clear with `python gt_cache.py clear`)")
+    parser.add_argument("--workers", type=int, default=None, help='processes used to normalize tests (default: all cores)')
+    parser.add_argument("--norm_cache", type=str, default='results/normalize_cache.sqlite', help="on-disk cache of normalized tests ('' to disable; clear with `python normalize_cache.py clear`)")
+    parser.add_argument("--quiet", action='store_true', help='do not print every test case')
+    parser.add_argument("--batch_size", type=int, default=1, help='--gt: number of tasks validated in one interpreter / execution request')
     return parser.parse_args()
 
 
@@ -252,10 +339,10 @@ if __name__=='__main__':
         print(newpath)
         if args.mode=='line':
             print('reformat line coverage')
-            reformat_line(output_dir / args.path, output_dir / newpath)
+            reformat_line(output_dir / args.path, output_dir / newpath, args.workers, args.quiet, args.norm_cache)
         elif args.mode=='overall':
             print('reformat overall coverage')
-            reformat_cov(output_dir / args.path, output_dir / newpath, args.gt)
+            reformat_cov(output_dir / args.path, output_dir / newpath, args.gt, args.sandbox, args.batch_size, args.gt_cache, args.workers, args.norm_cache)
         elif args.mode=='branch':
             print('reformat branch coverage')
-            reformat_branch(output_dir / args.path, output_dir / newpath)
+            reformat_branch(output_dir / args.path, output_dir / newpath, args.workers, args.quiet, args.norm_cache)
@@ -1,14 +1,24 @@
 import os
 import re
 import json
+import time
+import asyncio
 from pathlib import Path
 from argparse import ArgumentParser
 from tqdm import tqdm
-import torch
+
+from dataset_index import DatasetIndex
+from continuous_batching import VLLMAsyncBackend, StubEngine, StubLLM, StubSamplingParams, WhitespaceTokenizer
 
 # 导入vLLM相关库
-from vllm import LLM, SamplingParams
-from transformers import AutoTokenizer
+try:
+    import torch
+    from vllm import LLM, SamplingParams
+    from transformers import AutoTokenizer
+except ImportError:
+    # 没有 GPU 环境时只能使用 --backend stub
+    torch = LLM = AutoTokenizer = None
+    SamplingParams = StubSamplingParams
 
 # from data_utils import read_jsonl, write_jsonl, add_lineno
 def write_jsonl(data, file_path):
@@ -36,6 +46,10 @@ def parse_args():
     parser.add_argument("--batch_size", type=int, default=256, help='batch size for inference')
     parser.add_argument("--tensor_parallel_size", type=int, default=1, help='number of GPUs for tensor parallelism')
     parser.add_argument("--max_context_length", type=int, default=16384, help='maximum context length for truncation')
+    parser.add_argument("--schedule", type=str, default='round', choices=['round', 'continuous'],
+                        help='round: every round over the whole dataset in batch_size chunks; continuous: each task moves to its next round as soon as its reply is done')
+    parser.add_argument("--max_in_flight", type=int, default=1024, help='[continuous] conversations generating at the same time')
+    parser.add_argument("--backend", type=str, default='vllm', choices=['vllm', 'stub'], help='stub: GPU-free simulated engine with batch_size sequence slots')
     return parser.parse_args()
 
 def truncate_conversation(messages, tokenizer, max_length):
@@ -108,6 +122,48 @@ def prepare_prompts_for_batch(data_batch, prompt_template, system_message, token
             
     return prompts
 
+template_append = "Generate another test method for the function under test. Your answer must be different from previously-generated test cases, and should cover different statements and branches."
+
+def followup_prompt(result, prompt_template, system_message, tokenizer, max_context_length):
+    """Prompt for the next test of `result`: the task prompt, every previous test and a request for a different one"""
+    # Create conversation history with all previous tests
+    messages = [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": prompt_template.format(
+            lang='python', 
+            program=result['code'], 
+            description=result['prompt'], 
+            func_name=result['func_name'],
+        )}
+    ]
+    
+    # Add conversation history with previous tests
+    for prev_test in result['tests']:
+        messages.append({"role": "assistant", "content": prev_test})
+        messages.append({"role": "user", "content": template_append})
+    
+    # 检查并截断对话历史，如果太长
+    if len(tokenizer.encode(" ".join([m["content"] for m in messages]))) > max_context_length:
+        messages = truncate_conversation(messages, tokenizer, max_context_length)
+    
+    # Format as prompt
+    return format_chat_template(tokenizer, messages)
+
+def truncate_prompt(prompt_text, tokenizer, max_tokens=4096):
+    # 使用tokenizer计算token数量
+    tokens = tokenizer.encode(prompt_text)
+    
+    # 如果超过最大长度，截取最后max_tokens个token
+    if len(tokens) > max_tokens:
+        print(f"Truncating prompt from {len(tokens)} to {max_tokens} tokens")
+        return tokenizer.decode(tokens[-max_tokens:])
+    return prompt_text
+
+def extract_test(generated_test):
+    if "</think>" in generated_test:
+        generated_test = generated_test.split("</think>")[1]
+    return generated_test
+
 
 def testgeneration_vllm_batch(prepared_prompts, llm, sampling_params, tokenizer, max_tokens=4096):
     """Generate test cases in batch using vLLM with prompt truncation"""
@@ -118,18 +174,7 @@ def testgeneration_vllm_batch(prepared_prompts, llm, sampling_params, tokenizer,
     truncated_prompts = []
     for prompt_data in prepared_prompts:
         prompt_text, func_name, code, desc, task_id = prompt_data
-        
-        # 使用tokenizer计算token数量
-        tokens = tokenizer.encode(prompt_text)
-        
-        # 如果超过最大长度，截取最后max_tokens个token
-        if len(tokens) > max_tokens:
-            print(f"Truncating prompt from {len(tokens)} to {max_tokens} tokens")
-            truncated_tokens = tokens[-max_tokens:]
-            truncated_text = tokenizer.decode(truncated_tokens)
-            truncated_prompts.append((truncated_text, func_name, code, desc, task_id))
-        else:
-            truncated_prompts.append(prompt_data)
+        truncated_prompts.append((truncate_prompt(prompt_text, tokenizer, max_tokens), func_name, code, desc, task_id))
     
     # Extract just the prompt texts
     prompt_texts = [p[0] for p in truncated_prompts]
@@ -141,9 +186,7 @@ def testgeneration_vllm_batch(prepared_prompts, llm, sampling_params, tokenizer,
     results = []
     for i, output in enumerate(outputs):
         _, func_name, code, desc, task_id = truncated_prompts[i]
-        generated_test = output.outputs[0].text
-        if "</think>" in generated_test:
-            generated_test = generated_test.split("</think>")[1]
+        generated_test = extract_test(output.outputs[0].text)
         results.append({
             'func_name': func_name,
             'code': code,
@@ -183,9 +226,6 @@ def testgeneration_multiround_vllm(args, dataset, prompt_template, system_messag
                 'task_id':result['task_id']
             })
     
-    # For additional test rounds
-    template_append = "Generate another test method for the function under test. Your answer must be different from previously-generated test cases, and should cover different statements and branches."
-    
     # Generate remaining tests (num_tests - 1)
     for test_round in range(1, args.num_tests):
         print(f"Starting test generation round {test_round+1}/{args.num_tests}")
@@ -197,28 +237,7 @@ def testgeneration_multiround_vllm(args, dataset, prompt_template, system_messag
             
             prepared_prompts = []
             for result in current_batch:
-                # Create conversation history with all previous tests
-                messages = [
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": prompt_template.format(
-                        lang='python', 
-                        program=result['code'], 
-                        description=result['prompt'], 
-                        func_name=result['func_name'],
-                    )}
-                ]
-                
-                # Add conversation history with previous tests
-                for prev_test in result['tests']:
-                    messages.append({"role": "assistant", "content": prev_test})
-                    messages.append({"role": "user", "content": template_append})
-                
-                # 检查并截断对话历史，如果太长
-                if len(tokenizer.encode(" ".join([m["content"] for m in messages]))) > args.max_context_length:
-                    messages = truncate_conversation(messages, tokenizer, args.max_context_length)
-                
-                # Format as prompt
-                formatted_prompt = format_chat_template(tokenizer, messages)
+                formatted_prompt = followup_prompt(result, prompt_template, system_message, tokenizer, args.max_context_length)
                 prepared_prompts.append((
                     formatted_prompt, 
                     result['func_name'], 
@@ -239,13 +258,61 @@ def testgeneration_multiround_vllm(args, dataset, prompt_template, system_messag
                 
     return all_results
 
+def testgeneration_multiround_continuous(args, dataset, prompt_template, system_message, tokenizer, backend):
+    """
+    Same conversations and output as `testgeneration_multiround_vllm`, without the per-round / per-batch barriers: every task
+    asks for its next test as soon as its previous reply is done, and up to `max_in_flight` tasks run at once, so the
+    engine always has queued requests and generation time approaches total tokens / peak throughput.
+    """
+    sampling_params = SamplingParams(
+        temperature=args.temperature,
+        max_tokens=args.max_tokens,
+        top_p=0.95,
+    )
+    progress = tqdm(total=len(dataset) * args.num_tests, desc="Generating tests")
+    totals = {'tokens': 0}
+
+    async def generate_test(prompt_text):
+        text, num_tokens = await backend.generate(truncate_prompt(prompt_text, tokenizer), sampling_params)
+        totals['tokens'] += num_tokens
+        progress.update(1)
+        return extract_test(text)
+
+    async def conversation(data, slots):
+        async with slots:
+            prepared_prompts = prepare_prompts_for_batch([data], prompt_template, system_message, tokenizer)
+            if not prepared_prompts:
+                progress.update(args.num_tests)
+                return None
+            formatted_prompt, func_name, code, desc, task_id = prepared_prompts[0]
+            result = {
+                'func_name': func_name,
+                'code': code,
+                'tests': [await generate_test(formatted_prompt)],
+                'prompt': desc,
+                'task_id': task_id
+            }
+            for test_round in range(1, args.num_tests):
+                result['tests'].append(await generate_test(followup_prompt(result, prompt_template, system_message, tokenizer, args.max_context_length)))
+            return result
+
+    async def run():
+        slots = asyncio.Semaphore(args.max_in_flight)
+        return await asyncio.gather(*(conversation(data, slots) for data in dataset))
+
+    start_time = time.time()
+    all_results = [result for result in asyncio.run(run()) if result is not None]
+    progress.close()
+    elapsed = time.time() - start_time
+    print(f"Generated {totals['tokens']} tokens in {elapsed:.1f}s ({totals['tokens'] / max(elapsed, 1e-9):.0f} tokens/s)")
+    return all_results
+
 if __name__=='__main__':
     args = parse_args()
     output_dir = Path('results')
     output_dir.mkdir(exist_ok=True)
     
-    with open("../datasets/ULT.jsonl","r") as f:
-        dataset = json.load(f)
+    dataset = DatasetIndex("../datasets/ULT.jsonl")
 
     with open('../models.txt', 'r', encoding='utf-8') as f:
         model_list = f.read().splitlines()
@@ -267,10 +334,13 @@ if __name__=='__main__':
             continue
         try:
             # 加载 tokenizer 用于格式化提示词
-            tokenizer = AutoTokenizer.from_pretrained(
-                args.model, 
-                trust_remote_code=True
-            )
+            if args.backend == 'stub':
+                tokenizer = WhitespaceTokenizer()
+            else:
+                tokenizer = AutoTokenizer.from_pretrained(
+                    args.model, 
+                    trust_remote_code=True
+                )
             
             # # 获取模型上下文窗口长度
             model_context_length = 16384  # 默认设置较大值
@@ -282,7 +352,7 @@ if __name__=='__main__':
             # model_context_length = 4096        
 
             # 初始化 vLLM 实例
-            llm = LLM(
+            engine_args = dict(
                 model=args.model,
                 tensor_parallel_size=args.tensor_parallel_size,  # 设置张量并行大小
                 trust_remote_code=True,
@@ -295,10 +365,18 @@ if __name__=='__main__':
             data_size = len(dataset)
             print('Number of samples:', data_size)
             
-            # 使用 vLLM 进行批量测试生成
-            testing_results = testgeneration_multiround_vllm(
-                args, dataset, prompt_template, system_message, tokenizer, llm
-            )
+            if args.schedule == 'continuous':
+                # 异步引擎: 每个任务的回复一结束就提交下一轮
+                llm = StubEngine(max_num_seqs=args.batch_size) if args.backend == 'stub' else VLLMAsyncBackend(**engine_args)
+                testing_results = testgeneration_multiround_continuous(
+                    args, dataset, prompt_template, system_message, tokenizer, llm
+                )
+            else:
+                # 使用 vLLM 进行批量测试生成
+                llm = StubLLM(StubEngine(max_num_seqs=args.batch_size)) if args.backend == 'stub' else LLM(**engine_args)
+                testing_results = testgeneration_multiround_vllm(
+                    args, dataset, prompt_template, system_message, tokenizer, llm
+                )
             
             # 保存结果
             write_jsonl(testing_results, output_dir / f'{model_abbrv}.jsonl')
@@ -312,7 +390,7 @@ if __name__=='__main__':
             del llm
         if 'tokenizer' in locals():
             del tokenizer
-        if torch.cuda.is_available():
+        if torch is not None and torch.cuda.is_available():
             torch.cuda.empty_cache()
             torch.cuda.synchronize()
         
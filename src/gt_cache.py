@@ -0,0 +1,136 @@
+# coding: utf-8
+
+# Description: Persistent memo of ground-truth call results for `validate_and_fill_generated_testcases`.
+# A call is keyed by a hash of the GT code plus the normalized call expression and stores the result
+# repr (or the error it raised); the equality verdict against each expected answer is stored next to
+# it. Validation only executes the cases that are not in the cache yet. The store is capped to the
+# most recently used MAX_ENTRIES calls.
+#
+#   python gt_cache.py stats [--path results/gt_cache.sqlite]
+#   python gt_cache.py clear [--path results/gt_cache.sqlite]
+
+import os
+import ast
+import time
+import hashlib
+import sqlite3
+from contextlib import closing
+from argparse import ArgumentParser
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'gt_cache.sqlite')
+MAX_ENTRIES = 1_000_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS call_results (
+    key TEXT PRIMARY KEY,
+    res TEXT,
+    err TEXT,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS call_results_last_used ON call_results (last_used);
+CREATE TABLE IF NOT EXISTS verdicts (
+    key TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    val TEXT,
+    err TEXT,
+    PRIMARY KEY (key, answer)
+) WITHOUT ROWID;
+"""
+
+def connect(path=DEFAULT_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=60)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+def normalize(expression):
+    """Canonical source of a call / answer expression, so formatting differences share a cache entry."""
+    try:
+        return ast.unparse(ast.parse(expression, mode='eval'))
+    except SyntaxError:
+        return expression.strip()
+
+def call_key(gt_code, call):
+    return hashlib.sha256(f'{gt_code}\0{normalize(call)}'.encode('utf-8')).hexdigest()
+
+def lookup(conn, gt_code, calls, answers):
+    """`{case index: record}` (records as the validation harness emits them) for the cases the cache can answer."""
+    cached = {}
+    hit_keys = []
+    for idx, (call, answer) in enumerate(zip(calls, answers)):
+        key = call_key(gt_code, call)
+        row = conn.execute('SELECT res, err FROM call_results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            continue
+        res, err = row
+        if res is None:
+            cached[idx] = {'case': idx, 'err': err}
+        else:
+            verdict = conn.execute('SELECT val, err FROM verdicts WHERE key = ? AND answer = ?', (key, normalize(answer))).fetchone()
+            if verdict is None:
+                continue
+            record = {'case': idx, 'res': res}
+            if verdict[0] is not None:
+                record['val'] = verdict[0]
+            if verdict[1] is not None:
+                record['err'] = verdict[1]
+            cached[idx] = record
+        hit_keys.append(key)
+    if hit_keys:
+        now = time.time()
+        with conn:
+            conn.executemany('UPDATE call_results SET last_used = ? WHERE key = ?', [(now, key) for key in hit_keys])
+    return cached
+
+def store(conn, gt_code, calls, answers, records):
+    """Remember the executed cases' records. Cases stopped by their time / memory / stack budget (`aborted`) are not cached."""
+    now = time.time()
+    with conn:
+        for idx, record in records.items():
+            if record.get('aborted'):
+                continue
+            key = call_key(gt_code, calls[idx])
+            if 'res' in record:
+                conn.execute('INSERT OR REPLACE INTO call_results VALUES (?, ?, NULL, ?)', (key, record['res'], now))
+                conn.execute('INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?)', (key, normalize(answers[idx]), record.get('val'), record.get('err')))
+            elif 'err' in record:
+                conn.execute('INSERT OR REPLACE INTO call_results VALUES (?, NULL, ?, ?)', (key, record['err'], now))
+
+def evict(conn, max_entries=MAX_ENTRIES):
+    """Drop the least recently used calls (and their verdicts) beyond `max_entries`."""
+    count = conn.execute('SELECT COUNT(*) FROM call_results').fetchone()[0]
+    if count <= max_entries:
+        return 0
+    with conn:
+        conn.execute('DELETE FROM call_results WHERE key IN (SELECT key FROM call_results ORDER BY last_used LIMIT ?)', (count - max_entries,))
+        conn.execute('DELETE FROM verdicts WHERE key NOT IN (SELECT key FROM call_results)')
+    return count - max_entries
+
+def clear(path=DEFAULT_PATH):
+    if not os.path.exists(path):
+        return
+    with closing(connect(path)) as conn:
+        with conn:
+            conn.execute('DELETE FROM call_results')
+            conn.execute('DELETE FROM verdicts')
+        conn.execute('VACUUM')
+
+def stats(path=DEFAULT_PATH):
+    with closing(connect(path)) as conn:
+        calls = conn.execute('SELECT COUNT(*) FROM call_results').fetchone()[0]
+        verdicts = conn.execute('SELECT COUNT(*) FROM verdicts').fetchone()[0]
+    return calls, verdicts
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument("command", choices=['stats', 'clear'])
+    parser.add_argument("--path", type=str, default=DEFAULT_PATH)
+    args = parser.parse_args()
+    if args.command == 'clear':
+        clear(args.path)
+        print(f"[+] 🧹 Cleared the GT call cache at {args.path}")
+    else:
+        calls, verdicts = stats(args.path)
+        print(f"[+] 🗃️ {args.path}: {calls} cached calls, {verdicts} verdicts")
@@ -0,0 +1,126 @@
+# coding: utf-8
+
+# Description: Local execution backend for `tools.execute_code`. Runs every program in a fresh,
+# resource-limited Python subprocess (address space, CPU time, output size, no stdin) inside its
+# own temporary directory, `os.cpu_count()` at a time, and returns `RunCodeResponse` objects shaped
+# like the ones the sandbox_fusion service returns - no network, no service to keep alive.
+
+import os
+import sys
+import time
+import shutil
+import signal
+import tempfile
+import subprocess
+from enum import Enum
+from typing import Dict, List, Optional
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from sandbox_fusion import RunStatus, CommandRunStatus, RunCodeResponse
+    from sandbox_fusion.models import CommandRunResult
+except ImportError:
+    # 未安装 sandbox_fusion (离线环境): 使用字段和取值都相同的最小替代, 调用方代码无需区分
+    class RunStatus(str, Enum):
+        Success = 'Success'
+        Failed = 'Failed'
+        SandboxError = 'SandboxError'
+
+    class CommandRunStatus(str, Enum):
+        Finished = 'Finished'
+        Error = 'Error'
+        TimeLimitExceeded = 'TimeLimitExceeded'
+
+    @dataclass
+    class CommandRunResult:
+        status: CommandRunStatus
+        execution_time: Optional[float] = None
+        cpu_time: Optional[float] = None
+        return_code: Optional[int] = None
+        stdout: Optional[str] = None
+        stderr: Optional[str] = None
+
+    @dataclass
+    class RunCodeResponse:
+        status: RunStatus
+        message: str
+        compile_result: Optional[CommandRunResult] = None
+        run_result: Optional[CommandRunResult] = None
+        executor_pod_name: Optional[str] = None
+        files: Dict[str, str] = field(default_factory=dict)
+
+MEMORY_LIMIT_MB = 2048
+OUTPUT_LIMIT_MB = 16
+
+# 子进程内先设置资源限制, 再以 __main__ 身份运行程序 (避免在多线程中使用 preexec_fn)
+BOOTSTRAP = '''
+import sys, runpy, resource
+memory, cpu, output = (int(v) for v in sys.argv[1:4])
+resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+resource.setrlimit(resource.RLIMIT_FSIZE, (output, output))
+resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+path = sys.argv[4]
+sys.argv = [path]
+runpy.run_path(path, run_name='__main__')
+'''
+
+def _child_env():
+    env = dict(os.environ)
+    # 并发运行 cpu_count 个程序: 每个程序只用一个 BLAS/OpenMP 线程, 也避免线程栈撑爆 RLIMIT_AS
+    for name in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        env[name] = '1'
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    env['PYTHONHASHSEED'] = '0'
+    return env
+
+def _read_output(path):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+def run_program(code: str, run_timeout=10, memory_limit_mb=MEMORY_LIMIT_MB, output_limit_mb=OUTPUT_LIMIT_MB) -> RunCodeResponse:
+    """Run one Python program in a resource-limited subprocess; never raises for failures of the program itself."""
+    work_dir = tempfile.mkdtemp(prefix='ult_sandbox_')
+    try:
+        program_path = os.path.join(work_dir, 'main.py')
+        with open(program_path, 'w', encoding='utf-8') as f:
+            f.write(code)
+        limits = [str(memory_limit_mb << 20), str(int(run_timeout) + 1), str(output_limit_mb << 20)]
+        # stdout / stderr 写入文件: 大小受 RLIMIT_FSIZE 限制, 且不会因后代进程持有管道而阻塞
+        with open(os.path.join(work_dir, 'stdout'), 'wb') as stdout, open(os.path.join(work_dir, 'stderr'), 'wb') as stderr:
+            start_time = time.perf_counter()
+            process = subprocess.Popen([sys.executable, '-c', BOOTSTRAP, *limits, program_path], cwd=work_dir, env=_child_env(),
+                                       stdin=subprocess.DEVNULL, stdout=stdout, stderr=stderr, start_new_session=True)
+            try:
+                return_code = process.wait(timeout=run_timeout)
+                status = CommandRunStatus.Finished
+            except subprocess.TimeoutExpired:
+                return_code = None
+                status = CommandRunStatus.TimeLimitExceeded
+            finally:
+                # 程序自己启动的子进程也一并结束
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                process.wait()
+            execution_time = time.perf_counter() - start_time
+
+        run_result = CommandRunResult(status=status, execution_time=execution_time, return_code=return_code,
+                                      stdout=_read_output(os.path.join(work_dir, 'stdout')), stderr=_read_output(os.path.join(work_dir, 'stderr')))
+        if status == CommandRunStatus.Finished and return_code == 0:
+            return RunCodeResponse(status=RunStatus.Success, message='', run_result=run_result)
+        return RunCodeResponse(status=RunStatus.Failed, message='', run_result=run_result)
+    except OSError as e:
+        return RunCodeResponse(status=RunStatus.SandboxError, message=f'Local sandbox error: {e}',
+                               run_result=CommandRunResult(status=CommandRunStatus.Error, stderr=str(e)))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def run_programs(code: List[str], run_timeout=10, max_workers=None, memory_limit_mb=MEMORY_LIMIT_MB) -> List[RunCodeResponse]:
+    """`run_program` for every program, `max_workers` (default: all cores) at a time; results are in input order."""
+    max_workers = max_workers or os.cpu_count() or 1
+    # 线程只负责等待子进程, 真正的并行度来自子进程
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda program: run_program(program, run_timeout=run_timeout, memory_limit_mb=memory_limit_mb), code))
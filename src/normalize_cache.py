@@ -0,0 +1,72 @@
+# coding: utf-8
+
+# Description: On-disk cache of normalized test cases for `format.py`. A raw generated test is keyed by
+# a hash of (raw test text, function name, index, NORMALIZER_VERSION) and maps to the final wrapped
+# test that `remove_extra` + `reformat_case_byrules` produce, so byte-identical generations across
+# rounds, temperatures and models are normalized once.
+#
+#   python normalize_cache.py stats [--path results/normalize_cache.sqlite]
+#   python normalize_cache.py clear [--path results/normalize_cache.sqlite]
+
+import os
+import hashlib
+import sqlite3
+from contextlib import closing
+from argparse import ArgumentParser
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'normalize_cache.sqlite')
+
+# 规范化规则 (remove_extra / reformat_case_byrules) 的输出发生变化时加一, 旧条目随之失效
+NORMALIZER_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS normalized_tests (
+    key TEXT PRIMARY KEY,
+    test TEXT NOT NULL
+) WITHOUT ROWID
+"""
+
+def connect(path=DEFAULT_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=60)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(SCHEMA)
+    return conn
+
+def cache_key(testcase, func_name, idx=0):
+    return hashlib.sha256(f'{NORMALIZER_VERSION}\0{func_name}\0{idx}\0{testcase}'.encode('utf-8')).hexdigest()
+
+def lookup(conn, key):
+    row = conn.execute('SELECT test FROM normalized_tests WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else None
+
+def store(conn, entries):
+    """Insert `[(key, normalized test)]` in one transaction."""
+    if not entries:
+        return
+    with conn:
+        conn.executemany('INSERT OR REPLACE INTO normalized_tests VALUES (?, ?)', entries)
+
+def clear(path=DEFAULT_PATH):
+    if not os.path.exists(path):
+        return
+    with closing(connect(path)) as conn:
+        with conn:
+            conn.execute('DELETE FROM normalized_tests')
+        conn.execute('VACUUM')
+
+def stats(path=DEFAULT_PATH):
+    with closing(connect(path)) as conn:
+        return conn.execute('SELECT COUNT(*) FROM normalized_tests').fetchone()[0]
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument("command", choices=['stats', 'clear'])
+    parser.add_argument("--path", type=str, default=DEFAULT_PATH)
+    args = parser.parse_args()
+    if args.command == 'clear':
+        clear(args.path)
+        print(f"[+] 🧹 Cleared the normalization cache at {args.path}")
+    else:
+        print(f"[+] 🗃️ {args.path}: {stats(args.path)} normalized tests")
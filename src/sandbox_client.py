@@ -0,0 +1,231 @@
+# coding: utf-8
+
+# Description: asyncio client for the sandbox_fusion `/run_code` API used by `tools.execute_code`.
+# All requests share one pooled keep-alive HTTP session. The number of requests in flight follows an
+# AIMD limit: +1 per window of successes, halved on errors and shrunk when latency drifts up.
+# Failed requests are retried one by one with jittered exponential backoff, and a circuit breaker
+# stops all traffic while the service is down (probing it again after a growing cool-down) instead
+# of hammering it or sleeping a fixed minute per hiccup.
+
+import os
+import time
+import random
+import asyncio
+from typing import List
+
+import aiohttp
+
+from local_sandbox import RunStatus, CommandRunStatus, RunCodeResponse, CommandRunResult
+
+DEFAULT_ENDPOINT = os.environ.get('SANDBOX_FUSION_ENDPOINT', 'http://localhost:8080')
+
+class SandboxUnavailable(Exception):
+    pass
+
+class RetryableError(Exception):
+    """A failed request worth retrying; `overload` marks signs of an overloaded service (429 / 503 / client timeout)."""
+
+    def __init__(self, message, overload=False):
+        super().__init__(message)
+        self.overload = overload
+
+def parse_response(data) -> RunCodeResponse:
+    """RunCodeResponse from the service's JSON (works with sandbox_fusion's models and the local fallbacks)."""
+    def command_result(result):
+        if result is None:
+            return None
+        return CommandRunResult(status=CommandRunStatus(result['status']), execution_time=result.get('execution_time'), cpu_time=result.get('cpu_time'),
+                                return_code=result.get('return_code'), stdout=result.get('stdout'), stderr=result.get('stderr'))
+    return RunCodeResponse(status=RunStatus(data['status']), message=data.get('message', ''), compile_result=command_result(data.get('compile_result')),
+                           run_result=command_result(data.get('run_result')), executor_pod_name=data.get('executor_pod_name'), files=data.get('files') or {})
+
+def failed_response(message):
+    return RunCodeResponse(status=RunStatus.Failed, message=message,
+                           run_result=CommandRunResult(status=CommandRunStatus.TimeLimitExceeded, stderr=message))
+
+class AdaptiveLimit:
+    """
+    AIMD concurrency limit. A full window of successes (`limit` requests) adds one slot; an overload error halves the limit
+    (at most once per window), and a short-term latency average drifting above `latency_tolerance` x the long-term
+    average shrinks it by 10%.
+    """
+
+    def __init__(self, initial=20, minimum=1, maximum=256, latency_tolerance=2.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.successes = 0
+        self.short_latency = None
+        self.long_latency = None
+        self.last_decrease = 0.0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def _decrease(self, factor):
+        # 同一批并发请求的失败只算一次
+        now = time.monotonic()
+        if now - self.last_decrease < (self.short_latency or 0):
+            return
+        self.last_decrease = now
+        self.limit = max(self.minimum, self.limit * factor)
+        self.successes = 0
+
+    def on_success(self, latency):
+        self.short_latency = latency if self.short_latency is None else 0.8 * self.short_latency + 0.2 * latency
+        self.long_latency = latency if self.long_latency is None else 0.98 * self.long_latency + 0.02 * latency
+        if self.short_latency > self.latency_tolerance * self.long_latency:
+            self._decrease(0.9)
+            return
+        self.successes += 1
+        if self.successes >= int(self.limit):
+            self.successes = 0
+            self.limit = min(self.maximum, self.limit + 1)
+
+    def on_error(self):
+        self._decrease(0.5)
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; while open nobody sends. After the cool-down one probe is let through."""
+
+    def __init__(self, threshold=10, cooldown=5.0, max_cooldown=120.0):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.down_since = None
+
+    async def wait(self, max_outage):
+        """Wait until a request may be sent; raises SandboxUnavailable once the service has been down for `max_outage` seconds."""
+        while self.opened_at is not None:
+            if time.monotonic() - self.down_since > max_outage:
+                raise SandboxUnavailable(f'sandbox unavailable for more than {max_outage}s')
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+            if remaining <= 0 and not self.probing:
+                # half-open: this request is the probe
+                self.probing = True
+                return True
+            await asyncio.sleep(max(remaining, 0.1))
+        return False
+
+    def on_success(self, sent_at):
+        if self.opened_at is not None and sent_at < self.opened_at:
+            # 断路器打开前发出的请求: 不能说明服务已经恢复
+            return
+        if self.opened_at is not None:
+            print(f"[+] Sandbox is back after {time.monotonic() - self.down_since:.0f}s")
+        self.failures = 0
+        self.opened_at = None
+        self.down_since = None
+        self.probing = False
+        self.cooldown = self.base_cooldown
+
+    def on_failure(self, probe):
+        self.failures += 1
+        if probe:
+            self.probing = False
+            self.opened_at = time.monotonic()
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+        elif self.opened_at is None and self.failures >= self.threshold:
+            print(f"[-] Sandbox failing ({self.failures} errors in a row), pausing requests for {self.cooldown:.0f}s")
+            self.opened_at = time.monotonic()
+            self.down_since = self.opened_at
+
+class SandboxClient:
+
+    def __init__(self, endpoint=DEFAULT_ENDPOINT, initial_concurrency=20, max_concurrency=256, max_attempts=6,
+                 backoff_base=0.5, backoff_cap=30.0, breaker_threshold=10, max_outage=600.0):
+        self.endpoint = endpoint.rstrip('/')
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker_threshold = breaker_threshold
+        self.max_outage = max_outage
+        self.retries = 0
+
+    def backoff(self, attempt):
+        # full jitter: 请求之间错开, 避免同时重试
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def _post(self, session, code, run_timeout):
+        payload = {'code': code, 'language': 'python', 'run_timeout': run_timeout}
+        try:
+            async with session.post(f'{self.endpoint}/run_code', json=payload) as result:
+                if result.status == 429 or result.status >= 500:
+                    raise RetryableError(f'sandbox responded with code {result.status}', overload=result.status in (429, 503))
+                if result.status != 200:
+                    return failed_response(f'sandbox responded with code {result.status}: {await result.text()}')
+                resp = parse_response(await result.json())
+        except asyncio.TimeoutError as e:
+            raise RetryableError('request timed out', overload=True) from e
+        except (aiohttp.ClientError, ValueError) as e:
+            raise RetryableError(repr(e)) from e
+        if resp.status == RunStatus.SandboxError:
+            raise RetryableError(f'sandbox error: {resp.message}')
+        return resp
+
+    async def _run_one(self, session, code, run_timeout):
+        attempt = 0
+        while True:
+            try:
+                probe = await self.breaker.wait(self.max_outage)
+            except SandboxUnavailable as e:
+                return failed_response(f'Sandbox Error: {e}')
+            await self.limit.acquire()
+            start_time = time.monotonic()
+            try:
+                resp = await self._post(session, code, run_timeout)
+            except RetryableError as e:
+                error = e
+                # 过载信号收缩并发上限; 其他错误 (500, 连接中断) 计入断路器.
+                # 探测请求无论失败原因如何都要交给断路器, 否则 probing 一直为 True, 之后再也不会有探测
+                if e.overload:
+                    self.limit.on_error()
+                if probe or not e.overload:
+                    self.breaker.on_failure(probe)
+            else:
+                self.limit.on_success(time.monotonic() - start_time)
+                self.breaker.on_success(start_time)
+                return resp
+            finally:
+                await self.limit.release()
+            if probe:
+                # 探测失败不消耗重试次数: 服务恢复前由断路器控制等待 (上限 max_outage)
+                continue
+            attempt += 1
+            if attempt >= self.max_attempts:
+                return failed_response(f'Sandbox Error: {error}')
+            self.retries += 1
+            await asyncio.sleep(self.backoff(attempt))
+
+    async def run_all(self, code: List[str], run_timeout=10) -> List[RunCodeResponse]:
+        self.limit = AdaptiveLimit(initial=self.initial_concurrency, maximum=self.max_concurrency)
+        self.breaker = CircuitBreaker(threshold=self.breaker_threshold)
+        self.retries = 0
+        timeout = aiohttp.ClientTimeout(total=run_timeout + 60)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            return await asyncio.gather(*(self._run_one(session, program, run_timeout) for program in code))
+
+def run_code_batch(code: List[str], run_timeout=10, **client_args) -> List[RunCodeResponse]:
+    """Blocking entry point: run every program through one SandboxClient, results in input order."""
+    client = SandboxClient(**client_args)
+    results = asyncio.run(client.run_all(code, run_timeout))
+    if code:
+        print(f"[+] Sandbox: {len(code)} requests, {client.retries} retries, concurrency limit {client.initial_concurrency} -> {int(client.limit.limit)}")
+    return results
@@ -0,0 +1,80 @@
+# coding: utf-8
+
+# Description: Local stand-in for the sandbox_fusion service, for exercising `sandbox_client` without
+# the real sandbox. Serves `POST /run_code` by running the program with `local_sandbox`, and can
+# inject extra latency, HTTP 500s, dropped connections, a capacity limit (503 beyond it) and an
+# outage window.
+#
+#   python sandbox_standin.py --port 8080 --latency 0.2 --failure_rate 0.05 --capacity 32 --outage 30:20
+#   SANDBOX_FUSION_ENDPOINT=http://localhost:8080 python format.py --gt True
+#
+# Breaker recovery when the half-open probe is refused for capacity: start the stand-in with
+# `--capacity 3 --outage 1:3`, fill the three slots with programs that sleep 8s, then send a batch
+# from a second client during the outage. Its breaker opens, the first probe gets a 503, and the
+# batch must still complete on a later probe instead of failing after `max_outage`.
+
+import time
+import random
+import asyncio
+import dataclasses
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from local_sandbox import run_program
+
+def to_json(value):
+    if dataclasses.is_dataclass(value):
+        value = dataclasses.asdict(value)
+    elif hasattr(value, 'model_dump'):
+        value = value.model_dump()
+    elif hasattr(value, 'dict'):
+        value = value.dict()
+    return {key: (item.value if hasattr(item, 'value') else to_json(item) if isinstance(item, dict) else item) for key, item in value.items()}
+
+def make_app(args):
+    state = {'in_flight': 0, 'served': 0, 'start': time.monotonic()}
+    executor = ThreadPoolExecutor(max_workers=args.capacity)
+    outage = [float(value) for value in args.outage.split(':')] if args.outage else None
+
+    async def run_code(request):
+        elapsed = time.monotonic() - state['start']
+        if outage and outage[0] <= elapsed < outage[0] + outage[1]:
+            return web.Response(status=500, text='outage')
+        if state['in_flight'] >= args.capacity:
+            return web.Response(status=503, text='over capacity')
+        if random.random() < args.drop_rate:
+            # 模拟连接被中断
+            request.transport.close()
+            return web.Response(status=500)
+        if random.random() < args.failure_rate:
+            return web.Response(status=500, text='injected failure')
+
+        state['in_flight'] += 1
+        try:
+            payload = await request.json()
+            # 注入的延迟随并发数上升, 模拟服务过载时变慢
+            await asyncio.sleep(random.expovariate(1 / args.latency) * (1 + state['in_flight'] / args.capacity) if args.latency > 0 else 0)
+            resp = await asyncio.get_running_loop().run_in_executor(executor, run_program, payload['code'], payload.get('run_timeout', 10))
+        finally:
+            state['in_flight'] -= 1
+        state['served'] += 1
+        return web.json_response(to_json(resp))
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post('/run_code', run_code)
+    return app
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument("--host", type=str, default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help='mean extra latency per request (s)')
+    parser.add_argument("--failure_rate", type=float, default=0.0, help='fraction of requests answered with HTTP 500')
+    parser.add_argument("--drop_rate", type=float, default=0.0, help='fraction of connections closed without a response')
+    parser.add_argument("--capacity", type=int, default=32, help='concurrent requests served; more get HTTP 503')
+    parser.add_argument("--outage", type=str, default='', help='START:DURATION seconds after startup during which every request fails')
+    args = parser.parse_args()
+    print(f"[+] 🧪 Sandbox stand-in on http://{args.host}:{args.port}")
+    web.run_app(make_app(args), host=args.host, port=args.port, print=None)
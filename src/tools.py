@@ -2,10 +2,11 @@ import ast
 import json
 from typing import List, Tuple
 import re
-import time
+import secrets
 
-from sandbox_fusion import run_code, run_concurrent, RunCodeRequest, RunStatus, CommandRunStatus, RunCodeResponse
-from sandbox_fusion.models import CommandRunResult
+import gt_cache
+
+from local_sandbox import run_programs, RunStatus, CommandRunStatus, RunCodeResponse, CommandRunResult
 	
 def extract_all_test_cases(source_code):
 	extracted_assertions = []
@@ -167,77 +168,238 @@ def extract_calls_answers(text_line):
 	except Exception as e:
 		return None, None
 
-def safe_run_wrapper(index: int, request: RunCodeRequest):
-	try:
-		result = run_code(request)
-		return index, result
-	except Exception as e:
-		return index, e
+def execute_code(code: List[str], run_timeout=10, sandbox='remote') -> List[RunCodeResponse]:
+	"""
+	Run Python programs and return one RunCodeResponse per program.
+	sandbox='remote' sends them to the sandbox_fusion service ($SANDBOX_FUSION_ENDPOINT) through the adaptive async client;
+	sandbox='local' runs them in resource-limited local subprocesses on all cores.
+	"""
+	if sandbox == 'local':
+		return run_programs(code, run_timeout=run_timeout)
+	from sandbox_client import run_code_batch
+	return run_code_batch(code, run_timeout=run_timeout)
 
-def execute_code(code: List[str], run_timeout=10) -> List[RunCodeResponse]:
-	results = [None] * len(code)
-	pending_indices = list(range(len(code)))
-	max_retry_times = 5
-	
-	while max_retry_times > 0 and pending_indices:
-		max_retry_times -= 1
-		args_list = [
-			[idx, RunCodeRequest(code=code[idx], language='python', run_timeout=run_timeout)]
-			for idx in pending_indices
-		]
-		
+# Tasks are validated VALIDATION_CHUNK_SIZE at a time, so memory does not grow with the dataset
+VALIDATION_CHUNK_SIZE = 1000
+
+# 结果通道: 验证程序把每个 case 的结果写成一行带 nonce 的 JSON, 写到 fd 1 的副本上;
+# fd 1 本身重定向到 stderr, 被测函数的任何输出都不会混入结果
+RESULT_CHANNEL = '''
+if '_ult_channel' not in globals():
+    import os as _os
+    _ult_channel = _os.fdopen(_os.dup(1), 'w')
+    _os.dup2(2, 1)
+import json as _json
+def _ult_emit(record):
+    _ult_channel.write(_json.dumps(record) + '\\n')
+    _ult_channel.flush()
+'''
+
+# Per-case budgets of a validation program: wall/CPU seconds and extra address space (MB)
+CASE_TIME_LIMIT = 2
+CASE_MEMORY_LIMIT_MB = 1024
+# Program-level allowance on top of the cases: interpreter startup and running the GT code
+VALIDATION_STARTUP_SECONDS = 10
+
+def validation_timeout(num_cases: int) -> float:
+	"""run_timeout of a validation program with `num_cases` cases, so that a case hits its own budget before the program hits this one."""
+	return num_cases * CASE_TIME_LIMIT + VALIDATION_STARTUP_SECONDS
+
+# 每个 case 在 fork 出的子进程中运行, 子进程自带时间 (SIGALRM + RLIMIT_CPU) 和内存 (RLIMIT_AS) 预算;
+# 结果经管道交给父进程写入结果通道. 失控的 case 只记为 err, 同一任务的其他 case 照常报告
+CASE_RUNNER = '''
+import os as _os, signal as _signal
+try:
+    import resource as _resource
+except ImportError:
+    _resource = None
+
+def _ult_evaluate(nonce, idx, call, check):
+    case = {'nonce': nonce, 'case': idx}
+    try:
+        _r = call()
+        case['res'] = repr(_r)
+        case['val'] = repr(check(_r))
+    except Exception as _e:
+        case['err'] = repr(_e)
+        # 超出内存 / 栈预算的失败取决于运行环境, 不是调用本身的结果
+        if isinstance(_e, (MemoryError, RecursionError)):
+            case['aborted'] = True
+    return case
+
+def _ult_limit_case():
+    _signal.signal(_signal.SIGALRM, _signal.SIG_DFL)
+    _signal.setitimer(_signal.ITIMER_REAL, _ULT_CASE_SECONDS)
+    if _resource is None:
+        return
+    seconds = int(_ULT_CASE_SECONDS) + 1
+    _resource.setrlimit(_resource.RLIMIT_CPU, (seconds, seconds + 1))
+    try:
+        with open('/proc/self/statm') as f:
+            size = int(f.read().split()[0]) * _resource.getpagesize()
+    except (OSError, ValueError):
+        return
+    limit = size + _ULT_CASE_MEMORY
+    hard = _resource.getrlimit(_resource.RLIMIT_AS)[1]
+    if hard != _resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    _resource.setrlimit(_resource.RLIMIT_AS, (limit, hard))
+
+def _ult_run_case(nonce, idx, call, check):
+    if not hasattr(_os, 'fork'):
+        _ult_emit(_ult_evaluate(nonce, idx, call, check))
+        return
+    read_fd, write_fd = _os.pipe()
+    pid = _os.fork()
+    if pid == 0:
+        try:
+            _os.close(read_fd)
+            _ult_limit_case()
+            data = _json.dumps(_ult_evaluate(nonce, idx, call, check)).encode()
+            with _os.fdopen(write_fd, 'wb') as f:
+                f.write(data)
+        finally:
+            _os._exit(0)
+    _os.close(write_fd)
+    try:
+        with _os.fdopen(read_fd, 'rb') as f:
+            data = f.read()
+        _, status = _os.waitpid(pid, 0)
+    except BaseException:
+        # 整个任务超时等: 结束子进程后继续向上抛出
+        try:
+            _os.kill(pid, _signal.SIGKILL)
+            _os.waitpid(pid, 0)
+        except OSError:
+            pass
+        raise
+    try:
+        case = _json.loads(data)
+    except ValueError:
+        signum = _os.WTERMSIG(status) if _os.WIFSIGNALED(status) else None
+        if signum in (_signal.SIGALRM, getattr(_signal, 'SIGXCPU', None)):
+            error = TimeoutError(f'case exceeded its {_ULT_CASE_SECONDS}s budget')
+        else:
+            error = RuntimeError(f'case process died (status {status})')
+        case = {'nonce': nonce, 'case': idx, 'err': repr(error), 'aborted': True}
+    _ult_emit(case)
+'''
+
+# 批量执行: 一个解释器依次运行一批任务的验证程序, 每个任务使用独立的命名空间和时间预算,
+# 任务的开始 / 结束也作为记录写入结果通道
+BATCH_DRIVER = '''
+import os, sys, json, signal, builtins
+
+_channel = os.fdopen(os.dup(1), 'w')
+os.dup2(2, 1)
+
+def _event(**fields):
+    _channel.write(json.dumps({'nonce': _NONCE, **fields}) + '\\n')
+    _channel.flush()
+
+class _TaskTimeout(BaseException):
+    pass
+
+def _on_alarm(signum, frame):
+    raise _TaskTimeout()
+
+signal.signal(signal.SIGALRM, _on_alarm)
+_recursion_limit = sys.getrecursionlimit()
+for _index, _program in enumerate(_PROGRAMS):
+    _event(task=_index, event='start')
+    _status = 'ok'
+    signal.setitimer(signal.ITIMER_REAL, _BUDGET)
+    try:
+        exec(compile(_program, f'<task {_index}>', 'exec'), {'__name__': '__main__', '__builtins__': builtins, '_ult_channel': _channel})
+    except SystemExit as _e:
+        if _e.code not in (None, 0):
+            _status = 'error'
+    except _TaskTimeout:
+        _status = 'timeout'
+    except BaseException:
+        _status = 'error'
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    sys.setrecursionlimit(_recursion_limit)
+    _event(task=_index, event='end', status=_status)
+'''
+
+def pack_programs(programs: List[str], nonce: str, budget=10) -> str:
+	"""One program that runs every program of `programs` in its own namespace with `budget` seconds each."""
+	return f"_PROGRAMS = {programs!r}\n_NONCE = {nonce!r}\n_BUDGET = {float(budget)!r}\n" + BATCH_DRIVER
+
+def parse_records(stdout: str, nonce: str) -> List[dict]:
+	"""Decode the result records of a validation run in one pass; anything without the run's nonce is ignored."""
+	records = []
+	for line in stdout.splitlines():
+		if not line.startswith('{'):
+			continue
 		try:
-			batch_outputs = run_concurrent(
-				safe_run_wrapper, 
-				args=args_list, 
-				concurrency=20
-			)
-			
-			new_pending_indices = []
-			sandbox_needs_restart = False
-			
-			for output in batch_outputs:
-				if not isinstance(output, tuple):
-					continue
-				idx, res = output
-				
-				if isinstance(res, Exception):
-					print(f"Task {idx} failed with error: {res}")
-					new_pending_indices.append(idx)
-					sandbox_needs_restart = True
-				else:
-					results[idx] = res
-			
-			pending_indices = new_pending_indices
-			
-			if sandbox_needs_restart and pending_indices:
-				print(f"Sandbox error detected. Retrying {len(pending_indices)} tasks after sleep...")
-				time.sleep(60)
-				
-		except Exception as e:
-			print(f"Concurrent error: {e}")
-			time.sleep(60)
-
-	final_output = []
-	for res in results:
-		if res is None:
-			final_output.append(RunCodeResponse(
-				status=RunStatus.Failed,
-				message='Sandbox Error',
-				run_result=CommandRunResult(status=CommandRunStatus.TimeLimitExceeded, stderr='Sandbox Error')
-			))
-		else:
-			final_output.append(res)
-			
-	return final_output
+			record = json.loads(line)
+		except ValueError:
+			continue
+		if isinstance(record, dict) and record.get('nonce') == nonce:
+			records.append(record)
+	return records
+
+def case_records(records: List[dict]) -> dict:
+	return {record['case']: record for record in records if 'case' in record}
 
-def validate_and_fill_generated_testcases(generated_testcase_str_list: List[str], gt_code_list: List[str]) -> Tuple[List[List[str]], List[int], List[int]]:
+def unpack_outputs(records: List[dict], count: int) -> List[dict]:
+	"""
+	Split the records of a packed program into `{case: record}` per program: the cases a program reported before it
+	failed or ran out of time are kept (as for a standalone run), None for a program the batch never finished.
+	"""
+	outputs = [None] * count
+	index, cases = None, []
+	for record in records:
+		if record.get('event') == 'start':
+			index, cases = record['task'], []
+		elif record.get('event') == 'end' and index is not None:
+			outputs[index] = case_records(cases)
+			index = None
+		elif index is not None:
+			cases.append(record)
+	return outputs
+
+def response_stdout(resp: RunCodeResponse) -> str:
+	# 无论运行状态如何都读取输出: 带 nonce 的记录各自对应一个已完成的 case, 程序之后超时或崩溃不影响它们
+	return resp.run_result.stdout if (resp.run_result and resp.run_result.stdout) else ""
+
+def run_validation_programs(test_codes: List[str], nonce: str, sandbox='remote', batch_size=1, run_timeout=10) -> List[dict]:
+	"""
+	The `{case: record}` results of every validation program (the cases it reported, even if it then failed). With
+	batch_size > 1, batch_size programs share one interpreter (one execution request); programs of a batch that crashed
+	or hung are re-run on their own.
+	"""
+	if batch_size <= 1:
+		return [case_records(parse_records(response_stdout(resp), nonce)) for resp in execute_code(test_codes, run_timeout=run_timeout, sandbox=sandbox)]
+
+	batches = [test_codes[i:i + batch_size] for i in range(0, len(test_codes), batch_size)]
+	packed = [pack_programs(batch, nonce, budget=run_timeout) for batch in batches]
+	outputs = []
+	for batch, resp in zip(batches, execute_code(packed, run_timeout=run_timeout * batch_size, sandbox=sandbox)):
+		outputs.extend(unpack_outputs(parse_records(response_stdout(resp), nonce), len(batch)))
+
+	# 批次中途退出 (段错误, 内存耗尽, os._exit, 整批超时) 时, 未完成的任务单独重新运行
+	retry = [i for i, output in enumerate(outputs) if output is None]
+	if retry:
+		print(f"Re-running {len(retry)} tasks whose batch did not finish...")
+		for i, resp in zip(retry, execute_code([test_codes[i] for i in retry], run_timeout=run_timeout, sandbox=sandbox)):
+			outputs[i] = case_records(parse_records(response_stdout(resp), nonce))
+	return outputs
+
+def validate_and_fill_generated_testcases(generated_testcase_str_list: List[str], gt_code_list: List[str], sandbox='remote', batch_size=1, cache=None) -> Tuple[List[List[str]], List[int], List[int]]:
 	"""
 	Validate generated test cases and fill __TO_BE_FILLED__ placeholder
 	
 	Args:
 		generated_testcase_str_list: Generated test cases string (JSON format) list
 		gt_code_list: GT code list
+		sandbox: execution backend for execute_code ('remote' or 'local')
+		batch_size: number of tasks validated in one interpreter (1: one execution request per task)
+		cache: open gt_cache connection; cases already in it are not executed again
 	
 	Returns:
 		(list of valid test cases list(not repeated), list of invalid test cases number(not executable, not correct, or repeated), list of all test cases number)
@@ -245,131 +407,154 @@ def validate_and_fill_generated_testcases(generated_testcase_str_list: List[str]
 	valid_tests_list = []
 	invalid_count_list = []
 	total_count_list = []
-	test_codes = []
-	gen_tests = []
+	# 本次验证的结果记录都带上这个 nonce, 其他输出一律忽略
+	nonce = secrets.token_hex(8)
+	cached_count = 0
+	case_count = 0
 	
 	try:
-		for generated_testcase_str, gt_code in zip(generated_testcase_str_list, gt_code_list):
-			invalid_count = 0
-
-			# 1. Parse JSON with enhanced error handling
-			try:
-				test_data = json.loads(generated_testcase_str)
-			except json.JSONDecodeError as e:
-				# Try robust JSON parsing
+		for chunk_start in range(0, len(generated_testcase_str_list), VALIDATION_CHUNK_SIZE):
+			chunk_end = chunk_start + VALIDATION_CHUNK_SIZE
+			test_codes = []
+			case_counts = []
+			gen_tests = []
+			gen_calls = []
+			cached_list = []
+
+			for generated_testcase_str, gt_code in zip(generated_testcase_str_list[chunk_start:chunk_end], gt_code_list[chunk_start:chunk_end]):
+				invalid_count = 0
+
+				# 1. Parse JSON with enhanced error handling
 				try:
-					# Fix common JSON problems
-					fixed_str = generated_testcase_str.replace("'", '"')
-					# Remove trailing comma
-					fixed_str = re.sub(r',\s*}', '}', fixed_str)
-					fixed_str = re.sub(r',\s*]', ']', fixed_str)
-					test_data = json.loads(fixed_str)
-				except Exception as e:
-					raise Exception(f"JSON parsing also failed: {e}")
+					test_data = json.loads(generated_testcase_str)
+				except json.JSONDecodeError as e:
+					# Try robust JSON parsing
+					try:
+						# Fix common JSON problems
+						fixed_str = generated_testcase_str.replace("'", '"')
+						# Remove trailing comma
+						fixed_str = re.sub(r',\s*}', '}', fixed_str)
+						fixed_str = re.sub(r',\s*]', ']', fixed_str)
+						test_data = json.loads(fixed_str)
+					except Exception as e:
+						raise Exception(f"JSON parsing also failed: {e}")
 			
-			# 2. Validate JSON structure
-			if not isinstance(test_data, dict):
-				raise Exception(f"Test data is not a dictionary: {type(test_data)}")
+				# 2. Validate JSON structure
+				if not isinstance(test_data, dict):
+					raise Exception(f"Test data is not a dictionary: {type(test_data)}")
 				
-			if "assert_statements" not in test_data:
-				raise Exception(f"Test data is missing 'assert_statements' field, available fields: {list(test_data.keys())}")
+				if "assert_statements" not in test_data:
+					raise Exception(f"Test data is missing 'assert_statements' field, available fields: {list(test_data.keys())}")
 			
-			assert_statements = test_data["assert_statements"]
+				assert_statements = test_data["assert_statements"]
 			
-			# Handle assert_statements not being a list
-			if isinstance(assert_statements, str):
-				# If it's a string, split by lines
-				assert_statements = [line.strip() for line in assert_statements.split('\n') 
-								if line.strip() and line.strip().startswith('assert')]
-			elif not isinstance(assert_statements, list):
-				raise Exception(f"assert_statements is not a list or string: {type(assert_statements)}")
+				# Handle assert_statements not being a list
+				if isinstance(assert_statements, str):
+					# If it's a string, split by lines
+					assert_statements = [line.strip() for line in assert_statements.split('\n') 
+									if line.strip() and line.strip().startswith('assert')]
+				elif not isinstance(assert_statements, list):
+					raise Exception(f"assert_statements is not a list or string: {type(assert_statements)}")
 			
-			# 3. Quick check if function is defined in GT code (string check)
-			# if f"def {fn_name}(" not in gt_code:
-			# 	# Extract actual function name defined in GT code, for error message
-			# 	func_definitions = re.findall(r'def\s+(\w+)\s*\(', gt_code)
-			# 	raise Exception(f"Function '{fn_name}' is not defined in GT code, available functions: {func_definitions}\nGT code: \n{gt_code}")
+				# 3. Quick check if function is defined in GT code (string check)
+				# if f"def {fn_name}(" not in gt_code:
+				# 	# Extract actual function name defined in GT code, for error message
+				# 	func_definitions = re.findall(r'def\s+(\w+)\s*\(', gt_code)
+				# 	raise Exception(f"Function '{fn_name}' is not defined in GT code, available functions: {func_definitions}\nGT code: \n{gt_code}")
 			
-			# 4. Handle each assert statement
-			normalized_stmts = []
-			calls = []
-			answers = []
-			total_count = len(assert_statements)
-			for i, stmt in enumerate(assert_statements):
-				if not isinstance(stmt, str):
-					print(f"assert statement {i+1} is not a string: {type(stmt)}")
-					invalid_count += 1
-					continue
-					
-				stmt = stmt.strip()
-				func_call_part, answer_part = extract_calls_answers(stmt)
-				if not func_call_part or not answer_part:
-					invalid_count += 1
-					continue
-				stmt = f"assert {func_call_part} == __TO_BE_FILLED__"
-				
-				normalized_stmts.append(stmt)
-				calls.append(func_call_part)
-				answers.append(answer_part)
-				
-			invalid_count_list.append(invalid_count)
-			total_count_list.append(total_count)
-
-			lines = []
-			lines.append("# GT code")
-			lines.append(gt_code)
-			lines.append("# Generated testcases")
-			for idx, (call, answer) in enumerate(zip(calls, answers)):
-				lines.append(f"print('__CASE_START__{idx}')")
-				lines.append("try:")
-				lines.append(f"    _r = {call}")
-				lines.append(f"    print('__CASE_RES__{idx}:' + repr(_r))")
-				# lines.append(f"    print('__CASE_ANS__{idx}:{answer}')")
-				lines.append(f"    print('__CASE_VAL__{idx}:' + repr(((_r) == ({answer}))))")
-				lines.append("except Exception as _e:")
-				lines.append(f"    print('__CASE_ERR__{idx}:' + repr(_e))")
-			test_codes.append('\n'.join(lines))
-
-			gen_tests.append(normalized_stmts)
-		
-		# Run codes in sandbox parallelly
-		results = execute_code(test_codes)
-
-		for i, resp in enumerate(results):
-			stdout = resp.run_result.stdout if (resp.status == RunStatus.Success and resp.run_result and resp.run_result.status == CommandRunStatus.Finished) else ""
-			valid_tests = set()
-			invalid_count = invalid_count_list[i]
-			normalized_stmts = gen_tests[i]
-
-			for idx, stmt in enumerate(normalized_stmts):
-				key_res = f"__CASE_RES__{idx}:"
-				key_val = f"__CASE_VAL__{idx}:"
-				key_err = f"__CASE_ERR__{idx}"
-				if key_res in stdout:
-					line = next((ln for ln in stdout.splitlines() if key_res in ln), "")
-					result_repr = line.split(key_res, 1)[1].strip()
-					processed_stmt = stmt.replace("__TO_BE_FILLED__", result_repr)					
-					# check if the test case is repeated
-					if processed_stmt in valid_tests:
+				# 4. Handle each assert statement
+				normalized_stmts = []
+				calls = []
+				answers = []
+				total_count = len(assert_statements)
+				for i, stmt in enumerate(assert_statements):
+					if not isinstance(stmt, str):
+						print(f"assert statement {i+1} is not a string: {type(stmt)}")
 						invalid_count += 1
 						continue
-					valid_tests.add(processed_stmt)	
-					# check if the test case is correct
-					line = next((ln for ln in stdout.splitlines() if key_val in ln), "")
-					if not line:
+					
+					stmt = stmt.strip()
+					func_call_part, answer_part = extract_calls_answers(stmt)
+					if not func_call_part or not answer_part:
 						invalid_count += 1
 						continue
-					val_repr = line.split(key_val, 1)[1].strip()
-					if val_repr == "False":
+					stmt = f"assert {func_call_part} == __TO_BE_FILLED__"
+				
+					normalized_stmts.append(stmt)
+					calls.append(func_call_part)
+					answers.append(answer_part)
+				
+				invalid_count_list.append(invalid_count)
+				total_count_list.append(total_count)
+
+				cached = gt_cache.lookup(cache, gt_code, calls, answers) if cache is not None else {}
+				cached_count += len(cached)
+				case_count += len(calls)
+				gen_calls.append((gt_code, calls, answers))
+				cached_list.append(cached)
+				gen_tests.append(normalized_stmts)
+				if len(cached) == len(calls):
+					# every case is cached: nothing to execute
+					test_codes.append(None)
+					continue
+
+				lines = []
+				lines.append(RESULT_CHANNEL)
+				lines.append(f"_ULT_CASE_SECONDS, _ULT_CASE_MEMORY = {CASE_TIME_LIMIT}, {CASE_MEMORY_LIMIT_MB << 20}")
+				lines.append(CASE_RUNNER)
+				lines.append("# GT code")
+				lines.append(gt_code)
+				lines.append("# Generated testcases")
+				case_counts.append(len(calls) - len(cached))
+				for idx, (call, answer) in enumerate(zip(calls, answers)):
+					if idx in cached:
+						continue
+					# one record per case: {'nonce', 'case', 'res', 'val'} or {'nonce', 'case', 'err'}
+					lines.append(f"_ult_run_case({nonce!r}, {idx}, lambda: {call}, lambda _r: ((_r) == ({answer})))")
+				test_codes.append('\n'.join(lines))
+		
+			# Run codes in sandbox parallelly
+			# 程序的总时限按 case 数计算: 失控的 case 先触发各自的预算, 不会拖垮整个程序
+			executed = iter(run_validation_programs([code for code in test_codes if code is not None], nonce, sandbox=sandbox, batch_size=batch_size,
+			                                        run_timeout=validation_timeout(max(case_counts, default=0))))
+			outputs = [next(executed) if code is not None else {} for code in test_codes]
+
+			for i, records in enumerate(outputs, start=chunk_start):
+				valid_tests = set()
+				invalid_count = invalid_count_list[i]
+				normalized_stmts = gen_tests[i - chunk_start]
+				if cache is not None and records:
+					gt_cache.store(cache, *gen_calls[i - chunk_start], records)
+				records = {**records, **cached_list[i - chunk_start]}
+
+				for idx, stmt in enumerate(normalized_stmts):
+					record = records.get(idx, {})
+					if 'res' in record:
+						result_repr = record['res'].strip()
+						processed_stmt = stmt.replace("__TO_BE_FILLED__", result_repr)
+						# check if the test case is repeated
+						if processed_stmt in valid_tests:
+							invalid_count += 1
+							continue
+						valid_tests.add(processed_stmt)
+						# check if the test case is correct
+						if 'val' not in record:
+							invalid_count += 1
+							continue
+						if record['val'] == "False":
+							invalid_count += 1
+					else:
 						invalid_count += 1
-				elif key_err in stdout:
-					invalid_count += 1
-				else:
-					invalid_count += 1
 
-			valid_tests_list.append(list(valid_tests))
-			invalid_count_list[i] = invalid_count
-	
+				valid_tests_list.append(list(valid_tests))
+				invalid_count_list[i] = invalid_count
+
+			if cache is not None:
+				gt_cache.evict(cache)
+
+		if cache is not None:
+			print(f"GT cache: {cached_count}/{case_count} cases answered from the cache")
+
 	except Exception as e:
 		raise Exception(f"Validation process encountered severe error: {e}")
 	